@@ -1,15 +1,193 @@
 import google.generativeai as genai
+import asyncio
 import os
+import threading
+import time
+from collections import OrderedDict
 from dotenv import load_dotenv
+from llm_client import llm_client, LLMTimeout
+from evaluation_cache import EvaluationCache, get_evaluation_cache
 
 # Load environment variables from backend directory
 env_path = os.path.join(os.path.dirname(__file__), '.env')
 load_dotenv(dotenv_path=env_path)
 
+# Conversation memory limits: interviews kept, total characters across all of
+# them, seconds an idle interview is kept, and messages replayed per interview
+AI_CONTEXT_MAX_SESSIONS = int(os.getenv("AI_CONTEXT_MAX_SESSIONS", "1000"))
+AI_CONTEXT_MAX_CHARS = int(os.getenv("AI_CONTEXT_MAX_CHARS", "20000000"))
+AI_CONTEXT_IDLE_TTL = float(os.getenv("AI_CONTEXT_IDLE_TTL", "3600"))
+AI_CONTEXT_MAX_MESSAGES = int(os.getenv("AI_CONTEXT_MAX_MESSAGES", "60"))
+
+# Context compaction: exchanges sent verbatim, older exchanges that must pile
+# up before they are folded into the rolling summary, the summary's length,
+# and the estimated prompt size allowed per request
+AI_CONTEXT_KEEP_TURNS = int(os.getenv("AI_CONTEXT_KEEP_TURNS", "6"))
+AI_CONTEXT_FOLD_TURNS = int(os.getenv("AI_CONTEXT_FOLD_TURNS", "4"))
+AI_SUMMARY_MAX_WORDS = int(os.getenv("AI_SUMMARY_MAX_WORDS", "250"))
+AI_CONTEXT_TOKEN_BUDGET = int(os.getenv("AI_CONTEXT_TOKEN_BUDGET", "6000"))
+CHARS_PER_TOKEN = 4  # rough estimate for English text; avoids a count_tokens round trip
+
+SUMMARY_PROMPT = """You maintain the running notes of a technical interview so the interviewer can continue it without the full transcript.
+
+Current notes:
+{summary}
+
+Newer part of the transcript:
+{transcript}
+
+Rewrite the notes to cover both, in at most {max_words} words. Keep the questions already asked (so none are repeated), the topics covered, coding problems given and how the candidate did, notable strengths and weaknesses, and anything the candidate said about themselves. Reply with the notes only."""
+
+DEFAULT_SESSION = "default"
+
+
+class ConversationStore:
+    """
+    Conversation history per interview session, in Gemini's
+    {'role', 'parts'} format. Least recently used sessions are evicted when
+    there are too many or their combined text exceeds max_chars, and sessions
+    idle for longer than idle_ttl expire.
+    """
+
+    def __init__(self, max_sessions=AI_CONTEXT_MAX_SESSIONS, max_chars=AI_CONTEXT_MAX_CHARS,
+                 idle_ttl=AI_CONTEXT_IDLE_TTL, max_messages=AI_CONTEXT_MAX_MESSAGES):
+        self.max_sessions = max_sessions
+        self.max_chars = max_chars
+        self.idle_ttl = idle_ttl
+        self.max_messages = max_messages
+        # session_id -> {"messages", "summary", "chars", "folded_chars", "last_used"};
+        # order is least recently used first
+        self._sessions = OrderedDict()
+        self._chars = 0
+        self._lock = threading.Lock()
+        self.stats_counters = {"evicted": 0, "expired": 0, "folds": 0}
+
+    @staticmethod
+    def _size(messages):
+        return sum(len(part) for msg in messages for part in msg.get('parts', []))
+
+    def _entry(self, session_id):
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            entry = self._sessions[session_id] = {
+                "messages": [], "summary": "", "chars": 0, "folded_chars": 0, "last_used": time.monotonic()
+            }
+        else:
+            entry["last_used"] = time.monotonic()
+            self._sessions.move_to_end(session_id)
+        return entry
+
+    def _drop(self, session_id):
+        entry = self._sessions.pop(session_id)
+        self._chars -= entry["chars"]
+
+    def _enforce_limits(self, keep=None):
+        now = time.monotonic()
+        while self._sessions:
+            oldest_id, oldest = next(iter(self._sessions.items()))
+            if oldest_id != keep and now - oldest["last_used"] > self.idle_ttl:
+                self._drop(oldest_id)
+                self.stats_counters["expired"] += 1
+            elif (len(self._sessions) > self.max_sessions or self._chars > self.max_chars) and oldest_id != keep:
+                self._drop(oldest_id)
+                self.stats_counters["evicted"] += 1
+            else:
+                break
+
+    def get(self, session_id=DEFAULT_SESSION):
+        """A copy of the session's history (empty for new or expired sessions)"""
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is not None and time.monotonic() - entry["last_used"] > self.idle_ttl:
+                self._drop(session_id)
+                self.stats_counters["expired"] += 1
+                entry = None
+            if entry is None:
+                return []
+            return list(self._entry(session_id)["messages"])
+
+    def set(self, session_id, messages):
+        with self._lock:
+            entry = self._entry(session_id)
+            messages = list(messages)
+            if self.max_messages and len(messages) > self.max_messages:
+                # Drop whole user/model exchanges from the front
+                messages = messages[len(messages) - self.max_messages:]
+                if messages and messages[0].get('role') == 'model':
+                    messages = messages[1:]
+            size = self._size(messages) + len(entry["summary"])
+            self._chars += size - entry["chars"]
+            entry["messages"] = messages
+            entry["chars"] = size
+            self._enforce_limits(keep=session_id)
+
+    def get_window(self, session_id=DEFAULT_SESSION):
+        """(summary, messages, folded_chars): the rolling summary, the history not yet folded into it, and the size of what was folded"""
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return "", [], 0
+            return entry["summary"], list(entry["messages"]), entry["folded_chars"]
+
+    def fold(self, session_id, folded, summary):
+        """
+        Replace the leading messages folded with summary. Does nothing and
+        returns False if the history no longer starts with them, e.g. it was
+        reset while the summary was being written.
+        """
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None or entry["messages"][:len(folded)] != folded:
+                return False
+            folded_size = self._size(folded)
+            entry["messages"] = entry["messages"][len(folded):]
+            entry["folded_chars"] += folded_size
+            self._chars += len(summary) - len(entry["summary"]) - folded_size
+            entry["chars"] += len(summary) - len(entry["summary"]) - folded_size
+            entry["summary"] = summary
+            self.stats_counters["folds"] += 1
+            return True
+
+    def append_exchange(self, session_id, user_input, reply):
+        self.set(session_id, self.get(session_id) + [
+            {'role': 'user', 'parts': [user_input]},
+            {'role': 'model', 'parts': [reply]},
+        ])
+
+    def reset(self, session_id=DEFAULT_SESSION):
+        with self._lock:
+            if session_id in self._sessions:
+                self._drop(session_id)
+
+    def __contains__(self, session_id):
+        with self._lock:
+            return session_id in self._sessions
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "chars": self._chars,
+                "max_sessions": self.max_sessions,
+                "max_chars": self.max_chars,
+                **self.stats_counters,
+            }
+
 
 class InterviewerAI:
     def __init__(self, system_prompt_path=None):
-        self.context = []  # Memory of the conversation
+        self.contexts = ConversationStore()  # Memory of each interview's conversation
+        self.summary_model = None  # Model without the interviewer persona, for context summaries
+        self._compacting = {}  # session_id -> background summary task
+        self._evaluations = {}  # cache key -> task evaluating that submission right now
+        self.prompt_stats = {
+            "requests": 0,
+            "prompt_bytes": 0,
+            "uncompacted_bytes": 0,  # what the same requests would have sent without compaction
+            "last_prompt_bytes": 0,
+            "trimmed_turns": 0,
+            "summary_failures": 0,
+        }
         self.model_name = "gemini-2.5-flash"  # Default Gemini model (fast and efficient)
         
         # Get API key from environment variable
@@ -53,10 +231,10 @@ IMPORTANT RULES:
         self.model = None
         print(f"[InterviewerAI.__init__] Will initialize Gemini model: {self.model_name} on first chat")
 
-    def chat(self, user_input, reset_context=False):
-        """Chat with the AI interviewer. Set reset_context=True to start fresh."""
+    async def chat(self, user_input, reset_context=False, session_id=DEFAULT_SESSION):
+        """Chat with the AI interviewer in session_id's conversation. Set reset_context=True to start fresh."""
         if reset_context:
-            self.context = []  # Clear conversation history
+            self.contexts.reset(session_id)  # Clear conversation history
             print("[InterviewerAI] Context reset - starting fresh conversation")
         
         if not self.model:
@@ -110,20 +288,7 @@ IMPORTANT RULES:
                 return error_msg
         
         try:
-            # Build conversation history for Gemini
-            # Convert our context format to Gemini's format
-            history = []
-            for msg in self.context:
-                if msg['role'] == 'user':
-                    history.append({
-                        'role': 'user',
-                        'parts': msg['parts']
-                    })
-                elif msg['role'] == 'model':
-                    history.append({
-                        'role': 'model',
-                        'parts': msg['parts']
-                    })
+            history = self._history(session_id, user_input)
             
             # Generate response using Gemini
             print(f"Calling Gemini API with model: {self.model_name}")
@@ -132,14 +297,16 @@ IMPORTANT RULES:
             if history and len(history) > 0:
                 try:
                     chat = self.model.start_chat(history=history)
-                    response = chat.send_message(user_input)
+                    response = await llm_client.send_message(chat, user_input)
+                except LLMTimeout:
+                    raise
                 except Exception as chat_error:
                     print(f"[InterviewerAI] Chat history failed ({str(chat_error)}), trying direct generation")
                     # Fallback to direct generation without history
-                    response = self.model.generate_content(user_input)
+                    response = await llm_client.generate_content(self.model, user_input)
             else:
                 # First message - use generate_content directly
-                response = self.model.generate_content(user_input)
+                response = await llm_client.generate_content(self.model, user_input)
             
             # Extract text from response
             if hasattr(response, 'text'):
@@ -154,12 +321,14 @@ IMPORTANT RULES:
                 print(f"[InterviewerAI] Warning: Unexpected response format: {type(response)}")
             
             # Add to context
-            self.context.append({'role': 'user', 'parts': [user_input]})
-            self.context.append({'role': 'model', 'parts': [ai_reply]})
+            self._record_exchange(session_id, user_input, ai_reply)
             
             print(f"Got response from Gemini (length: {len(ai_reply)} chars)")
             return ai_reply
             
+        except LLMTimeout as e:
+            print(f"Error with Gemini API: {str(e)}")
+            return "Error: The AI interviewer took too long to respond. Please try again."
         except Exception as e:
             error_str = str(e)
             print(f"Error with Gemini API: {error_str}")
@@ -182,10 +351,9 @@ IMPORTANT RULES:
                             self.model = genai.GenerativeModel(self.model_name, system_instruction=self.system_prompt)
                             print(f"[InterviewerAI] Switched to fallback model: {self.model_name}")
                             # Retry the request
-                            response = self.model.generate_content(user_input)
+                            response = await llm_client.generate_content(self.model, user_input)
                             ai_reply = response.text if hasattr(response, 'text') else str(response)
-                            self.context.append({'role': 'user', 'parts': [user_input]})
-                            self.context.append({'role': 'model', 'parts': [ai_reply]})
+                            self._record_exchange(session_id, user_input, ai_reply)
                             return ai_reply
                         except:
                             continue
@@ -197,9 +365,143 @@ IMPORTANT RULES:
             
             return error_msg
 
-    def reset_context(self):
-        """Reset the conversation context"""
-        self.context = []
+    def _history(self, session_id, user_input):
+        """
+        Conversation history to send with user_input, in Gemini's format: the
+        rolling summary of older turns followed by the recent turns verbatim.
+        The oldest verbatim turns, then the summary, are cut to keep the
+        estimated prompt within AI_CONTEXT_TOKEN_BUDGET.
+        """
+        summary, messages, folded_chars = self.contexts.get_window(session_id)
+        history = [{'role': msg['role'], 'parts': msg['parts']}
+                   for msg in messages if msg['role'] in ('user', 'model')]
+
+        budget = AI_CONTEXT_TOKEN_BUDGET * CHARS_PER_TOKEN - len(self.system_prompt) - len(user_input)
+        size = ConversationStore._size(history)
+        trimmed = 0
+        while history and size + len(summary) > budget:
+            # Drop a whole exchange so the history still starts with a user turn
+            dropped, history = history[:2], history[2:]
+            dropped_size = ConversationStore._size(dropped)
+            size -= dropped_size
+            folded_chars += dropped_size
+            trimmed += 1
+        if summary:
+            summary = summary[:max(0, budget - size)]
+            if summary:
+                history = [
+                    {'role': 'user', 'parts': [f"Notes on the interview so far:\n{summary}"]},
+                    {'role': 'model', 'parts': ["Understood. I'll continue the interview from here."]},
+                ] + history
+
+        prompt_bytes = len(self.system_prompt.encode()) + len(user_input.encode()) + sum(
+            len(part.encode()) for msg in history for part in msg['parts'])
+        full_bytes = prompt_bytes + folded_chars - len(summary)
+        self.prompt_stats["requests"] += 1
+        self.prompt_stats["prompt_bytes"] += prompt_bytes
+        self.prompt_stats["uncompacted_bytes"] += max(prompt_bytes, full_bytes)
+        self.prompt_stats["last_prompt_bytes"] = prompt_bytes
+        self.prompt_stats["trimmed_turns"] += trimmed
+        return history
+
+    def _record_exchange(self, session_id, user_input, ai_reply):
+        """Add a turn to the session's context and fold old turns into the summary in the background"""
+        self.contexts.append_exchange(session_id, user_input, ai_reply)
+        _, messages, _ = self.contexts.get_window(session_id)
+        if len(messages) < 2 * (AI_CONTEXT_KEEP_TURNS + AI_CONTEXT_FOLD_TURNS) or session_id in self._compacting:
+            return
+        try:
+            task = asyncio.get_running_loop().create_task(self._compact(session_id))
+        except RuntimeError:
+            return  # no event loop, e.g. called from a script; the token budget still applies
+        self._compacting[session_id] = task
+
+        def finished(done):
+            if self._compacting.get(session_id) is done:
+                del self._compacting[session_id]
+        task.add_done_callback(finished)
+
+    async def _compact(self, session_id):
+        """Fold all but the last AI_CONTEXT_KEEP_TURNS exchanges into the session's summary"""
+        summary, messages, _ = self.contexts.get_window(session_id)
+        folded = messages[:len(messages) - 2 * AI_CONTEXT_KEEP_TURNS]
+        if folded and folded[-1]['role'] == 'user':
+            folded = folded[:-1]  # keep exchanges whole
+        if not folded:
+            return
+        transcript = "\n".join(
+            f"{'Candidate' if msg['role'] == 'user' else 'Interviewer'}: {' '.join(msg['parts'])}" for msg in folded)
+        prompt = SUMMARY_PROMPT.format(summary=summary or "(none yet)", transcript=transcript,
+                                       max_words=AI_SUMMARY_MAX_WORDS)
+        try:
+            if self.summary_model is None:
+                self.summary_model = genai.GenerativeModel(self.model_name)
+            response = await llm_client.generate_content(self.summary_model, prompt)
+            new_summary = response.text.strip()
+        except Exception as e:
+            # Keep the turns verbatim; the next exchange tries again
+            self.prompt_stats["summary_failures"] += 1
+            print(f"[InterviewerAI] Context summary failed for {session_id}: {str(e)}")
+            return
+        if new_summary and self.contexts.fold(session_id, folded, new_summary):
+            print(f"[InterviewerAI] Folded {len(folded)} messages into the summary for {session_id}")
+
+    def get_context_stats(self):
+        """Conversation store counters plus prompt sizes sent to Gemini"""
+        stats = {**self.contexts.get_stats(), **self.prompt_stats}
+        requests = stats["requests"]
+        stats["avg_prompt_bytes"] = round(stats["prompt_bytes"] / requests) if requests else 0
+        stats["avg_uncompacted_bytes"] = round(stats["uncompacted_bytes"] / requests) if requests else 0
+        stats["compacting"] = len(self._compacting)
+        return stats
+
+    async def chat_stream(self, user_input, session_id=DEFAULT_SESSION):
+        """
+        Like chat, but yields the reply in chunks as Gemini produces them.
+        Model setup and errors before the first chunk go through chat, so
+        the caller gets the same fallbacks and error messages in one chunk.
+        """
+        if not self.model:
+            yield await self.chat(user_input, session_id=session_id)
+            return
+
+        parts = []
+        try:
+            history = self._history(session_id, user_input)
+            print(f"Streaming from Gemini API with model: {self.model_name}")
+            if history:
+                chat = self.model.start_chat(history=history)
+                chunks = llm_client.stream_message(chat, user_input)
+            else:
+                chunks = llm_client.stream_content(self.model, user_input)
+            async for chunk in chunks:
+                try:
+                    text = chunk.text
+                except ValueError:
+                    # Chunk without text, e.g. only finish or safety metadata
+                    continue
+                if text:
+                    parts.append(text)
+                    yield text
+        except Exception as e:
+            if not parts:
+                print(f"[InterviewerAI] Streaming failed ({str(e)}), retrying without streaming")
+                yield await self.chat(user_input, session_id=session_id)
+                return
+            # The candidate has already seen part of the reply; keep what arrived
+            print(f"Error with Gemini API mid-stream: {str(e)}")
+
+        ai_reply = "".join(parts)
+        if ai_reply:
+            self._record_exchange(session_id, user_input, ai_reply)
+        print(f"Streamed response from Gemini (length: {len(ai_reply)} chars)")
+
+    def reset_context(self, session_id=DEFAULT_SESSION):
+        """Reset one session's conversation context"""
+        task = self._compacting.pop(session_id, None)
+        if task:
+            task.cancel()
+        self.contexts.reset(session_id)
 
     def set_model(self, model_name):
         """Change the Gemini model"""
@@ -241,8 +543,35 @@ IMPORTANT RULES:
         # Default to Python if no language detected
         return 'python'
     
-    def evaluate_code(self, code, language, question, expected_output=None):
-        """Evaluate if the code correctly solves the given question"""
+    async def evaluate_code(self, code, language, question, expected_output=None):
+        """
+        Evaluate if the code correctly solves the given question. Evaluations
+        parsed from Gemini's JSON reply are cached, so resubmitting the same
+        code (ignoring whitespace and comments) returns the earlier result with
+        "cached" set. Free-text fallbacks have "parsed": False and are retried.
+        """
+        cache = get_evaluation_cache()
+        key = EvaluationCache.make_key(code, language, question, expected_output, self.model_name)
+        cached = cache.get(key)
+        if cached is not None:
+            return {**cached, "cached": True}
+
+        # Identical submissions arriving together share one Gemini call
+        task = self._evaluations.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._evaluate_and_cache(key, code, language, question, expected_output))
+            self._evaluations[key] = task
+            task.add_done_callback(lambda _: self._evaluations.pop(key, None))
+        # Shielded so one caller disconnecting doesn't cancel the others' evaluation
+        return {**await asyncio.shield(task), "cached": False}
+
+    async def _evaluate_and_cache(self, key, code, language, question, expected_output):
+        evaluation = await self._evaluate_code(code, language, question, expected_output)
+        if evaluation.get("status") == "success" and evaluation.get("parsed"):
+            get_evaluation_cache().put(key, evaluation)
+        return evaluation
+
+    async def _evaluate_code(self, code, language, question, expected_output=None):
         if not self.model:
             # Reload .env file to ensure we have the latest API key
             load_dotenv(dotenv_path=env_path, override=True)
@@ -296,7 +625,7 @@ Respond in JSON format:
 }}
 """
             
-            response = self.model.generate_content(evaluation_prompt)
+            response = await llm_client.generate_content(self.model, evaluation_prompt)
             
             # Extract text from response
             if hasattr(response, 'text'):
@@ -324,7 +653,8 @@ Respond in JSON format:
                         "feedback": feedback_json.get("feedback", feedback_text),
                         "strengths": feedback_json.get("strengths", []),
                         "improvements": feedback_json.get("improvements", []),
-                        "test_cases_passed": feedback_json.get("test_cases_passed", "N/A")
+                        "test_cases_passed": feedback_json.get("test_cases_passed", "N/A"),
+                        "parsed": True
                     }
             except:
                 pass
@@ -337,7 +667,8 @@ Respond in JSON format:
                 "feedback": feedback_text,
                 "strengths": [],
                 "improvements": [],
-                "test_cases_passed": "N/A"
+                "test_cases_passed": "N/A",
+                "parsed": False
             }
             
         except Exception as e:
@@ -0,0 +1,39 @@
+"""
+Benchmark Utilities
+Latency statistics and report comparison shared by the benchmark scripts
+"""
+import math
+
+
+def percentiles(samples):
+    """p50/p95/p99 (nearest rank), mean, min and max of samples in milliseconds"""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+
+    def rank(p):
+        index = max(0, min(len(ordered) - 1, math.ceil(p * len(ordered) / 100) - 1))
+        return round(ordered[index], 2)
+
+    return {
+        "count": len(ordered),
+        "p50": rank(50),
+        "p95": rank(95),
+        "p99": rank(99),
+        "mean": round(sum(ordered) / len(ordered), 2),
+        "min": round(ordered[0], 2),
+        "max": round(ordered[-1], 2),
+    }
+
+
+def compare(baseline, current, flatten):
+    """
+    Print the relative change of every shared metric between two reports.
+    flatten maps a report to {metric path: number}.
+    """
+    before, after = flatten(baseline), flatten(current)
+    print(f"{'metric':<45} {'baseline':>10} {'current':>10} {'change':>8}")
+    for metric in sorted(before.keys() & after.keys()):
+        old, new = before[metric], after[metric]
+        change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+        print(f"{metric:<45} {old:>10} {new:>10} {change:>8}")
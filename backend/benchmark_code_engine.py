@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Code Engine Benchmark
+Measures spawn, compile and run latency per language and execution throughput
+at several concurrency levels. Runs offline against the local toolchains and
+emits JSON that can be diffed between releases.
+
+Usage:
+    python benchmark_code_engine.py --output bench.json
+    python benchmark_code_engine.py --languages python,cpp --iterations 50
+    python benchmark_code_engine.py --compare old_bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from bench_utils import percentiles, compare
+from code_engine import execute_code, prepare_program, compile_java, compile_cpp
+from compile_cache import configure_compile_cache
+from process_runner import run_process
+from toolchains import toolchains
+
+
+LANGUAGES = ["python", "javascript", "java", "cpp"]
+
+# Toolchain each language needs before it can be benchmarked
+REQUIRED_TOOLCHAINS = {
+    "python": "python",
+    "javascript": "node",
+    "java": "javac",
+    "cpp": "g++",
+}
+
+CPU_LOOP_ITERATIONS = 3_000_000
+LARGE_STDOUT_LINES = 20_000
+
+CORPUS = {
+    "python": {
+        "hello_world": 'print("Hello, World!")',
+        "cpu_loop": f"total = 0\nfor i in range({CPU_LOOP_ITERATIONS}):\n    total += i % 7\nprint(total)",
+        "large_stdout": f'for i in range({LARGE_STDOUT_LINES}):\n    print("line", i)',
+        "compile_error": 'print("unterminated',
+        "timeout": "while True:\n    pass",
+    },
+    "javascript": {
+        "hello_world": 'console.log("Hello, World!");',
+        "cpu_loop": f"let total = 0;\nfor (let i = 0; i < {CPU_LOOP_ITERATIONS}; i++) total += i % 7;\nconsole.log(total);",
+        "large_stdout": f'const lines = [];\nfor (let i = 0; i < {LARGE_STDOUT_LINES}; i++) lines.push("line " + i);\nconsole.log(lines.join("\\n"));',
+        "compile_error": 'console.log("unterminated);',
+        "timeout": "while (true) {}",
+    },
+    "java": {
+        "hello_world": 'public class Main {\n    public static void main(String[] args) {\n        System.out.println("Hello, World!");\n    }\n}',
+        "cpu_loop": f"public class Main {{\n    public static void main(String[] args) {{\n        long total = 0;\n        for (int i = 0; i < {CPU_LOOP_ITERATIONS}; i++) total += i % 7;\n        System.out.println(total);\n    }}\n}}",
+        "large_stdout": f'public class Main {{\n    public static void main(String[] args) {{\n        StringBuilder sb = new StringBuilder();\n        for (int i = 0; i < {LARGE_STDOUT_LINES}; i++) sb.append("line ").append(i).append("\\n");\n        System.out.print(sb);\n    }}\n}}',
+        "compile_error": 'public class Main {\n    public static void main(String[] args) {\n        System.out.println("missing semicolon")\n    }\n}',
+        "timeout": "public class Main {\n    public static void main(String[] args) {\n        while (true) {}\n    }\n}",
+    },
+    "cpp": {
+        "hello_world": '#include <iostream>\nint main() {\n    std::cout << "Hello, World!" << std::endl;\n    return 0;\n}',
+        "cpu_loop": f"#include <iostream>\nint main() {{\n    volatile long long total = 0;\n    for (int i = 0; i < {CPU_LOOP_ITERATIONS}; i++) total += i % 7;\n    std::cout << total << std::endl;\n    return 0;\n}}",
+        "large_stdout": f'#include <cstdio>\nint main() {{\n    for (int i = 0; i < {LARGE_STDOUT_LINES}; i++) std::printf("line %d\\n", i);\n    return 0;\n}}',
+        "compile_error": '#include <iostream>\nint main() {\n    std::cout << "missing semicolon" << std::endl\n}',
+        "timeout": "int main() {\n    volatile int x = 0;\n    while (true) { x++; }\n}",
+    },
+}
+
+# The timeout case always burns the full budget, so it gets a short one and few runs
+TIMEOUT_CASE_SECONDS = 1
+TIMEOUT_CASE_ITERATIONS = 3
+
+
+def _timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return (time.perf_counter() - start) * 1000, result
+
+
+def _unique_source(language, code):
+    """Append a comment that changes the source hash so the compile cache misses"""
+    nonce = uuid.uuid4().hex
+    return f"{code}\n# {nonce}\n" if language == "python" else f"{code}\n// {nonce}\n"
+
+
+def bench_spawn(language, iterations):
+    """Launch latency of an already-prepared hello world, bypassing the warm pool"""
+    command, scratch_dir, error = prepare_program(CORPUS[language]["hello_world"], language)
+    if error:
+        return None
+    try:
+        samples = [_timed(run_process, command, cwd=scratch_dir)[0] for _ in range(iterations)]
+    finally:
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+    return percentiles(samples)
+
+
+def bench_compile(language, iterations):
+    """Cold compiles (unique source every time) and compile-cache hits"""
+    compile_fn = {"java": compile_java, "cpp": compile_cpp}.get(language)
+    if compile_fn is None:
+        return None
+    code = CORPUS[language]["hello_world"]
+    cold = [_timed(compile_fn, _unique_source(language, code))[0] for _ in range(iterations)]
+    compile_fn(code)
+    cached = [_timed(compile_fn, code)[0] for _ in range(iterations)]
+    return {"cold": percentiles(cold), "cached": percentiles(cached)}
+
+
+def bench_cases(language, iterations):
+    """End-to-end execute_code latency for every corpus program"""
+    results = {}
+    for case, code in CORPUS[language].items():
+        if case == "timeout":
+            runs, timeout = TIMEOUT_CASE_ITERATIONS, TIMEOUT_CASE_SECONDS
+        else:
+            runs, timeout = iterations, 10
+        # Warm-up run fills the compile cache and the Python worker pool
+        execute_code(code, language, timeout)
+        samples = []
+        statuses = {}
+        for _ in range(runs):
+            elapsed, result = _timed(execute_code, code, language, timeout)
+            samples.append(elapsed)
+            statuses[result["status"]] = statuses.get(result["status"], 0) + 1
+        results[case] = {"latency_ms": percentiles(samples), "statuses": statuses}
+    return results
+
+
+def bench_throughput(language, concurrency_levels, runs):
+    """Completed hello-world executions per second with N concurrent callers"""
+    code = CORPUS[language]["hello_world"]
+    execute_code(code, language)
+    throughput = {}
+    for concurrency in concurrency_levels:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(lambda _: execute_code(code, language), range(runs)))
+        elapsed = time.perf_counter() - start
+        throughput[str(concurrency)] = {
+            "runs": runs,
+            "errors": sum(1 for r in results if r["status"] != "success"),
+            "seconds": round(elapsed, 3),
+            "runs_per_second": round(runs / elapsed, 2),
+        }
+    return throughput
+
+
+def run_benchmark(languages, iterations, concurrency_levels, throughput_runs):
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "platform": platform.platform(),
+            "python": sys.version.split()[0],
+            "cpu_count": os.cpu_count(),
+            "iterations": iterations,
+            "concurrency_levels": concurrency_levels,
+            "throughput_runs": throughput_runs,
+            "toolchains": {name: info["version"] for name, info in toolchains.to_dict()["toolchains"].items()},
+        },
+        "languages": {},
+    }
+    for language in languages:
+        if not toolchains.is_available(REQUIRED_TOOLCHAINS[language]):
+            print(f"[Benchmark] Skipping {language}: {REQUIRED_TOOLCHAINS[language]} not installed", file=sys.stderr)
+            report["languages"][language] = {"skipped": True}
+            continue
+        print(f"[Benchmark] {language}...", file=sys.stderr)
+        report["languages"][language] = {
+            "spawn_ms": bench_spawn(language, iterations),
+            "compile_ms": bench_compile(language, iterations),
+            "cases": bench_cases(language, iterations),
+            "throughput": bench_throughput(language, concurrency_levels, throughput_runs),
+        }
+    return report
+
+
+def _flatten(report):
+    """Map metric path -> value for the numbers worth comparing (p50/p95 and throughput)"""
+    flat = {}
+    for language, data in report.get("languages", {}).items():
+        if data.get("skipped"):
+            continue
+        if data.get("spawn_ms"):
+            for key in ("p50", "p95"):
+                flat[f"{language}.spawn.{key}"] = data["spawn_ms"][key]
+        for kind, stats in (data.get("compile_ms") or {}).items():
+            for key in ("p50", "p95"):
+                flat[f"{language}.compile.{kind}.{key}"] = stats[key]
+        for case, stats in data.get("cases", {}).items():
+            for key in ("p50", "p95"):
+                flat[f"{language}.{case}.{key}"] = stats["latency_ms"][key]
+        for concurrency, stats in data.get("throughput", {}).items():
+            flat[f"{language}.throughput.c{concurrency}"] = stats["runs_per_second"]
+    return flat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark code_engine execution latency and throughput")
+    parser.add_argument("--languages", default=",".join(LANGUAGES), help="Comma-separated subset of python,javascript,java,cpp")
+    parser.add_argument("--iterations", type=int, default=20, help="Samples per latency measurement")
+    parser.add_argument("--concurrency", default="1,2,4,8", help="Comma-separated concurrency levels for throughput")
+    parser.add_argument("--throughput-runs", type=int, default=32, help="Executions per concurrency level")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    parser.add_argument("--compare", help="Baseline JSON report to compare the new run against")
+    args = parser.parse_args()
+
+    languages = [lang.strip() for lang in args.languages.split(",") if lang.strip()]
+    unknown = [lang for lang in languages if lang not in CORPUS]
+    if unknown:
+        parser.error(f"Unsupported languages: {', '.join(unknown)}")
+    concurrency_levels = [int(level) for level in args.concurrency.split(",") if level.strip()]
+
+    # Cold compiles add a throwaway entry per iteration; keep them out of the
+    # shared cache so a run on a live host cannot evict its artifacts
+    cache_dir = tempfile.mkdtemp(prefix="bench_compile_cache_")
+    configure_compile_cache(root=cache_dir)
+    try:
+        report = run_benchmark(languages, args.iterations, concurrency_levels, args.throughput_runs)
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"[Benchmark] Report written to {args.output}", file=sys.stderr)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(json.load(f), report, _flatten)
+
+
+if __name__ == "__main__":
+    main()
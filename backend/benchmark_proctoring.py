@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Proctoring Benchmark
+Replays recorded frame sequences (a directory of images or a video file)
+through the same path /ws/video uses - binary frame parsing, image decode and
+Proctor analysis - with several simulated sessions at once. Reports frames per
+second, frames per CPU core, latency percentiles and the alert timeline as
+JSON. Without recordings, frames come from a synthetic generator.
+
+Alert cooldowns run on the wall clock, so pass --fps with the recording's
+capture rate when the alert timeline matters; unpaced runs measure capacity.
+
+Usage:
+    python benchmark_proctoring.py --output bench.json
+    python benchmark_proctoring.py --frames recordings/session1 --sessions 1,4,8
+    python benchmark_proctoring.py --video interview.mp4 --fps 2 --compare old_bench.json
+    python benchmark_proctoring.py --detector haar --sessions 4
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+import proctoring
+from bench_utils import percentiles, compare
+from proctoring import Proctor, DETECTORS, FRAME_HEADER, FRAME_PROTOCOL_VERSION, get_detector, parse_binary_frame
+
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+JPEG_QUALITY = 80  # what the frontend sends
+
+
+def _resize(frame, width):
+    h, w = frame.shape[:2]
+    if width and w > width:
+        frame = cv2.resize(frame, (width, round(h * width / w)), interpolation=cv2.INTER_AREA)
+    return frame
+
+
+def _encode(frame):
+    ok, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+    if not ok:
+        raise ValueError("Could not encode frame")
+    return buffer.tobytes()
+
+
+def load_directory(path, width, max_frames):
+    """Images in path, in name order"""
+    names = sorted(n for n in os.listdir(path) if n.lower().endswith(IMAGE_EXTENSIONS))
+    frames = []
+    for name in names[:max_frames]:
+        frame = cv2.imread(os.path.join(path, name), cv2.IMREAD_COLOR)
+        if frame is None:
+            print(f"[Benchmark] Skipping unreadable image {name}", file=sys.stderr)
+            continue
+        frames.append(_encode(_resize(frame, width)))
+    return frames
+
+
+def load_video(path, width, max_frames):
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise ValueError(f"Could not open video {path}")
+    frames = []
+    try:
+        while len(frames) < max_frames:
+            ok, frame = capture.read()
+            if not ok:
+                break
+            frames.append(_encode(_resize(frame, width)))
+    finally:
+        capture.release()
+    return frames
+
+
+def synthetic_frames(count, width, seed=0):
+    """
+    A drawn face drifting across a noisy background, leaving the frame for a
+    stretch and holding still for another, so the detector, the no-face path
+    and the motion gate all get exercised.
+    """
+    rng = np.random.default_rng(seed)
+    height = width * 3 // 4
+    background = rng.integers(60, 120, (height, width, 3), dtype=np.uint8)
+    frames = []
+    for i in range(count):
+        phase = i / max(1, count)
+        frame = background.copy()
+        frame += rng.integers(0, 6, frame.shape, dtype=np.uint8)  # sensor noise
+        absent = 0.45 <= phase < 0.6
+        if not absent:
+            still = 0.75 <= phase < 0.9
+            offset = 0 if still else np.sin(i / 5) * width * 0.15
+            cx, cy = int(width / 2 + offset), height // 2
+            fw, fh = width // 7, height // 4
+            cv2.ellipse(frame, (cx, cy), (fw, fh), 0, 0, 360, (150, 180, 220), -1)
+            for ex in (cx - fw // 2, cx + fw // 2):
+                cv2.ellipse(frame, (ex, cy - fh // 4), (fw // 5, fh // 10), 0, 0, 360, (255, 255, 255), -1)
+                cv2.circle(frame, (ex, cy - fh // 4), fh // 14, (40, 30, 20), -1)
+            cv2.line(frame, (cx, cy - fh // 8), (cx, cy + fh // 5), (110, 140, 190), 3)
+            cv2.ellipse(frame, (cx, cy + fh // 2), (fw // 3, fh // 10), 0, 0, 180, (70, 70, 150), 3)
+        frames.append(_encode(frame))
+    return frames
+
+
+def make_message(payload, sequence, timestamp_ms):
+    """Wrap an encoded image the way the frontend does for /ws/video"""
+    return FRAME_HEADER.pack(FRAME_PROTOCOL_VERSION, 1, 0, sequence, timestamp_ms) + payload
+
+
+def replay_session(session, frames, fps, motion_gate, detector):
+    """Feed every frame through one Proctor; returns latencies (ms) and the alert timeline"""
+    proctor = Proctor(detector)
+    proctor.startup_grace_period = 0
+    if not motion_gate:
+        proctor.motion_gate.threshold = 0
+    interval = 1 / fps if fps else 0
+    latencies = []
+    timeline = []
+    start = time.perf_counter()
+    try:
+        for index, payload in enumerate(frames):
+            if interval:
+                delay = start + index * interval - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            message = make_message(payload, index, int(index * interval * 1000))
+            frame_start = time.perf_counter()
+            header, img_data = parse_binary_frame(message)
+            alerts = proctor.analyze_image(img_data)
+            latencies.append((time.perf_counter() - frame_start) * 1000)
+            if alerts:
+                timeline.append({
+                    "session": session,
+                    "frame": header["seq"],
+                    "t_s": round(time.perf_counter() - start, 3),
+                    "alerts": alerts,
+                })
+    finally:
+        proctor.close()
+    return latencies, timeline, dict(proctor.frame_stats)
+
+
+def bench_sessions(frames, concurrency, fps, motion_gate, detector):
+    """Replay frames in concurrency parallel sessions, one thread each"""
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda s: replay_session(s, frames, fps, motion_gate, detector), range(concurrency)))
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+
+    latencies = [ms for session_latencies, _, _ in results for ms in session_latencies]
+    timeline = sorted((event for _, events, _ in results for event in events), key=lambda e: (e["t_s"], e["session"]))
+    alert_counts = {}
+    skipped = 0
+    for event in timeline:
+        for alert in event["alerts"]:
+            alert_counts[alert] = alert_counts.get(alert, 0) + 1
+    for _, _, stats in results:
+        skipped += stats["skipped"]
+
+    total = len(latencies)
+    return {
+        "sessions": concurrency,
+        "frames": total,
+        "seconds": round(wall, 3),
+        "frames_per_second": round(total / wall, 2) if wall else None,
+        # Frames per fully busy core: how many cores a given frame rate needs
+        "frames_per_cpu_second": round(total / cpu, 2) if cpu else None,
+        "cpu_utilization": round(cpu / wall, 2) if wall else None,
+        "gate_skipped": skipped,
+        "latency_ms": percentiles(latencies),
+        "alert_counts": alert_counts,
+        "timeline": timeline,
+    }
+
+
+def run_benchmark(frames, source, concurrency_levels, fps, motion_gate, detector=None):
+    detector = get_detector(detector).name
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "platform": platform.platform(),
+            "python": sys.version.split()[0],
+            "cpu_count": os.cpu_count(),
+            "opencv": cv2.__version__,
+            "detector": detector,
+            "source": source,
+            "frames": len(frames),
+            "fps": fps,
+            "motion_gate": motion_gate,
+            "inference_width": proctoring.PROCTOR_INFERENCE_WIDTH,
+        },
+        "concurrency": {},
+    }
+    # Warm-up session loads models and fills caches
+    replay_session(-1, frames[:5], 0, motion_gate, detector)
+    for concurrency in concurrency_levels:
+        print(f"[Benchmark] {concurrency} session(s)...", file=sys.stderr)
+        report["concurrency"][str(concurrency)] = bench_sessions(frames, concurrency, fps, motion_gate, detector)
+    report["detector_stats"] = DETECTORS[detector].stats()
+    return report
+
+
+def _flatten(report):
+    """Map metric path -> value for the numbers worth comparing"""
+    flat = {}
+    for concurrency, stats in report.get("concurrency", {}).items():
+        flat[f"c{concurrency}.frames_per_second"] = stats["frames_per_second"]
+        flat[f"c{concurrency}.frames_per_cpu_second"] = stats["frames_per_cpu_second"]
+        if stats["latency_ms"]:
+            for key in ("p50", "p95"):
+                flat[f"c{concurrency}.latency.{key}"] = stats["latency_ms"][key]
+    return flat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark proctoring throughput by replaying recorded frames")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--frames", help="Directory of JPEG/PNG/WebP frames, replayed in name order")
+    source.add_argument("--video", help="Video file to replay")
+    parser.add_argument("--synthetic-frames", type=int, default=200, help="Frames to generate when no recording is given")
+    parser.add_argument("--max-frames", type=int, default=600, help="Cap on frames loaded from a recording")
+    parser.add_argument("--width", type=int, default=640, help="Downscale frames to this width, like the client does")
+    parser.add_argument("--sessions", default="1,2,4,8", help="Comma-separated numbers of concurrent sessions")
+    parser.add_argument("--fps", type=float, default=0, help="Pace each session at this frame rate (0 = as fast as possible)")
+    parser.add_argument("--detector", choices=["auto", *DETECTORS], default=None,
+                        help="Face detector backend (default: PROCTOR_DETECTOR)")
+    parser.add_argument("--no-motion-gate", action="store_true", help="Run inference on every frame")
+    parser.add_argument("--no-timeline", action="store_true", help="Leave the per-frame alert timeline out of the report")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    parser.add_argument("--compare", help="Baseline JSON report to compare the new run against")
+    args = parser.parse_args()
+
+    if args.frames:
+        frames, source_name = load_directory(args.frames, args.width, args.max_frames), args.frames
+    elif args.video:
+        frames, source_name = load_video(args.video, args.width, args.max_frames), args.video
+    else:
+        frames, source_name = synthetic_frames(args.synthetic_frames, args.width), "synthetic"
+    if not frames:
+        parser.error("No frames to replay")
+    concurrency_levels = [int(level) for level in args.sessions.split(",") if level.strip()]
+
+    report = run_benchmark(frames, source_name, concurrency_levels, args.fps, not args.no_motion_gate, args.detector)
+    if args.no_timeline:
+        for stats in report["concurrency"].values():
+            stats.pop("timeline")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"[Benchmark] Report written to {args.output}", file=sys.stderr)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(json.load(f), report, _flatten)
+
+
+if __name__ == "__main__":
+    main()
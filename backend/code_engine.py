@@ -4,12 +4,69 @@ import os
 import tempfile
 import shutil
 import json
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from worker_pool import get_python_pool, WorkerTimeout
+from compile_cache import get_compile_cache
+from toolchains import toolchains
+from execution_scheduler import ExecutionScheduler, LANE_INTERACTIVE, LANE_BATCH
+from process_runner import run_process, limits_for_language, truncation_marker, DEFAULT_LIMITS, StreamingProcess
+
+
+# Executions run in a bounded thread pool so blocking subprocess calls never
+# run on the FastAPI event loop
+EXECUTION_MAX_CONCURRENCY = int(os.getenv("EXECUTION_MAX_CONCURRENCY", str(os.cpu_count() or 2)))
+_execution_executor = ThreadPoolExecutor(max_workers=EXECUTION_MAX_CONCURRENCY, thread_name_prefix="code-exec")
+_execution_lock = threading.Lock()
+# Admission in front of the executor: per-session rate limits and priority lanes
+execution_scheduler = ExecutionScheduler(
+    max_concurrency=EXECUTION_MAX_CONCURRENCY,
+    bucket_capacity=float(os.getenv("EXECUTION_RATE_BURST", "10")),
+    refill_per_second=float(os.getenv("EXECUTION_RATE_PER_SECOND", "1")),
+    max_queued_per_session=int(os.getenv("EXECUTION_MAX_QUEUED_PER_SESSION", "5")),
+)
+_execution_metrics = {
+    "queued": 0,
+    "running": 0,
+    "completed": 0,
+    "max_queue_depth": 0,
+    "total_queue_wait": 0.0,
+}
 
 
 def execute_python_code(code_snippet, timeout=10, working_dir=None):
     """
     Execute Python code safely using subprocess with timeout.
+    Runs on a warm worker from the pool when one is free, otherwise cold-starts
+    a fresh interpreter.
     """
+    pool = get_python_pool()
+    if pool is not None:
+        try:
+            result = pool.run(code_snippet, timeout=timeout, working_dir=working_dir)
+        except WorkerTimeout:
+            return {
+                "status": "error",
+                "output": "Execution Timed Out (Infinite Loop or long-running operation?)"
+            }
+        if result is not None:
+            if result.get("truncated"):
+                return {
+                    "status": "error",
+                    "output": result["stdout"] + truncation_marker(DEFAULT_LIMITS.max_output_bytes) + ("\n" + result["stderr"] if result["stderr"] else "")
+                }
+            if result["returncode"] == 0:
+                return {
+                    "status": "success",
+                    "output": result["stdout"] if result["stdout"] else "Code executed successfully (no output)"
+                }
+            return {
+                "status": "error",
+                "output": result["stderr"] if result["stderr"] else "Unknown error occurred"
+            }
+    
     try:
         cwd = working_dir or tempfile.gettempdir()
         with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False, encoding='utf-8', dir=cwd) as f:
@@ -17,33 +74,12 @@ def execute_python_code(code_snippet, timeout=10, working_dir=None):
             temp_file = f.name
         
         try:
-            result = subprocess.run(
-                [sys.executable, temp_file],
-                capture_output=True,
-                text=True,
-                timeout=timeout,
-                cwd=cwd
-            )
-            
-            if result.returncode == 0:
-                return {
-                    "status": "success",
-                    "output": result.stdout if result.stdout else "Code executed successfully (no output)"
-                }
-            else:
-                return {
-                    "status": "error",
-                    "output": result.stderr if result.stderr else "Unknown error occurred"
-                }
+            run = run_process([sys.executable, temp_file], timeout=timeout, cwd=cwd, limits=limits_for_language('python'))
+            return format_run_result(run, "Execution Timed Out (Infinite Loop or long-running operation?)")
         finally:
             if os.path.exists(temp_file):
                 os.unlink(temp_file)
                 
-    except subprocess.TimeoutExpired:
-        return {
-            "status": "error",
-            "output": "Execution Timed Out (Infinite Loop or long-running operation?)"
-        }
     except Exception as e:
         return {
             "status": "error",
@@ -57,8 +93,7 @@ def execute_javascript_code(code_snippet, timeout=10, working_dir=None):
     """
     try:
         # Check if node is available
-        node_check = subprocess.run(['node', '--version'], capture_output=True, text=True)
-        if node_check.returncode != 0:
+        if not toolchains.is_available('node'):
             return {
                 "status": "error",
                 "output": "Node.js is not installed. Please install Node.js to run JavaScript code."
@@ -70,34 +105,14 @@ def execute_javascript_code(code_snippet, timeout=10, working_dir=None):
             temp_file = f.name
         
         try:
-            result = subprocess.run(
-                ['node', temp_file],
-                capture_output=True,
-                text=True,
-                timeout=timeout,
-                cwd=cwd
-            )
-            
-            if result.returncode == 0:
-                return {
-                    "status": "success",
-                    "output": result.stdout if result.stdout else "Code executed successfully (no output)"
-                }
-            else:
-                return {
-                    "status": "error",
-                    "output": result.stderr if result.stderr else "Unknown error occurred"
-                }
+            run = run_process(node_command(temp_file), timeout=timeout, cwd=cwd, limits=limits_for_language('javascript'))
+            return format_run_result(run)
         finally:
             if os.path.exists(temp_file):
                 os.unlink(temp_file)
                 
-    except subprocess.TimeoutExpired:
-        return {
-            "status": "error",
-            "output": "Execution Timed Out"
-        }
     except FileNotFoundError:
+        toolchains.mark_missing('node')
         return {
             "status": "error",
             "output": "Node.js is not installed. Please install Node.js to run JavaScript code."
@@ -109,64 +124,157 @@ def execute_javascript_code(code_snippet, timeout=10, working_dir=None):
         }
 
 
-def execute_java_code(code_snippet, timeout=15):
+# Flags are part of the compile cache key, so changing them invalidates old artifacts
+JAVAC_FLAGS = []
+CPP_FLAGS = []
+
+
+def format_run_result(run, timeout_message="Execution Timed Out"):
     """
-    Execute Java code. Requires a main class.
+    Convert a run_process result to the {"status", "output"} API format.
+    """
+    if run["timed_out"]:
+        return {"status": "error", "output": timeout_message}
+    if run["limit_exceeded"] == "cpu":
+        return {"status": "error", "output": "CPU time limit exceeded"}
+    if run["limit_exceeded"] == "file_size":
+        return {"status": "error", "output": "File size limit exceeded"}
+    if run["truncated"]:
+        return {"status": "error", "output": run["stdout"] + ("\n" + run["stderr"] if run["stderr"] else "")}
+    if run["returncode"] == 0:
+        return {
+            "status": "success",
+            "output": run["stdout"] if run["stdout"] else "Code executed successfully (no output)"
+        }
+    return {
+        "status": "error",
+        "output": run["stderr"] if run["stderr"] else "Unknown error occurred"
+    }
+
+
+def java_command(class_dir):
+    """
+    JVM command for a compiled Main class; the heap cap stands in for RLIMIT_AS.
+    """
+    memory_mb = DEFAULT_LIMITS.memory_mb
+    return ['java', *([f'-Xmx{memory_mb}m'] if memory_mb else []), '-cp', class_dir, 'Main']
+
+
+def node_command(script_path):
+    """
+    Node command for a script; the heap cap stands in for RLIMIT_AS.
+    """
+    memory_mb = DEFAULT_LIMITS.memory_mb
+    return ['node', *([f'--max-old-space-size={memory_mb}'] if memory_mb else []), script_path]
+
+
+def _run_compiled(command, timeout, working_dir=None, language=None):
     """
+    Run an already-compiled program under the sandbox limits and convert the
+    result to the API format. Runs in working_dir if given, otherwise in a
+    scratch directory.
+    """
+    scratch_dir = None if working_dir else tempfile.mkdtemp()
     try:
-        # Check if javac and java are available
-        javac_check = subprocess.run(['javac', '-version'], capture_output=True, text=True)
-        if javac_check.returncode != 0:
-            return {
+        run = run_process(command, timeout=timeout, cwd=working_dir or scratch_dir, limits=limits_for_language(language))
+        return format_run_result(run)
+    finally:
+        if scratch_dir:
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+
+
+def _compile_cached(language, compiler_version, flags, code_snippet, compile_fn):
+    """
+    Return (artifact_dir, error_result). A cache hit skips compile_fn entirely.
+    """
+    cache = get_compile_cache()
+    key = cache.make_key(language, compiler_version, flags, code_snippet)
+    artifact_dir = cache.lookup(key)
+    if artifact_dir:
+        return artifact_dir, None
+    artifact_dir, result = cache.build(key, compile_fn)
+    return artifact_dir, (None if artifact_dir else result)
+
+
+def compile_java(code_snippet):
+    """
+    Compile Java source (class Main) through the compile cache.
+    Returns (class_dir, error_result); exactly one of them is None.
+    """
+    if not toolchains.is_available('javac'):
+        return None, {
+            "status": "error",
+            "output": "Java compiler (javac) is not installed. Please install JDK to run Java code."
+        }
+    
+    def build(build_dir):
+        java_file = os.path.join(build_dir, 'Main.java')
+        with open(java_file, 'w', encoding='utf-8') as f:
+            f.write(code_snippet)
+        
+        compile_result = subprocess.run(
+            ['javac', *JAVAC_FLAGS, '-d', build_dir, java_file],
+            capture_output=True,
+            text=True,
+            timeout=10,
+            cwd=build_dir
+        )
+        if compile_result.returncode != 0:
+            return False, {
                 "status": "error",
-                "output": "Java compiler (javac) is not installed. Please install JDK to run Java code."
+                "output": f"Compilation error:\n{compile_result.stderr}"
             }
+        return True, {}
+    
+    return _compile_cached('java', toolchains.version('javac'), JAVAC_FLAGS, code_snippet, build)
+
+
+def compile_cpp(code_snippet):
+    """
+    Compile C++ source through the compile cache.
+    Returns (executable_path, error_result); exactly one of them is None.
+    """
+    if not toolchains.is_available('g++'):
+        return None, {
+            "status": "error",
+            "output": "C++ compiler (g++) is not installed. Please install g++ to run C++ code."
+        }
+    exe_name = 'main.exe' if sys.platform == 'win32' else 'main'
+    
+    def build(build_dir):
+        cpp_file = os.path.join(build_dir, 'main.cpp')
+        with open(cpp_file, 'w', encoding='utf-8') as f:
+            f.write(code_snippet)
         
-        # Create a temporary directory for Java files
-        temp_dir = tempfile.mkdtemp()
+        compile_result = subprocess.run(
+            ['g++', *CPP_FLAGS, '-o', os.path.join(build_dir, exe_name), cpp_file],
+            capture_output=True,
+            text=True,
+            timeout=10,
+            cwd=build_dir
+        )
+        if compile_result.returncode != 0:
+            return False, {
+                "status": "error",
+                "output": f"Compilation error:\n{compile_result.stderr}"
+            }
+        return True, {}
+    
+    build_dir, error = _compile_cached('cpp', toolchains.version('g++'), CPP_FLAGS, code_snippet, build)
+    return (os.path.join(build_dir, exe_name) if build_dir else None), error
+
+
+def execute_java_code(code_snippet, timeout=15, working_dir=None):
+    """
+    Execute Java code. Requires a main class.
+    Compiled classes are cached by source hash, so re-runs skip javac.
+    """
+    try:
+        class_dir, error = compile_java(code_snippet)
+        if error:
+            return error
         
-        try:
-            # Write code to Main.java
-            java_file = os.path.join(temp_dir, 'Main.java')
-            with open(java_file, 'w', encoding='utf-8') as f:
-                f.write(code_snippet)
-            
-            # Compile
-            compile_result = subprocess.run(
-                ['javac', java_file],
-                capture_output=True,
-                text=True,
-                timeout=10,
-                cwd=temp_dir
-            )
-            
-            if compile_result.returncode != 0:
-                return {
-                    "status": "error",
-                    "output": f"Compilation error:\n{compile_result.stderr}"
-                }
-            
-            # Run
-            run_result = subprocess.run(
-                ['java', '-cp', temp_dir, 'Main'],
-                capture_output=True,
-                text=True,
-                timeout=timeout,
-                cwd=temp_dir
-            )
-            
-            if run_result.returncode == 0:
-                return {
-                    "status": "success",
-                    "output": run_result.stdout if run_result.stdout else "Code executed successfully (no output)"
-                }
-            else:
-                return {
-                    "status": "error",
-                    "output": run_result.stderr if run_result.stderr else "Unknown error occurred"
-                }
-        finally:
-            shutil.rmtree(temp_dir, ignore_errors=True)
+        return _run_compiled(java_command(class_dir), timeout, working_dir, 'java')
                 
     except subprocess.TimeoutExpired:
         return {
@@ -174,6 +282,7 @@ def execute_java_code(code_snippet, timeout=15):
             "output": "Execution Timed Out"
         }
     except FileNotFoundError:
+        toolchains.mark_missing('javac')
         return {
             "status": "error",
             "output": "Java is not installed. Please install JDK to run Java code."
@@ -185,64 +294,17 @@ def execute_java_code(code_snippet, timeout=15):
         }
 
 
-def execute_cpp_code(code_snippet, timeout=15):
+def execute_cpp_code(code_snippet, timeout=15, working_dir=None):
     """
     Execute C++ code using g++.
+    Compiled binaries are cached by source hash, so re-runs skip g++.
     """
     try:
-        # Check if g++ is available
-        gpp_check = subprocess.run(['g++', '--version'], capture_output=True, text=True)
-        if gpp_check.returncode != 0:
-            return {
-                "status": "error",
-                "output": "C++ compiler (g++) is not installed. Please install g++ to run C++ code."
-            }
-        
-        temp_dir = tempfile.mkdtemp()
+        exe_path, error = compile_cpp(code_snippet)
+        if error:
+            return error
         
-        try:
-            cpp_file = os.path.join(temp_dir, 'main.cpp')
-            exe_file = os.path.join(temp_dir, 'main.exe' if sys.platform == 'win32' else 'main')
-            
-            with open(cpp_file, 'w', encoding='utf-8') as f:
-                f.write(code_snippet)
-            
-            # Compile
-            compile_result = subprocess.run(
-                ['g++', '-o', exe_file, cpp_file],
-                capture_output=True,
-                text=True,
-                timeout=10,
-                cwd=temp_dir
-            )
-            
-            if compile_result.returncode != 0:
-                return {
-                    "status": "error",
-                    "output": f"Compilation error:\n{compile_result.stderr}"
-                }
-            
-            # Run
-            run_result = subprocess.run(
-                [exe_file],
-                capture_output=True,
-                text=True,
-                timeout=timeout,
-                cwd=temp_dir
-            )
-            
-            if run_result.returncode == 0:
-                return {
-                    "status": "success",
-                    "output": run_result.stdout if run_result.stdout else "Code executed successfully (no output)"
-                }
-            else:
-                return {
-                    "status": "error",
-                    "output": run_result.stderr if run_result.stderr else "Unknown error occurred"
-                }
-        finally:
-            shutil.rmtree(temp_dir, ignore_errors=True)
+        return _run_compiled([exe_path], timeout, working_dir, 'cpp')
                 
     except subprocess.TimeoutExpired:
         return {
@@ -250,6 +312,7 @@ def execute_cpp_code(code_snippet, timeout=15):
             "output": "Execution Timed Out"
         }
     except FileNotFoundError:
+        toolchains.mark_missing('g++')
         return {
             "status": "error",
             "output": "C++ compiler (g++) is not installed. Please install g++ to run C++ code."
@@ -282,56 +345,359 @@ def execute_code(code_snippet, language="python", timeout=10, working_dir=None):
         }
 
 
-def execute_sql_query(query, db_path=None):
+def normalize_language(language):
     """
-    Execute SQL query safely.
-    For MVP, uses SQLite in-memory database.
+    Map language aliases to the canonical names used by the engine.
+    """
+    language = (language or "python").lower()
+    return {"js": "javascript", "c++": "cpp"}.get(language, language)
+
+
+# language -> (toolchain whose absence raises FileNotFoundError, message for the candidate)
+MISSING_TOOLCHAIN = {
+    "python": ("python", "Python interpreter is not available on the server."),
+    "javascript": ("node", "Node.js is not installed. Please install Node.js to run JavaScript code."),
+    "java": ("javac", "Java compiler (javac) is not installed. Please install JDK to run Java code."),
+    "cpp": ("g++", "C++ compiler (g++) is not installed. Please install g++ to run C++ code."),
+}
+
+
+def prepare_program(code_snippet, language="python"):
+    """
+    Build a runnable command for code_snippet, compiling once if needed.
+    Returns (command, scratch_dir, error_result). The caller removes scratch_dir
+    when done; it holds interpreted sources and serves as the working directory.
     """
+    language = normalize_language(language)
+    scratch_dir = tempfile.mkdtemp()
     try:
-        import sqlite3
+        if language == "python":
+            source = os.path.join(scratch_dir, 'main.py')
+            command = [sys.executable, source]
+        elif language == "javascript":
+            if not toolchains.is_available('node'):
+                raise FileNotFoundError('node')
+            source = os.path.join(scratch_dir, 'main.js')
+            command = node_command(source)
+        elif language == "java":
+            source = None
+            class_dir, error = compile_java(code_snippet)
+            command = java_command(class_dir) if class_dir else None
+        elif language == "cpp":
+            source = None
+            exe_path, error = compile_cpp(code_snippet)
+            command = [exe_path] if exe_path else None
+        else:
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+            return None, None, {
+                "status": "error",
+                "output": f"Language '{language}' is not supported. Supported languages: python, javascript, java, cpp"
+            }
         
+        if source:
+            with open(source, 'w', encoding='utf-8') as f:
+                f.write(code_snippet)
+            error = None
+        if error:
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+            return None, None, error
+        return command, scratch_dir, None
+    except FileNotFoundError:
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+        toolchain, message = MISSING_TOOLCHAIN[language]
+        toolchains.mark_missing(toolchain)
+        return None, None, {"status": "error", "output": message}
+    except Exception as e:
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+        return None, None, {"status": "error", "output": str(e)}
+
+
+def _outputs_match(actual, expected):
+    """
+    Compare program output ignoring trailing whitespace on each line and
+    trailing blank lines.
+    """
+    def normalize(text):
+        return [line.rstrip() for line in (text or "").rstrip().splitlines()]
+    return normalize(actual) == normalize(expected)
+
+
+TEST_CASE_MAX_PARALLEL = int(os.getenv("TEST_CASE_MAX_PARALLEL", "4"))
+
+
+def start_streaming_execution(code_snippet, language, on_output, on_exit, timeout=10, on_start=None):
+    """
+    Prepare code_snippet like execute_code does and start it without waiting.
+    on_start() fires just before the program starts, output chunks go to
+    on_output(stream_name, text) as they are produced and on_exit(result) fires
+    once the program ends. Returns (process, error_result); the process accepts
+    write_stdin / close_stdin / cancel.
+    """
+    language = normalize_language(language)
+    command, scratch_dir, error = prepare_program(code_snippet, language)
+    if error:
+        return None, error
+    if language == "python":
+        # Unbuffered, otherwise print() output only arrives when the program exits
+        command = [command[0], '-u', *command[1:]]
+    
+    def finish(result):
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+        on_exit(result)
+    
+    process = StreamingProcess(
+        command,
+        on_output,
+        finish,
+        timeout=timeout,
+        cwd=scratch_dir,
+        limits=limits_for_language(language)
+    )
+    try:
+        if on_start:
+            on_start()
+        process.start()
+    except Exception as e:
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+        return None, {"status": "error", "output": str(e)}
+    return process, None
+
+
+SQL_MAX_ROWS = int(os.getenv("SQL_MAX_ROWS", "500"))
+SQL_TIME_BUDGET = float(os.getenv("SQL_TIME_BUDGET", "2"))
+
+_sql_template = None
+_sql_template_lock = threading.Lock()
+
+
+def _get_sql_template():
+    """
+    Seeded in-memory database built once; every query runs on a copy of it.
+    """
+    global _sql_template
+    with _sql_template_lock:
+        if _sql_template is None:
+            import sqlite3
+            
+            template = sqlite3.connect(':memory:', check_same_thread=False)
+            template.execute('''
+                CREATE TABLE IF NOT EXISTS employees (
+                    id INTEGER PRIMARY KEY,
+                    name TEXT,
+                    department TEXT,
+                    salary INTEGER
+                )
+            ''')
+            template.execute('''
+                INSERT OR IGNORE INTO employees (id, name, department, salary)
+                VALUES (1, 'Alice', 'Engineering', 100000),
+                       (2, 'Bob', 'Sales', 80000),
+                       (3, 'Charlie', 'Engineering', 120000),
+                       (4, 'Diana', 'Marketing', 90000)
+            ''')
+            template.commit()
+            _sql_template = template
+        return _sql_template
+
+
+def execute_sql_query(query, db_path=None, max_rows=None, time_budget=None):
+    """
+    Execute SQL query safely.
+    For MVP, runs against a private copy of the seeded in-memory database.
+    Returns at most max_rows rows and interrupts queries that run longer
+    than time_budget seconds.
+    """
+    import sqlite3
+    
+    max_rows = max_rows or SQL_MAX_ROWS
+    time_budget = time_budget or SQL_TIME_BUDGET
+    conn = None
+    try:
+        template = _get_sql_template()
         conn = sqlite3.connect(':memory:')
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS employees (
-                id INTEGER PRIMARY KEY,
-                name TEXT,
-                department TEXT,
-                salary INTEGER
-            )
-        ''')
-        
-        cursor.execute('''
-            INSERT OR IGNORE INTO employees (id, name, department, salary)
-            VALUES (1, 'Alice', 'Engineering', 100000),
-                   (2, 'Bob', 'Sales', 80000),
-                   (3, 'Charlie', 'Engineering', 120000),
-                   (4, 'Diana', 'Marketing', 90000)
-        ''')
+        with _sql_template_lock:
+            template.backup(conn)
         
-        conn.commit()
+        # Checked every 1000 VM instructions; returning True aborts the query
+        deadline = time.perf_counter() + time_budget
+        conn.set_progress_handler(lambda: time.perf_counter() > deadline, 1000)
         
+        cursor = conn.cursor()
         cursor.execute(query)
         
-        if query.strip().upper().startswith('SELECT'):
-            results = cursor.fetchall()
+        if cursor.description is not None:
             columns = [description[0] for description in cursor.description]
-            conn.close()
+            rows = cursor.fetchmany(max_rows + 1)
+            truncated = len(rows) > max_rows
+            rows = [list(row) for row in rows[:max_rows]]
+            output = f"Columns: {columns}\nRows: {[tuple(row) for row in rows]}"
+            if truncated:
+                output += f"\n(showing first {max_rows} rows)"
             return {
                 "status": "success",
-                "output": f"Columns: {columns}\nRows: {results}"
+                "output": output,
+                "columns": columns,
+                "rows": rows,
+                "row_count": len(rows),
+                "truncated": truncated
             }
         else:
             conn.commit()
-            conn.close()
             return {
                 "status": "success",
-                "output": "Query executed successfully"
+                "output": "Query executed successfully",
+                "rows_affected": cursor.rowcount
             }
-            
+    
+    except sqlite3.OperationalError as e:
+        if str(e) == "interrupted":
+            return {
+                "status": "error",
+                "output": f"Query exceeded the {time_budget:g} second time limit"
+            }
+        return {
+            "status": "error",
+            "output": str(e)
+        }
     except Exception as e:
         return {
             "status": "error",
             "output": str(e)
         }
+    finally:
+        if conn is not None:
+            conn.close()
+
+
+def _run_tracked(func, enqueued_at, args, kwargs):
+    """Run a blocking execution inside the executor, updating queue metrics"""
+    with _execution_lock:
+        _execution_metrics["queued"] -= 1
+        _execution_metrics["running"] += 1
+        _execution_metrics["total_queue_wait"] += time.time() - enqueued_at
+    try:
+        return func(*args, **kwargs)
+    finally:
+        with _execution_lock:
+            _execution_metrics["running"] -= 1
+            _execution_metrics["completed"] += 1
+
+
+async def run_execution(func, *args, session_id=None, lane=LANE_INTERACTIVE, charge=True, **kwargs):
+    """
+    Run a blocking execution function off the event loop.
+    At most EXECUTION_MAX_CONCURRENCY run at once; the rest wait in the
+    scheduler, interactive runs ahead of batch work. Raises QuotaExceeded when
+    session_id is over its rate or queue limit; charge=False skips the quota.
+    """
+    enqueued_at = time.time()
+    with _execution_lock:
+        _execution_metrics["queued"] += 1
+        _execution_metrics["max_queue_depth"] = max(_execution_metrics["max_queue_depth"], _execution_metrics["queued"])
+    try:
+        await execution_scheduler.acquire(session_id, lane, charge)
+    except BaseException:
+        with _execution_lock:
+            _execution_metrics["queued"] -= 1
+        raise
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(_execution_executor, _run_tracked, func, enqueued_at, args, kwargs)
+    # The slot is held until the work finishes, even if the caller stops waiting
+    future.add_done_callback(lambda _: execution_scheduler.release())
+    return await asyncio.shield(future)
+
+
+def _run_test_case(command, scratch_dir, limits, timeout, index, case):
+    run = run_process(command, stdin=case.get("input") or "", timeout=timeout, cwd=scratch_dir, limits=limits)
+    if run["timed_out"]:
+        verdict = "timeout"
+    elif run["limit_exceeded"]:
+        verdict = "limit_exceeded"
+    elif run["returncode"] != 0:
+        verdict = "runtime_error"
+    elif _outputs_match(run["stdout"], case.get("expected_output")):
+        verdict = "passed"
+    else:
+        verdict = "wrong_answer"
+    return {
+        "index": index,
+        "passed": verdict == "passed",
+        "verdict": verdict,
+        "stdout": run["stdout"],
+        "stderr": run["stderr"],
+        "expected_output": case.get("expected_output"),
+        "wall_time_ms": round(run["wall_time"] * 1000, 2),
+        "peak_rss_kb": run["peak_rss_kb"],
+        "limit_exceeded": run["limit_exceeded"]
+    }
+
+
+async def run_test_cases_async(code_snippet, language, test_cases, timeout=5, max_parallel=None,
+                               session_id=None, lane=LANE_BATCH):
+    """
+    Compile once, then run every test case ({"input", "expected_output"}).
+    Each case takes its own scheduler slot on the shared executor, at most
+    max_parallel at a time; only the compile step is charged to session_id's
+    quota. Returns per-case pass/fail, wall time and peak RSS.
+    """
+    command, scratch_dir, error = await run_execution(
+        prepare_program, code_snippet, language, session_id=session_id, lane=lane)
+    if error:
+        return {
+            "status": "error",
+            "output": error["output"],
+            "passed": 0,
+            "total": len(test_cases),
+            "results": []
+        }
+    limits = limits_for_language(normalize_language(language))
+    parallel = asyncio.Semaphore(max(1, max_parallel or TEST_CASE_MAX_PARALLEL))
+    
+    async def run_case(index, case):
+        async with parallel:
+            return await run_execution(
+                _run_test_case, command, scratch_dir, limits, timeout, index, case,
+                session_id=session_id, lane=lane, charge=False)
+    
+    try:
+        results = await asyncio.gather(*(run_case(index, case) for index, case in enumerate(test_cases)))
+    finally:
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+    
+    passed = sum(1 for r in results if r["passed"])
+    return {
+        "status": "success",
+        "passed": passed,
+        "total": len(results),
+        "all_passed": passed == len(results),
+        "score": round(passed / len(results) * 100) if results else 0,
+        "results": results
+    }
+
+
+async def execute_code_async(code_snippet, language="python", timeout=10, working_dir=None, session_id=None):
+    """
+    Async variant of execute_code for use inside async endpoints.
+    """
+    return await run_execution(execute_code, code_snippet, language, timeout, working_dir, session_id=session_id)
+
+
+async def execute_sql_query_async(query, db_path=None, session_id=None):
+    """
+    Async variant of execute_sql_query for use inside async endpoints.
+    """
+    return await run_execution(execute_sql_query, query, db_path, session_id=session_id)
+
+
+def get_execution_metrics():
+    """
+    Current execution queue depth, running count, average queue wait and
+    per-lane scheduler wait times.
+    """
+    with _execution_lock:
+        metrics = dict(_execution_metrics)
+    completed = metrics["completed"]
+    metrics["avg_queue_wait_ms"] = round(metrics.pop("total_queue_wait") / completed * 1000, 2) if completed else 0
+    metrics["max_concurrency"] = EXECUTION_MAX_CONCURRENCY
+    metrics["scheduler"] = execution_scheduler.get_stats()
+    return metrics
@@ -6,6 +6,7 @@ import google.generativeai as genai
 import os
 from dotenv import load_dotenv
 from diff_match_patch import diff_match_patch
+from llm_client import llm_client
 
 load_dotenv()
 
@@ -19,7 +20,7 @@ class CodeRevision:
         else:
             self.model = None
     
-    def improve_code(self, original_code: str, question: str, language: str = "python") -> dict:
+    async def improve_code(self, original_code: str, question: str, language: str = "python") -> dict:
         """Analyze code and provide improved version"""
         if not self.model:
             return {
@@ -61,7 +62,7 @@ IMPROVEMENTS:
 """
         
         try:
-            response = self.model.generate_content(prompt)
+            response = await llm_client.generate_content(self.model, prompt)
             result_text = response.text
             
             # Parse the response
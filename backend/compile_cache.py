@@ -0,0 +1,161 @@
+"""
+Compile Artifact Cache
+Content-addressed store for compiled Java/C++ submissions with LRU eviction
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class CompileCache:
+    """
+    Maps (language, compiler version, flags, source) to a directory of build
+    artifacts. Entries are evicted least-recently-used once the total size on
+    disk exceeds max_bytes.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.entries: "OrderedDict[str, int]" = OrderedDict()  # key -> size in bytes, oldest first
+        self.total_bytes = 0
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+        self._load_existing()
+
+    def _load_existing(self):
+        """Index entries left on disk by a previous process, oldest first"""
+        found = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name.startswith("tmp") or not os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+                continue
+            found.append((os.path.getmtime(path), name, _dir_size(path)))
+        for _, name, size in sorted(found):
+            self.entries[name] = size
+            self.total_bytes += size
+        self._evict()
+
+    @staticmethod
+    def make_key(language: str, compiler_version: str, flags: List[str], source: str) -> str:
+        digest = hashlib.sha256()
+        for part in (language, compiler_version, "\0".join(flags), source):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0\0")
+        return digest.hexdigest()
+
+    def lookup(self, key: str) -> Optional[str]:
+        """Return the artifact directory for key, or None on a miss"""
+        path = os.path.join(self.root, key)
+        with self._lock:
+            if key in self.entries and os.path.isdir(path):
+                self.entries.move_to_end(key)
+                self.stats["hits"] += 1
+                try:
+                    os.utime(path)
+                except OSError:
+                    pass
+                return path
+            if key in self.entries:
+                # Removed from disk behind our back
+                self.total_bytes -= self.entries.pop(key)
+            self.stats["misses"] += 1
+            return None
+
+    def build(self, key: str, compile_fn: Callable[[str], Tuple[bool, Dict]]) -> Tuple[Optional[str], Dict]:
+        """
+        Compile into a fresh directory and publish it under key.
+        compile_fn(build_dir) returns (ok, result); failed builds are discarded.
+        """
+        build_dir = tempfile.mkdtemp(prefix="tmp", dir=self.root)
+        try:
+            ok, result = compile_fn(build_dir)
+        except Exception:
+            shutil.rmtree(build_dir, ignore_errors=True)
+            raise
+        if not ok:
+            shutil.rmtree(build_dir, ignore_errors=True)
+            return None, result
+
+        path = os.path.join(self.root, key)
+        size = _dir_size(build_dir)
+        with self._lock:
+            try:
+                os.rename(build_dir, path)
+            except OSError:
+                # Another request built the same source concurrently
+                shutil.rmtree(build_dir, ignore_errors=True)
+                if not os.path.isdir(path):
+                    return None, {"status": "error", "output": "Could not store compiled artifacts"}
+                if key not in self.entries:
+                    self.entries[key] = size
+                    self.total_bytes += size
+                return path, result
+            self.entries[key] = size
+            self.total_bytes += size
+            self._evict(keep=key)
+        return path, result
+
+    def _evict(self, keep: Optional[str] = None):
+        while self.total_bytes > self.max_bytes and self.entries:
+            key, size = next(iter(self.entries.items()))
+            if key == keep:
+                break
+            del self.entries[key]
+            self.total_bytes -= size
+            self.stats["evictions"] += 1
+            shutil.rmtree(os.path.join(self.root, key), ignore_errors=True)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                **self.stats,
+                "entries": len(self.entries),
+                "total_bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+COMPILE_CACHE_DIR = os.getenv("COMPILE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "aptiva_compile_cache"))
+COMPILE_CACHE_MAX_MB = int(os.getenv("COMPILE_CACHE_MAX_MB", "256"))
+
+_compile_cache: Optional[CompileCache] = None
+_compile_cache_lock = threading.Lock()
+
+
+def get_compile_cache() -> CompileCache:
+    """Return the shared cache, creating it on first use"""
+    global _compile_cache
+    if _compile_cache is None:
+        with _compile_cache_lock:
+            if _compile_cache is None:
+                _compile_cache = CompileCache(COMPILE_CACHE_DIR, COMPILE_CACHE_MAX_MB * 1024 * 1024)
+    return _compile_cache
+
+
+def configure_compile_cache(root: Optional[str] = None, max_mb: Optional[int] = None):
+    """Point the shared cache elsewhere (e.g. a private directory for benchmarks); rebuilt lazily"""
+    global _compile_cache, COMPILE_CACHE_DIR, COMPILE_CACHE_MAX_MB
+    with _compile_cache_lock:
+        if root is not None:
+            COMPILE_CACHE_DIR = root
+        if max_mb is not None:
+            COMPILE_CACHE_MAX_MB = max_mb
+        _compile_cache = None
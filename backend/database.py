@@ -5,7 +5,7 @@ PostgreSQL integration for production-ready persistence
 from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Text, JSON, Boolean, ForeignKey
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
-from datetime import datetime
+from datetime import datetime, timezone
 import os
 from dotenv import load_dotenv
 
@@ -145,6 +145,19 @@ class Leaderboard(Base):
     total_interviews = Column(Integer, default=0)
 
 
+class ProctoringEvent(Base):
+    __tablename__ = "proctoring_events"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    # In-memory session id (interview_session.InterviewSession.session_id)
+    session_id = Column(String, index=True, nullable=False)
+    round_number = Column(Integer, nullable=True)
+    event_type = Column(String, nullable=False)
+    details = Column(Text, nullable=True)
+    source = Column(String, nullable=True)  # 'video', 'client'
+    timestamp = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))  # UTC
+
+
 class UserStreak(Base):
     __tablename__ = "user_streaks"
     
@@ -161,6 +174,36 @@ def init_db():
     Base.metadata.create_all(bind=engine)
 
 
+def save_proctoring_events(session_id: str, events: list, total_violations: int, integrity_score: float):
+    """
+    Insert a batch of proctoring events and update the session's totals if it
+    has a row. Timestamps are already UTC ISO strings (see record_violation).
+    """
+    db = SessionLocal()
+    try:
+        db.bulk_insert_mappings(ProctoringEvent, [
+            {
+                "session_id": session_id,
+                "round_number": event.get("round"),
+                "event_type": event["type"],
+                "details": event.get("details"),
+                "source": event.get("source"),
+                "timestamp": datetime.fromisoformat(event["timestamp"]),
+            }
+            for event in events
+        ])
+        db.query(InterviewSession).filter(InterviewSession.session_id == session_id).update({
+            "total_violations": total_violations,
+            "integrity_score": integrity_score,
+        })
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
 def get_db():
     """Get database session"""
     db = SessionLocal()
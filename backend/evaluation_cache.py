@@ -0,0 +1,262 @@
+"""
+Evaluation Cache
+Reuses AI code evaluations for resubmitted code. Submissions are keyed on
+their normalized form, so changes to whitespace or comments still hit.
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+
+EVAL_CACHE_MAX_ENTRIES = int(os.getenv("EVAL_CACHE_MAX_ENTRIES", "2048"))
+EVAL_CACHE_TTL = float(os.getenv("EVAL_CACHE_TTL", "86400"))
+# SQLite file for a second tier that survives restarts; empty disables it
+EVAL_CACHE_DB = os.getenv("EVAL_CACHE_DB", "")
+
+# language -> (line comment marker, whether /* */ block comments exist)
+COMMENT_SYNTAX = {
+    "python": ("#", False),
+    "javascript": ("//", True),
+    "typescript": ("//", True),
+    "java": ("//", True),
+    "cpp": ("//", True),
+    "c++": ("//", True),
+    "c": ("//", True),
+    "csharp": ("//", True),
+    "go": ("//", True),
+    "rust": ("//", True),
+    "sql": ("--", True),
+}
+
+# language -> string delimiters, longest first
+STRING_DELIMITERS = {
+    "python": ('"""', "'''", '"', "'"),
+    "javascript": ('"', "'", "`"),
+    "typescript": ('"', "'", "`"),
+    "java": ('"""', '"', "'"),
+    "cpp": ('"', "'"),
+    "c++": ('"', "'"),
+    "c": ('"', "'"),
+    "csharp": ('"', "'"),
+    "go": ('"', "'", "`"),
+    "rust": ('"', "'"),
+    "sql": ("'", '"'),
+}
+
+# language -> delimiters whose strings have no backslash escapes
+RAW_DELIMITERS = {"go": ("`",)}
+
+# Languages where a quote inside a number is a digit separator (1'000'000)
+DIGIT_SEPARATOR_QUOTE = {"cpp", "c++", "c"}
+
+# A Rust character literal; any other quote starts a lifetime or label ('a)
+RUST_CHAR_LITERAL = re.compile(r"'(?:[^'\\\n]|\\(?:u\{[0-9a-fA-F]{1,6}\}|x[0-9a-fA-F]{2}|.))'")
+
+# Languages where leading indentation is part of the program
+INDENT_SIGNIFICANT = {"python"}
+
+
+def _string_delimiter(code: str, i: int, language: str) -> Optional[str]:
+    """The string delimiter starting at code[i] in this language, if any"""
+    for delimiter in STRING_DELIMITERS.get(language, ()):
+        if not code.startswith(delimiter, i):
+            continue
+        if delimiter == "'" and language in DIGIT_SEPARATOR_QUOTE:
+            start = i
+            while start > 0 and (code[start - 1].isalnum() or code[start - 1] in "_.'"):
+                start -= 1
+            if code[start:i][:1].isdigit():
+                return None
+        if delimiter == "'" and language == "rust" and not RUST_CHAR_LITERAL.match(code, i):
+            return None
+        return delimiter
+    return None
+
+
+def normalize_code(code: str, language: str) -> str:
+    """
+    Drop comments, blank lines and insignificant whitespace. String literals
+    are left untouched, so programs that differ in what they print never
+    normalize to the same text. For languages without an entry in
+    STRING_DELIMITERS only blank lines and line-end whitespace are dropped.
+    """
+    language = (language or "").lower()
+    line_comment, block_comments = COMMENT_SYNTAX.get(language, (None, False))
+    known = language in STRING_DELIMITERS
+    out = []
+    quote = None
+    i = 0
+    n = len(code)
+    while i < n:
+        ch = code[i]
+        if quote:
+            if ch == "\\" and i + 1 < n and quote not in RAW_DELIMITERS.get(language, ()):
+                out.append(code[i:i + 2])
+                i += 2
+            elif code.startswith(quote, i):
+                out.append(quote)
+                i += len(quote)
+                quote = None
+            else:
+                out.append(ch)
+                i += 1
+        elif known and (delimiter := _string_delimiter(code, i, language)):
+            quote = delimiter
+            out.append(quote)
+            i += len(quote)
+        elif line_comment and code.startswith(line_comment, i):
+            end = code.find("\n", i)
+            i = n if end == -1 else end
+        elif block_comments and code.startswith("/*", i):
+            end = code.find("*/", i + 2)
+            i = n if end == -1 else end + 2
+            if out and out[-1] not in " \n":
+                out.append(" ")  # keep the tokens on either side apart
+        elif ch in " \t":
+            # Collapse a run outside strings, but keep it whole at the start of a line
+            start = i
+            while i < n and code[i] in " \t":
+                i += 1
+            at_line_start = not out or out[-1] == "\n"
+            if at_line_start and language in INDENT_SIGNIFICANT:
+                out.append(code[start:i].expandtabs(4))
+            elif not known:
+                out.append(code[start:i])
+            elif not out or out[-1] != " ":
+                out.append(" ")
+        else:
+            out.append(ch)
+            i += 1
+
+    lines = []
+    for line in "".join(out).replace("\r\n", "\n").split("\n"):
+        line = line.rstrip()
+        if language not in INDENT_SIGNIFICANT:
+            line = line.lstrip()
+        if line.strip():
+            lines.append(line)
+    return "\n".join(lines)
+
+
+class EvaluationCache:
+    """
+    Two tiers: an in-memory LRU of max_entries evaluations, and optionally a
+    SQLite table shared across restarts and worker processes. Entries older
+    than ttl seconds are treated as misses and removed.
+    """
+
+    def __init__(self, max_entries: int = EVAL_CACHE_MAX_ENTRIES, ttl: float = EVAL_CACHE_TTL,
+                 db_path: str = EVAL_CACHE_DB):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.db_path = db_path or None
+        self.entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (created_at, result), oldest first
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "expired": 0, "evictions": 0}
+        self._lock = threading.Lock()
+        self._db = None
+        if self.db_path:
+            try:
+                self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS evaluations (key TEXT PRIMARY KEY, created_at REAL, result TEXT)")
+                self._db.commit()
+            except sqlite3.Error as e:
+                print(f"[EvaluationCache] Disk tier disabled, could not open {self.db_path}: {e}")
+                self._db = None
+
+    @staticmethod
+    def make_key(code: str, language: str, question: str, expected_output: Optional[str], model: str) -> str:
+        digest = hashlib.sha256()
+        language = (language or "").lower()
+        for part in (normalize_code(code, language), language, (question or "").strip(),
+                     (expected_output or "").strip(), model):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0\0")
+        return digest.hexdigest()
+
+    def _expired(self, created_at: float) -> bool:
+        return time.time() - created_at > self.ttl
+
+    def get(self, key: str) -> Optional[Dict]:
+        """A copy of the cached evaluation for key, or None on a miss"""
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if not self._expired(entry[0]):
+                    self.entries.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    return dict(entry[1])
+                del self.entries[key]
+                self.stats["expired"] += 1
+
+            if self._db is not None:
+                try:
+                    row = self._db.execute(
+                        "SELECT created_at, result FROM evaluations WHERE key = ?", (key,)).fetchone()
+                    if row and self._expired(row[0]):
+                        self._db.execute("DELETE FROM evaluations WHERE key = ?", (key,))
+                        self._db.commit()
+                        self.stats["expired"] += 1
+                    elif row:
+                        result = json.loads(row[1])
+                        self._remember(key, row[0], result)
+                        self.stats["disk_hits"] += 1
+                        return dict(result)
+                except (sqlite3.Error, ValueError) as e:
+                    print(f"[EvaluationCache] Disk lookup failed: {e}")
+
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, key: str, result: Dict):
+        created_at = time.time()
+        with self._lock:
+            self._remember(key, created_at, dict(result))
+            self.stats["stores"] += 1
+            if self._db is not None:
+                try:
+                    self._db.execute("INSERT OR REPLACE INTO evaluations (key, created_at, result) VALUES (?, ?, ?)",
+                                     (key, created_at, json.dumps(result)))
+                    self._db.commit()
+                except (sqlite3.Error, TypeError, ValueError) as e:
+                    print(f"[EvaluationCache] Disk store failed: {e}")
+
+    def _remember(self, key: str, created_at: float, result: Dict):
+        self.entries[key] = (created_at, result)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+            lookups = hits + self.stats["misses"]
+            return {
+                **self.stats,
+                "hit_rate": round(hits / lookups, 3) if lookups else 0,
+                "entries": len(self.entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "disk_tier": self._db is not None,
+            }
+
+
+_evaluation_cache: Optional[EvaluationCache] = None
+_evaluation_cache_lock = threading.Lock()
+
+
+def get_evaluation_cache() -> EvaluationCache:
+    """Return the shared cache, creating it on first use"""
+    global _evaluation_cache
+    if _evaluation_cache is None:
+        with _evaluation_cache_lock:
+            if _evaluation_cache is None:
+                _evaluation_cache = EvaluationCache()
+    return _evaluation_cache
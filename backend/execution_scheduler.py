@@ -0,0 +1,190 @@
+"""
+Execution Scheduler
+Fair-share admission in front of code execution: per-session token buckets,
+a global concurrency cap and priority lanes (interactive runs before batch
+evaluation), with round-robin between sessions inside a lane
+"""
+import asyncio
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, Optional
+
+
+LANE_INTERACTIVE = "interactive"
+LANE_BATCH = "batch"
+LANES = (LANE_INTERACTIVE, LANE_BATCH)  # highest priority first
+
+
+class QuotaExceeded(Exception):
+    """Raised when a session may not run now; retry_after is in seconds"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Classic token bucket: capacity tokens, refilled at rate tokens per second"""
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, cost: float = 1.0) -> float:
+        """Take cost tokens; returns 0 on success, otherwise seconds until they are available"""
+        self._refill()
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate if self.rate > 0 else float("inf")
+
+    def is_full(self) -> bool:
+        self._refill()
+        return self.tokens >= self.capacity
+
+
+class ExecutionScheduler:
+    """
+    Admits at most max_concurrency executions at once. Waiters are served by
+    lane priority, then round-robin across sessions so one busy session can't
+    starve the rest. Must be used from a single event loop.
+    """
+
+    def __init__(self, max_concurrency: int, bucket_capacity: float = 10, refill_per_second: float = 1.0,
+                 max_queued_per_session: int = 5, batch_cost: float = 3.0, wait_samples: int = 500):
+        self.max_concurrency = max_concurrency
+        self.bucket_capacity = bucket_capacity
+        self.refill_per_second = refill_per_second
+        self.max_queued_per_session = max_queued_per_session
+        self.lane_costs = {LANE_INTERACTIVE: 1.0, LANE_BATCH: batch_cost}
+        self.running = 0
+        self.buckets: Dict[str, TokenBucket] = {}
+        # lane -> session -> waiting futures; OrderedDict order is the round-robin order
+        self.queues: Dict[str, "OrderedDict[str, Deque[asyncio.Future]]"] = {lane: OrderedDict() for lane in LANES}
+        self.queued_per_session: Dict[str, int] = {}
+        self.waits: Dict[str, Deque[float]] = {lane: deque(maxlen=wait_samples) for lane in LANES}
+        self.stats = {"admitted": 0, "rejected_rate": 0, "rejected_queue": 0}
+
+    def _check_quota(self, session_id: str, lane: str):
+        if self.queued_per_session.get(session_id, 0) >= self.max_queued_per_session:
+            self.stats["rejected_queue"] += 1
+            raise QuotaExceeded("Too many queued executions for this session", 1.0)
+        bucket = self.buckets.get(session_id)
+        if bucket is None:
+            bucket = self.buckets[session_id] = TokenBucket(self.bucket_capacity, self.refill_per_second)
+        retry_after = bucket.take(self.lane_costs.get(lane, 1.0))
+        if retry_after:
+            self.stats["rejected_rate"] += 1
+            raise QuotaExceeded("Execution rate limit exceeded for this session", retry_after)
+
+    def _prune_buckets(self):
+        # Full buckets carry no state worth keeping
+        if len(self.buckets) > 1000:
+            for session_id in [s for s, b in self.buckets.items() if b.is_full()]:
+                del self.buckets[session_id]
+
+    def _has_waiters(self) -> bool:
+        return any(self.queues[lane] for lane in LANES)
+
+    async def acquire(self, session_id: Optional[str] = None, lane: str = LANE_INTERACTIVE, charge: bool = True):
+        """
+        Wait for an execution slot. session_id None skips quotas (internal work);
+        charge=False skips them too but keeps the session's round-robin turn,
+        for follow-up work of a request that was already charged.
+        Raises QuotaExceeded when the session is over its rate or queue limit.
+        """
+        if lane not in self.queues:
+            raise ValueError(f"Unknown lane '{lane}'")
+        if session_id is not None and charge:
+            self._check_quota(session_id, lane)
+            self._prune_buckets()
+        enqueued_at = time.monotonic()
+
+        if self.running < self.max_concurrency and not self._has_waiters():
+            self.running += 1
+        else:
+            key = session_id or ""
+            future = asyncio.get_running_loop().create_future()
+            self.queues[lane].setdefault(key, deque()).append(future)
+            self.queued_per_session[key] = self.queued_per_session.get(key, 0) + 1
+            try:
+                await future
+            except asyncio.CancelledError:
+                self._forget(lane, key, future)
+                if future.done() and not future.cancelled():
+                    # Slot was handed over just as the caller went away
+                    self.release()
+                raise
+            finally:
+                remaining = self.queued_per_session.get(key, 1) - 1
+                if remaining > 0:
+                    self.queued_per_session[key] = remaining
+                else:
+                    self.queued_per_session.pop(key, None)
+
+        self.waits[lane].append(time.monotonic() - enqueued_at)
+        self.stats["admitted"] += 1
+
+    def _forget(self, lane: str, key: str, future: asyncio.Future):
+        waiters = self.queues[lane].get(key)
+        if waiters and future in waiters:
+            waiters.remove(future)
+            if not waiters:
+                del self.queues[lane][key]
+
+    def release(self):
+        """Free a slot and hand it to the next waiter"""
+        self.running -= 1
+        while self.running < self.max_concurrency:
+            future = self._next_waiter()
+            if future is None:
+                return
+            if not future.done():
+                self.running += 1
+                future.set_result(None)
+
+    def _next_waiter(self) -> Optional[asyncio.Future]:
+        for lane in LANES:
+            queue = self.queues[lane]
+            if queue:
+                key, waiters = queue.popitem(last=False)
+                future = waiters.popleft()
+                if waiters:
+                    queue[key] = waiters  # back of the round-robin order
+                return future
+        return None
+
+    @asynccontextmanager
+    async def slot(self, session_id: Optional[str] = None, lane: str = LANE_INTERACTIVE, charge: bool = True):
+        await self.acquire(session_id, lane, charge)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def get_stats(self) -> Dict:
+        lanes = {}
+        for lane in LANES:
+            waits = sorted(self.waits[lane])
+            lanes[lane] = {
+                "queued": sum(len(w) for w in self.queues[lane].values()),
+                "avg_wait_ms": round(sum(waits) / len(waits) * 1000, 2) if waits else 0,
+                "p95_wait_ms": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000, 2) if waits else 0,
+                "max_wait_ms": round(waits[-1] * 1000, 2) if waits else 0,
+            }
+        return {
+            "max_concurrency": self.max_concurrency,
+            "running": self.running,
+            "sessions_tracked": len(self.buckets),
+            "lanes": lanes,
+            **self.stats,
+        }
+
@@ -2,15 +2,81 @@
 Interview Session Manager
 Tracks interview state, rounds, scores, and metrics
 """
-from typing import Dict, List, Optional
-from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime, timezone
 import json
+import os
+import secrets
+
+
+# Proctoring events kept in memory per session; older ones are overwritten
+PROCTORING_TIMELINE_CAPACITY = int(os.getenv("PROCTORING_TIMELINE_CAPACITY", "512"))
+
+
+def utc_timestamp(value: Optional[str] = None) -> str:
+    """
+    ISO 8601 timestamp in UTC with an explicit offset. Client-supplied ISO
+    strings are converted; naive ones are taken as UTC; missing or invalid
+    values mean now.
+    """
+    try:
+        moment = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except (AttributeError, ValueError):
+        moment = datetime.now(timezone.utc)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc).isoformat()
+
+
+class ProctoringTimeline:
+    """
+    Fixed-size ring buffer of proctoring events. Slots are allocated up front,
+    so a session never holds more than capacity events however long it runs.
+    Tracks which events have not been written to the database yet.
+    """
+
+    def __init__(self, capacity: int = PROCTORING_TIMELINE_CAPACITY):
+        self.capacity = max(1, capacity)
+        self._events: List[Optional[Dict]] = [None] * self.capacity
+        self._next = 0  # slot the next event goes into
+        self.total = 0  # events ever appended
+        self.flushed = 0  # value of total at the last flush
+        self.lost = 0  # events overwritten before they were flushed
+
+    def append(self, event: Dict):
+        self._events[self._next] = event
+        self._next = (self._next + 1) % self.capacity
+        self.total += 1
+
+    def __len__(self) -> int:
+        return min(self.total, self.capacity)
+
+    def _last(self, count: int) -> List[Dict]:
+        """The newest count events, oldest first"""
+        count = min(count, len(self))
+        start = (self._next - count) % self.capacity
+        end = start + count
+        if end <= self.capacity:
+            return self._events[start:end]
+        return self._events[start:] + self._events[:end - self.capacity]
+
+    def to_list(self) -> List[Dict]:
+        return self._last(len(self))
+
+    def unflushed(self) -> Tuple[List[Dict], int]:
+        """Events appended since the last flush and the total to pass to mark_flushed"""
+        return self._last(self.total - self.flushed), self.total
+
+    def mark_flushed(self, total: int):
+        self.lost += max(0, total - self.flushed - self.capacity)
+        self.flushed = total
 
 
 class InterviewSession:
     def __init__(self, user_id: str, interview_mode: str = "standard", personality: str = "professional"):
         self.user_id = user_id
-        self.session_id = f"{user_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        # Random suffix: clients present this id as a credential for execution quotas
+        self.session_id = f"{user_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{secrets.token_hex(8)}"
         self.start_time = datetime.now()
         self.interview_mode = interview_mode  # "standard", "multi-round", "scenario"
         self.personality = personality  # "professional", "tough", "friendly", "rapid-fire", "architect"
@@ -44,14 +110,15 @@ class InterviewSession:
             "response_times": []
         }
         
-        # Proctoring metrics
+        # Proctoring metrics; the timeline is kept in proctoring_timeline and
+        # filled in when the session is serialized
+        self.proctoring_timeline = ProctoringTimeline()
         self.proctoring = {
             "total_violations": 0,
             "eye_off_screen_percent": 0,
             "attention_level": 100,
             "confidence_score": 0,
-            "violation_types": {},
-            "timeline": []
+            "violation_types": {}
         }
         
         # Code analysis
@@ -113,8 +180,16 @@ class InterviewSession:
             avg = sum(self.communication["response_times"]) / len(self.communication["response_times"])
             self.communication["answer_length_avg"] = avg
     
-    def record_violation(self, violation_type: str):
+    def record_violation(self, violation_type: str, details: str = "", source: str = "client",
+                         timestamp: Optional[str] = None):
         """Record a proctoring violation"""
+        self.proctoring_timeline.append({
+            "type": violation_type,
+            "details": details,
+            "source": source,
+            "round": self.current_round,
+            "timestamp": utc_timestamp(timestamp),
+        })
         self.proctoring["total_violations"] += 1
         if violation_type not in self.proctoring["violation_types"]:
             self.proctoring["violation_types"][violation_type] = 0
@@ -156,6 +231,14 @@ class InterviewSession:
             (self.integrity["time_consistency"] * 0.2) - switch_penalty
         ))
     
+    def get_proctoring(self) -> Dict:
+        """Proctoring metrics including the event timeline"""
+        return {
+            **self.proctoring,
+            "timeline": self.proctoring_timeline.to_list(),
+            "timeline_lost": self.proctoring_timeline.lost,
+        }
+    
     def get_summary(self) -> Dict:
         """Get complete interview summary"""
         end_time = datetime.now()
@@ -173,7 +256,7 @@ class InterviewSession:
             "rounds": self.rounds,
             "skills": self.skills,
             "communication": self.communication,
-            "proctoring": self.proctoring,
+            "proctoring": self.get_proctoring(),
             "integrity": self.integrity,
             "code_attempts_count": len(self.code_attempts),
             "average_code_score": sum(self.code_scores) / len(self.code_scores) if self.code_scores else 0,
@@ -194,7 +277,7 @@ class InterviewSession:
             "rounds": self.rounds,
             "skills": self.skills,
             "communication": self.communication,
-            "proctoring": self.proctoring,
+            "proctoring": self.get_proctoring(),
             "integrity": self.integrity,
             "code_attempts": self.code_attempts,
             "code_scores": self.code_scores,
@@ -208,3 +291,11 @@ class InterviewSession:
 # Global session storage (in-memory for MVP)
 active_sessions: Dict[str, InterviewSession] = {}
 
+
+def find_session(session_id: str) -> Optional[InterviewSession]:
+    """The active session with this session_id, if any"""
+    for session in list(active_sessions.values()):
+        if session.session_id == session_id:
+            return session
+    return None
+
@@ -0,0 +1,173 @@
+"""
+LLM Client
+Shared async front for Gemini calls from request handlers: a concurrency cap,
+per-call timeouts and cancellation, so a slow model round trip never blocks
+the event loop. Uses the SDK's native async methods and falls back to a
+dedicated thread pool for calls that only exist in blocking form. Streaming
+variants yield response chunks as the model produces them.
+"""
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import AsyncIterator, Dict, Optional
+
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+
+
+class LLMTimeout(Exception):
+    """The model did not answer within the timeout"""
+
+
+_END = object()
+
+
+class LLMClient:
+    """
+    At most max_concurrency calls are in flight; callers beyond that wait
+    their turn. Cancelling the awaiting task cancels a native async call; a
+    call running on the thread pool finishes in the background and its
+    result is discarded.
+    """
+
+    def __init__(self, max_concurrency: int = LLM_MAX_CONCURRENCY, timeout: float = LLM_TIMEOUT_SECONDS):
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="llm")
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self.metrics = {
+            "calls": 0,
+            "in_flight": 0,
+            "timeouts": 0,
+            "cancelled": 0,
+            "errors": 0,
+            "streams": 0,
+            "total_seconds": 0.0,
+            "first_chunk_seconds": 0.0,
+        }
+
+    def _count(self, key: str, amount=1):
+        with self._lock:
+            self.metrics[key] += amount
+
+    async def _call(self, make_awaitable, timeout: Optional[float]):
+        timeout = self.timeout if timeout is None else timeout
+        async with self._semaphore:
+            self._count("in_flight")
+            start = time.perf_counter()
+            try:
+                return await asyncio.wait_for(make_awaitable(), timeout)
+            except asyncio.TimeoutError:
+                self._count("timeouts")
+                raise LLMTimeout(f"Model did not respond within {timeout:g} seconds")
+            except asyncio.CancelledError:
+                self._count("cancelled")
+                raise
+            except Exception:
+                self._count("errors")
+                raise
+            finally:
+                self._count("in_flight", -1)
+                self._count("calls")
+                self._count("total_seconds", time.perf_counter() - start)
+
+    def _in_pool(self, func, *args):
+        return asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def _next_chunk(self, chunks):
+        if hasattr(chunks, "__anext__"):
+            return await chunks.__anext__()
+        chunk = await self._in_pool(next, chunks, _END)
+        if chunk is _END:
+            raise StopAsyncIteration
+        return chunk
+
+    async def _stream(self, open_stream, timeout: Optional[float]) -> AsyncIterator:
+        """
+        Yield chunks from the stream open_stream() resolves to. The timeout
+        covers the whole stream, and the call holds its concurrency slot
+        until the stream ends or the consumer stops iterating.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        loop = asyncio.get_running_loop()
+        async with self._semaphore:
+            self._count("in_flight")
+            self._count("streams")
+            start = loop.time()
+            deadline = start + timeout
+            first_chunk = True
+            try:
+                response = await asyncio.wait_for(open_stream(), timeout)
+                chunks = response.__aiter__() if hasattr(response, "__aiter__") else iter(response)
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(self._next_chunk(chunks), max(0, deadline - loop.time()))
+                    except StopAsyncIteration:
+                        break
+                    if first_chunk:
+                        first_chunk = False
+                        self._count("first_chunk_seconds", loop.time() - start)
+                    yield chunk
+            except asyncio.TimeoutError:
+                self._count("timeouts")
+                raise LLMTimeout(f"Model did not finish streaming within {timeout:g} seconds")
+            except (asyncio.CancelledError, GeneratorExit):
+                self._count("cancelled")
+                raise
+            except Exception:
+                self._count("errors")
+                raise
+            finally:
+                self._count("in_flight", -1)
+                self._count("calls")
+                self._count("total_seconds", loop.time() - start)
+
+    async def run(self, func, *args, timeout: Optional[float] = None, **kwargs):
+        """Run a blocking call on the LLM thread pool"""
+        return await self._call(lambda: self._in_pool(partial(func, *args, **kwargs)), timeout)
+
+    async def generate_content(self, model, prompt, timeout: Optional[float] = None, **kwargs):
+        """model.generate_content without blocking the event loop"""
+        if hasattr(model, "generate_content_async"):
+            return await self._call(lambda: model.generate_content_async(prompt, **kwargs), timeout)
+        return await self.run(model.generate_content, prompt, timeout=timeout, **kwargs)
+
+    async def send_message(self, chat, message, timeout: Optional[float] = None, **kwargs):
+        """chat.send_message without blocking the event loop"""
+        if hasattr(chat, "send_message_async"):
+            return await self._call(lambda: chat.send_message_async(message, **kwargs), timeout)
+        return await self.run(chat.send_message, message, timeout=timeout, **kwargs)
+
+    def stream_content(self, model, prompt, timeout: Optional[float] = None, **kwargs) -> AsyncIterator:
+        """model.generate_content(stream=True) as an async iterator of chunks"""
+        if hasattr(model, "generate_content_async"):
+            return self._stream(lambda: model.generate_content_async(prompt, stream=True, **kwargs), timeout)
+        return self._stream(lambda: self._in_pool(partial(model.generate_content, prompt, stream=True, **kwargs)), timeout)
+
+    def stream_message(self, chat, message, timeout: Optional[float] = None, **kwargs) -> AsyncIterator:
+        """chat.send_message(stream=True) as an async iterator of chunks"""
+        if hasattr(chat, "send_message_async"):
+            return self._stream(lambda: chat.send_message_async(message, stream=True, **kwargs), timeout)
+        return self._stream(lambda: self._in_pool(partial(chat.send_message, message, stream=True, **kwargs)), timeout)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            metrics = dict(self.metrics)
+        calls = metrics["calls"]
+        streams = metrics["streams"]
+        total_seconds = metrics.pop("total_seconds")
+        first_chunk_seconds = metrics.pop("first_chunk_seconds")
+        metrics["avg_latency_ms"] = round(total_seconds / calls * 1000, 2) if calls else 0
+        metrics["avg_first_chunk_ms"] = round(first_chunk_seconds / streams * 1000, 2) if streams else 0
+        metrics["max_concurrency"] = self.max_concurrency
+        metrics["timeout_seconds"] = self.timeout
+        return metrics
+
+
+# Shared by every module that talks to Gemini
+llm_client = LLMClient()
@@ -1,26 +1,30 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, UploadFile, File, Form, HTTPException, Depends, Query
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, UploadFile, File, Form, HTTPException, Depends, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from proctoring import Proctor
+from proctoring import create_proctor, close_proctor, get_proctoring_metrics, parse_binary_frame, alert_type, PROCTOR_MAX_WORKERS
 from ai_interviewer import InterviewerAI
-from code_engine import execute_code, execute_sql_query
+from llm_client import llm_client
+from code_engine import execute_code_async, execute_sql_query_async, run_execution, get_execution_metrics, run_test_cases_async, start_streaming_execution, execution_scheduler
+from execution_scheduler import QuotaExceeded, LANE_BATCH
+from compile_cache import get_compile_cache
+from evaluation_cache import get_evaluation_cache
+from toolchains import toolchains
 from auth import (
     register_user, verify_otp, login_user, verify_login_otp, 
     verify_token, get_user_from_token, TEST_EMAIL, TEST_PASSWORD
 )
-from interview_session import InterviewSession, active_sessions
+from interview_session import InterviewSession, active_sessions, find_session
 from analytics import AnalyticsEngine
 from personalities import get_personality_prompt, get_personality_info, list_personalities
 from code_revision import CodeRevision
-from database import init_db, get_db, User, InterviewSession as DBSession, ResumeData, Leaderboard, UserStreak
+from database import init_db, get_db, save_proctoring_events, User, InterviewSession as DBSession, ResumeData, Leaderboard, UserStreak
 from resume_parser import ResumeParser
 from bug_scenarios import get_scenario, list_scenarios
 from db_optimization_lab import DatabaseOptimizationLab
 from multi_file_editor import MultiFileEditor
 from realtime_feedback import RealtimeFeedback
 from gamification import GamificationEngine
-import cv2
-import numpy as np
 import base64
 import os
 from pydantic import BaseModel
@@ -32,6 +36,9 @@ import tempfile
 from dotenv import load_dotenv
 import sys
 import io
+import json
+import asyncio
+import math
 
 # Fix Windows encoding issues for console output
 # Note: We don't replace sys.stdout/stderr directly to avoid "I/O operation on closed file" errors
@@ -69,6 +76,30 @@ app.add_middleware(
     expose_headers=["*"],
 )
 
+
+@app.exception_handler(QuotaExceeded)
+async def quota_exceeded_handler(request: Request, exc: QuotaExceeded):
+    """Execution rate/queue limits map to 429 with a Retry-After hint"""
+    retry_after = max(1, math.ceil(exc.retry_after))
+    return JSONResponse(
+        status_code=429,
+        content={"status": "error", "output": str(exc), "retry_after": retry_after},
+        headers={"Retry-After": str(retry_after)}
+    )
+
+
+def execution_session_id(session_id: Optional[str], request) -> str:
+    """
+    Key for per-session execution quotas: the interview session if the id
+    matches a live one, else the client address. The id comes from the
+    client, so unknown ids count against the address rather than getting a
+    fresh quota each.
+    """
+    if session_id and find_session(session_id) is not None:
+        return f"session:{session_id}"
+    client = getattr(request, "client", None)
+    return f"ip:{client.host if client else 'unknown'}"
+
 # Initialize database FIRST (before other services)
 print("=" * 50)
 print("Initializing Database...")
@@ -84,9 +115,12 @@ ai = InterviewerAI(system_prompt_path=system_prompt_path)
 print(f"InterviewerAI initialized with model: {ai.model_name}")
 print("=" * 50)
 
-print("Initializing Proctor...")
-proctor = Proctor()
-print("Proctor initialized")
+print("Detecting language toolchains...")
+for name, info in toolchains.refresh().items():
+    print(f"  {name}: {info['version'] if info['available'] else 'not available'}")
+
+# Each /ws/video connection gets its own Proctor; inference runs on a shared pool
+print(f"Proctor inference pool: {PROCTOR_MAX_WORKERS} workers")
 
 print("Initializing Code Revision...")
 code_revision = CodeRevision()
@@ -225,6 +259,8 @@ class ChatMessage(BaseModel):
 class CodeRequest(BaseModel):
     code: str
     language: Optional[str] = "python"
+    user_id: Optional[str] = None
+    session_id: Optional[str] = None  # interview session, for execution quotas
 
 class CodeEvaluationRequest(BaseModel):
     code: str
@@ -234,8 +270,25 @@ class CodeEvaluationRequest(BaseModel):
     user_id: Optional[str] = None
 
 
+class TestCase(BaseModel):
+    input: Optional[str] = ""
+    expected_output: str
+
+
+class TestCaseEvaluationRequest(BaseModel):
+    code: str
+    language: str
+    test_cases: List[TestCase]
+    question: Optional[str] = None
+    timeout: Optional[float] = 5
+    user_id: Optional[str] = None
+    session_id: Optional[str] = None
+
+
 class SQLRequest(BaseModel):
     query: str
+    user_id: Optional[str] = None
+    session_id: Optional[str] = None
 
 
 class RegisterRequest(BaseModel):
@@ -272,6 +325,7 @@ async def root():
             "run_code": "/run_code",
             "run_sql": "/run_sql",
             "websocket": "/ws/video",
+            "run_stream": "/ws/run",
             "auth": "/register, /verify-otp, /login, /verify-login-otp"
         }
     }
@@ -283,10 +337,24 @@ async def health_check():
     return {
         "status": "healthy",
         "backend": "running",
-        "timestamp": datetime.now().isoformat()
+        "timestamp": datetime.now().isoformat(),
+        "code_execution": get_execution_metrics(),
+        "compile_cache": get_compile_cache().get_stats(),
+        "evaluation_cache": get_evaluation_cache().get_stats(),
+        "toolchains": toolchains.to_dict()["toolchains"],
+        "proctoring": get_proctoring_metrics(),
+        "conversations": ai.get_context_stats(),
+        "llm": llm_client.get_stats()
     }
 
 
+@app.post("/health/toolchains/refresh")
+async def refresh_toolchains():
+    """Re-detect installed language toolchains (e.g. after installing a JDK)"""
+    await run_execution(toolchains.refresh)
+    return toolchains.to_dict()
+
+
 # Authentication Endpoints
 @app.post("/register")
 async def register_endpoint(data: RegisterRequest):
@@ -404,7 +472,7 @@ async def get_ai_status():
         try:
             model = genai.GenerativeModel(ai.model_name)
             # Just check if model is accessible - don't access .text to avoid errors
-            test_response = model.generate_content("test", generation_config={"max_output_tokens": 1})
+            test_response = await llm_client.generate_content(model, "test", timeout=15, generation_config={"max_output_tokens": 1})
             # Check if response is valid (don't access .text as it might fail)
             if not test_response or not hasattr(test_response, 'candidates'):
                 raise Exception("Invalid API response")
@@ -413,7 +481,7 @@ async def get_ai_status():
             try:
                 print(f"[AI Status] Model {ai.model_name} failed, trying gemini-2.0-flash")
                 model = genai.GenerativeModel("gemini-2.0-flash")
-                test_response = model.generate_content("test", generation_config={"max_output_tokens": 1})
+                test_response = await llm_client.generate_content(model, "test", timeout=15, generation_config={"max_output_tokens": 1})
                 if not test_response or not hasattr(test_response, 'candidates'):
                     raise Exception("Invalid API response")
                 ai.model_name = "gemini-2.0-flash"
@@ -441,11 +509,12 @@ async def get_ai_status():
 # Track question count for test accounts
 test_account_question_count = {}  # {user_email: count}
 
-@app.post("/chat")
-async def chat_endpoint(data: ChatMessage):
-    """Handle chat messages with the AI interviewer"""
-    import time
-    
+def _begin_chat(data: ChatMessage) -> Dict:
+    """
+    Session bookkeeping before the interviewer replies. Returns the state
+    _finish_chat needs; "limit_reply" is set when the test account is out
+    of questions and the reply should be returned as is.
+    """
     user_text = data.message
     start_time = time.time()
     
@@ -460,7 +529,7 @@ async def chat_endpoint(data: ChatMessage):
             personality="professional"
         )
         # Reset AI context for new session
-        ai.context = []
+        ai.reset_context(user_id)
         print(f"[Chat] New session for {user_id}, resetting AI context")
     
     session = active_sessions[user_id]
@@ -474,12 +543,13 @@ async def chat_endpoint(data: ChatMessage):
     ])
     
     # If it's a readiness confirmation and we have minimal context, ensure AI asks first question
-    if is_readiness_confirmation and len(ai.context) <= 2:
+    context = ai.contexts.get(user_id)
+    if is_readiness_confirmation and len(context) <= 2:
         print(f"[Chat] User confirmed readiness, ensuring AI asks first question")
         # Reset context slightly to ensure fresh start
-        if len(ai.context) > 0:
+        if len(context) > 0:
             # Keep only the welcome message if it exists
-            ai.context = [msg for msg in ai.context if 'ready' in msg.get('parts', [''])[0].lower() or 'welcome' in msg.get('parts', [''])[0].lower()]
+            ai.contexts.set(user_id, [msg for msg in context if 'ready' in msg.get('parts', [''])[0].lower() or 'welcome' in msg.get('parts', [''])[0].lower()])
     
     # Check if this is a test account and limit questions
     is_test_account = False
@@ -500,12 +570,12 @@ async def chat_endpoint(data: ChatMessage):
             # Count questions from AI responses (not user messages)
             # We'll count when AI responds, so check before generating response
             if test_account_question_count[user_email] >= 3:
-                return {
+                return {"limit_reply": {
                     "reply": "Thank you for testing Aptiva! You've completed the test interview with 3 questions. This is a test account limitation. For a full interview experience, please sign up with a regular account.",
                     "is_coding_question": False,
                     "suggested_language": None,
                     "test_limit_reached": True
-                }
+                }}
     
     # Track user response in session
     session.conversation_history.append({
@@ -514,9 +584,23 @@ async def chat_endpoint(data: ChatMessage):
         "timestamp": time.time()
     })
     
-    # Get AI response
-    response = ai.chat(user_text)
-    response_time = time.time() - start_time
+    return {
+        "limit_reply": None,
+        "user_id": user_id,
+        "user_text": user_text,
+        "session": session,
+        "start_time": start_time,
+        "is_test_account": is_test_account,
+        "user_email": user_email,
+    }
+
+
+def _finish_chat(chat: Dict, response: str) -> Dict:
+    """Record the interviewer's reply in the session and build the /chat result"""
+    session = chat["session"]
+    user_text = chat["user_text"]
+    user_email = chat["user_email"]
+    response_time = time.time() - chat["start_time"]
     
     # Track AI response in session
     session.conversation_history.append({
@@ -541,7 +625,7 @@ async def chat_endpoint(data: ChatMessage):
     
     # Increment question count for test accounts (only for AI responses that are questions)
     # Don't count the initial welcome message - only count actual questions
-    if is_test_account and user_email:
+    if chat["is_test_account"] and user_email:
         # Check if the response is a question (contains question mark or is asking something)
         # Exclude welcome messages and greetings
         is_welcome = any(phrase in response.lower() for phrase in [
@@ -571,21 +655,68 @@ async def chat_endpoint(data: ChatMessage):
     }
 
 
+@app.post("/chat")
+async def chat_endpoint(data: ChatMessage):
+    """Handle chat messages with the AI interviewer"""
+    chat = _begin_chat(data)
+    if chat["limit_reply"]:
+        return chat["limit_reply"]
+    response = await ai.chat(chat["user_text"], session_id=chat["user_id"])
+    return _finish_chat(chat, response)
+
+
+def _sse(event: str, data: Dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(data: ChatMessage):
+    """
+    /chat as server-sent events: "delta" events carry reply text as it
+    arrives, "coding" fires once as soon as the partial reply looks like a
+    coding question, and "done" carries the same body /chat returns.
+    """
+    chat = _begin_chat(data)
+
+    async def events():
+        if chat["limit_reply"]:
+            yield _sse("done", chat["limit_reply"])
+            return
+        parts = []
+        coding_sent = False
+        async for text in ai.chat_stream(chat["user_text"], session_id=chat["user_id"]):
+            parts.append(text)
+            yield _sse("delta", {"text": text})
+            if not coding_sent:
+                partial = "".join(parts)
+                if not ai.is_coding_question(partial):
+                    continue
+                coding_sent = True
+                yield _sse("coding", {
+                    "is_coding_question": True,
+                    "suggested_language": ai.detect_language_from_question(partial)
+                })
+        yield _sse("done", _finish_chat(chat, "".join(parts)))
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
 @app.post("/run_code")
-async def run_code_endpoint(data: CodeRequest):
+async def run_code_endpoint(data: CodeRequest, request: Request):
     """Execute code in the specified language"""
     code = data.code
     language = data.language or "python"
     
-    result = execute_code(code, language)
+    result = await execute_code_async(code, language, session_id=execution_session_id(data.session_id, request))
     return result
 
 
 @app.post("/run_sql")
-async def run_sql_endpoint(data: SQLRequest):
+async def run_sql_endpoint(data: SQLRequest, request: Request):
     """Execute SQL query safely"""
     query = data.query
-    result = execute_sql_query(query)
+    result = await execute_sql_query_async(query, session_id=execution_session_id(data.session_id, request))
     return result
 
 
@@ -594,7 +725,7 @@ async def evaluate_code_endpoint(data: CodeEvaluationRequest):
     """Evaluate if the code correctly solves the given question"""
     try:
         # Use AI to evaluate the code
-        evaluation = ai.evaluate_code(
+        evaluation = await ai.evaluate_code(
             code=data.code,
             language=data.language,
             question=data.question,
@@ -639,13 +770,72 @@ async def evaluate_code_endpoint(data: CodeEvaluationRequest):
         }
 
 
+MAX_TEST_CASES = 50
+
+
+@app.post("/evaluate_code/tests")
+async def evaluate_code_tests_endpoint(data: TestCaseEvaluationRequest, request: Request):
+    """Run the code against stdin/expected-stdout test cases for a deterministic score"""
+    if not data.test_cases:
+        raise HTTPException(status_code=400, detail="At least one test case is required")
+    if len(data.test_cases) > MAX_TEST_CASES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_TEST_CASES} test cases are allowed")
+    
+    result = await run_test_cases_async(
+        data.code,
+        data.language,
+        [case.model_dump() for case in data.test_cases],
+        timeout=max(1, min(data.timeout or 5, 10)),
+        session_id=execution_session_id(data.session_id, request),
+        lane=LANE_BATCH
+    )
+    
+    # Record the attempt with its test-based score
+    user_id = data.user_id or "anonymous"
+    if result.get("status") == "success" and user_id in active_sessions:
+        session = active_sessions[user_id]
+        session.add_code_attempt(
+            code=data.code,
+            question=data.question or "",
+            score=result["score"],
+            language=data.language
+        )
+        if session.code_scores:
+            avg_score = sum(session.code_scores) / len(session.code_scores)
+            session.update_skill("problem_solving", avg_score)
+    
+    return result
+
+
 @app.post("/reset_chat")
-async def reset_chat():
-    """Reset the conversation context"""
-    ai.reset_context()
+async def reset_chat(user_id: Optional[str] = None):
+    """Reset a user's conversation context"""
+    ai.reset_context(user_id or "anonymous")
     return {"message": "Chat context reset"}
 
 
+# One flush at a time, so events are never written twice
+_proctoring_flush_lock = asyncio.Lock()
+
+
+async def flush_proctoring_timeline(session: InterviewSession):
+    """Write the session's proctoring events recorded since the last flush in one batch"""
+    async with _proctoring_flush_lock:
+        events, total = session.proctoring_timeline.unflushed()
+        if not events:
+            return
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(
+                None, save_proctoring_events, session.session_id, events,
+                session.proctoring["total_violations"], session.integrity["overall_score"]
+            )
+            session.proctoring_timeline.mark_flushed(total)
+        except Exception as e:
+            # Events stay in the ring buffer and go out with the next flush
+            print(f"Failed to save proctoring events for {session.session_id}: {str(e)}")
+
+
 @app.post("/report_violation")
 async def report_violation(data: dict):
     """Report a proctoring violation from frontend"""
@@ -653,8 +843,12 @@ async def report_violation(data: dict):
     violation_details = data.get("details", "")
     timestamp = data.get("timestamp")
     
-    # Log violation (in production, store in database)
     print(f"VIOLATION DETECTED: {violation_type} - {violation_details} at {timestamp}")
+    session = active_sessions.get(data.get("user_id") or "")
+    if session is not None and violation_type:
+        session.record_violation(violation_type, violation_details, source="client", timestamp=timestamp)
+        if violation_type in ("tab_switch", "window_blur"):
+            session.record_window_switch()
     
     return {
         "status": "recorded",
@@ -665,50 +859,238 @@ async def report_violation(data: dict):
 # WebSocket for Real-time Video Proctoring
 @app.websocket("/ws/video")
 async def websocket_endpoint(websocket: WebSocket):
+    """
+    Accepts binary frames (16-byte header + raw JPEG/WebP, see
+    proctoring.FRAME_HEADER) and legacy base64 data-URL text frames.
+    Only the newest waiting frame is analyzed; older ones are dropped. The
+    client is sent {"type": "control", "capture_interval_ms", "max_width"}
+    whenever the recommended capture settings change. With ?user_id=...,
+    alerts are recorded in that user's interview session and written to the
+    database when the next round starts and when the socket closes.
+    """
     await websocket.accept()
+    user_id = websocket.query_params.get("user_id")
+    # Per-connection state: FaceMesh tracking, alert cooldowns and grace period
+    proctor = await create_proctor()
+    # Single-slot mailbox: a new frame replaces one that hasn't been picked up yet
+    pending = {"frame": None}
+    frame_ready = asyncio.Event()
+    last_control = {}
+    
+    async def record_alerts(alerts):
+        session = active_sessions.get(user_id) if user_id else None
+        if session is None:
+            return
+        for alert in alerts:
+            session.record_violation(alert_type(alert), alert, source="video")
+    
+    async def analyze_and_reply(img_data, seq=None):
+        extra = {"seq": seq} if seq is not None else {}
+        try:
+            # Decode and analyze on the inference pool
+            alerts = await proctor.analyze_image_async(img_data)
+            if alerts is not None:
+                # Send back alerts if any (deduplicate to prevent spam)
+                if alerts:
+                    # Filter out duplicate alerts in the same batch
+                    unique_alerts = list(set(alerts))
+                    await websocket.send_json({"alerts": unique_alerts, **extra})
+                    await record_alerts(unique_alerts)
+                # Don't send empty alerts - let frontend handle state
+            else:
+                print("Warning: Decoded frame is None or empty")
+                await websocket.send_json({"error": "Failed to decode image", **extra})
+        except Exception as e:
+            print(f"Error processing frame: {e}")
+            await websocket.send_json({"error": f"Error processing frame: {str(e)}", **extra})
+    
+    async def process_frames():
+        try:
+            while True:
+                await frame_ready.wait()
+                frame_ready.clear()
+                img_data, seq = pending["frame"]
+                pending["frame"] = None
+                await analyze_and_reply(img_data, seq)
+                
+                control = proctor.recommend_capture()
+                if control != last_control:
+                    last_control.clear()
+                    last_control.update(control)
+                    await websocket.send_json({"type": "control", **control, "frames": proctor.frame_stats})
+        except Exception as e:
+            # Socket went away mid-send; the receive loop handles cleanup
+            print(f"Frame processing stopped: {str(e)}")
+    
+    def enqueue_frame(img_data, seq=None):
+        proctor.frame_stats["received"] += 1
+        if pending["frame"] is not None:
+            proctor.record_dropped()
+        pending["frame"] = (img_data, seq)
+        frame_ready.set()
+    
+    processor = asyncio.create_task(process_frames())
     try:
         while True:
-            # Receive base64 frame from frontend
-            data = await websocket.receive_text()
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
             
-            # Handle base64 image data
+            # Binary frame: header + encoded image, decoded straight from the buffer
+            if message.get("bytes") is not None:
+                try:
+                    header, img_data = parse_binary_frame(message["bytes"])
+                except ValueError as e:
+                    await websocket.send_json({"error": f"Invalid frame: {str(e)}"})
+                    continue
+                enqueue_frame(img_data, header["seq"])
+                continue
+            
+            data = message.get("text") or ""
+            
+            # Legacy base64 data URL
             if data.startswith('data:image'):
                 try:
                     # Extract base64 data
                     header, encoded = data.split(',', 1)
                     img_data = base64.b64decode(encoded)
-                    np_arr = np.frombuffer(img_data, np.uint8)
-                    frame = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
-                    
-                    if frame is not None and frame.size > 0:
-                        # Analyze frame for proctoring violations
-                        alerts = proctor.analyze_frame(frame)
-                        
-                        # Send back alerts if any (deduplicate to prevent spam)
-                        if alerts:
-                            # Filter out duplicate alerts in the same batch
-                            unique_alerts = list(set(alerts))
-                            await websocket.send_json({"alerts": unique_alerts})
-                        # Don't send empty alerts - let frontend handle state
-                    else:
-                        print("Warning: Decoded frame is None or empty")
-                        await websocket.send_json({"error": "Failed to decode image"})
                 except Exception as e:
                     print(f"Error processing frame: {e}")
                     await websocket.send_json({"error": f"Error processing frame: {str(e)}"})
+                    continue
+                enqueue_frame(img_data)
             else:
                 # Handle text messages (e.g., ping/pong for connection keepalive)
                 if data == "ping":
                     await websocket.send_text("pong")
                     
     except WebSocketDisconnect:
-        print("Client disconnected from video stream")
+        print(f"Client disconnected from video stream (frames: {proctor.frame_stats})")
     except Exception as e:
         print(f"WebSocket error: {str(e)}")
         try:
             await websocket.close()
         except:
             pass
+    finally:
+        processor.cancel()
+        await close_proctor(proctor)
+        session = active_sessions.get(user_id) if user_id else None
+        if session is not None:
+            await flush_proctoring_timeline(session)
+
+
+STREAM_RUN_MAX_TIMEOUT = int(os.getenv("STREAM_RUN_MAX_TIMEOUT", "30"))
+
+
+# WebSocket for streaming program output while it runs
+@app.websocket("/ws/run")
+async def run_code_stream(websocket: WebSocket):
+    """
+    Client sends {"type": "start", "code", "language", "timeout", "user_id"}, then any of
+    {"type": "stdin", "data"}, {"type": "stdin_close"} and {"type": "cancel"}.
+    Server sends "started", "output" ({"stream", "data"}) chunks as they are
+    produced, and "exit" with status, duration and peak memory.
+    """
+    await websocket.accept()
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+    state = {"process": None, "running": False, "slot": False}
+    
+    def release_slot():
+        if state["slot"]:
+            state["slot"] = False
+            execution_scheduler.release()
+    
+    def on_output(stream, text):
+        loop.call_soon_threadsafe(events.put_nowait, {"type": "output", "stream": stream, "data": text})
+    
+    def on_exit(result):
+        ok = result["returncode"] == 0 and not result["limit_exceeded"] and not result["cancelled"]
+        exit_event = {
+            "type": "exit",
+            "status": "success" if ok else "error",
+            "returncode": result["returncode"],
+            "duration_ms": round(result["wall_time"] * 1000, 2),
+            "timed_out": result["timed_out"],
+            "cancelled": result["cancelled"],
+            "truncated": result["truncated"],
+            "limit_exceeded": result["limit_exceeded"]
+        }
+        # Only report memory that was actually measured for the program
+        if result["peak_rss_kb"] is not None:
+            exit_event["peak_rss_kb"] = result["peak_rss_kb"]
+        loop.call_soon_threadsafe(events.put_nowait, exit_event)
+    
+    async def forward_events():
+        while True:
+            message = await events.get()
+            if message["type"] == "exit":
+                state["running"] = False
+                release_slot()
+            await websocket.send_json(message)
+    
+    sender = asyncio.create_task(forward_events())
+    try:
+        while True:
+            data = await websocket.receive_text()
+            if data == "ping":
+                await websocket.send_text("pong")
+                continue
+            try:
+                message = json.loads(data)
+            except ValueError:
+                await websocket.send_json({"type": "error", "output": "Messages must be JSON"})
+                continue
+            
+            kind = message.get("type")
+            process = state["process"]
+            if kind == "start":
+                if state["running"]:
+                    await websocket.send_json({"type": "error", "output": "A program is already running"})
+                    continue
+                # The execution slot is held for the program's whole lifetime
+                try:
+                    await execution_scheduler.acquire(execution_session_id(message.get("session_id"), websocket))
+                except QuotaExceeded as e:
+                    await websocket.send_json({"type": "error", "output": str(e), "retry_after": max(1, math.ceil(e.retry_after))})
+                    continue
+                state["running"], state["slot"] = True, True
+                timeout = max(1, min(message.get("timeout") or 10, STREAM_RUN_MAX_TIMEOUT))
+                process, error = await loop.run_in_executor(None, lambda: start_streaming_execution(
+                    message.get("code") or "",
+                    message.get("language") or "python",
+                    on_output,
+                    on_exit,
+                    timeout=timeout,
+                    on_start=lambda: loop.call_soon_threadsafe(events.put_nowait, {"type": "started"})
+                ))
+                if error:
+                    state["running"] = False
+                    release_slot()
+                    await websocket.send_json({"type": "error", **error})
+                    continue
+                state["process"] = process
+            elif kind == "stdin" and state["running"]:
+                process.write_stdin(message.get("data") or "")
+            elif kind == "stdin_close" and state["running"]:
+                process.close_stdin()
+            elif kind == "cancel" and state["running"]:
+                process.cancel()
+    
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        print(f"Run stream WebSocket error: {str(e)}")
+        try:
+            await websocket.close()
+        except:
+            pass
+    finally:
+        if state["process"] is not None:
+            state["process"].cancel()
+        release_slot()
+        sender.cancel()
 
 
 # ====== NEW PREMIUM FEATURES ENDPOINTS ======
@@ -718,6 +1100,10 @@ class SessionRequest(BaseModel):
     interview_mode: Optional[str] = "standard"
     personality: Optional[str] = "professional"
 
+class RoundRequest(BaseModel):
+    user_id: str
+    round_number: int
+
 class PersonalityRequest(BaseModel):
     personality: str
 
@@ -752,6 +1138,19 @@ async def start_session(data: SessionRequest):
     }
 
 
+@app.post("/session/round/start")
+async def start_round(data: RoundRequest):
+    """Advance the session to a new round, writing out the previous round's proctoring events first"""
+    session = active_sessions.get(data.user_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="No active session for this user")
+    if data.round_number not in session.rounds:
+        raise HTTPException(status_code=400, detail=f"Unknown round {data.round_number}")
+    await flush_proctoring_timeline(session)
+    session.start_round(data.round_number)
+    return {"status": "success", "current_round": session.current_round}
+
+
 @app.get("/personalities")
 async def get_personalities():
     """List all available interviewer personalities"""
@@ -761,7 +1160,7 @@ async def get_personalities():
 @app.post("/code/improve")
 async def improve_code(data: CodeRevisionRequest):
     """Get AI-guided code revision"""
-    result = code_revision.improve_code(
+    result = await code_revision.improve_code(
         original_code=data.code,
         question=data.question,
         language=data.language
@@ -1074,7 +1473,8 @@ async def get_proctoring_insights(user_id: str):
             },
             "integrity_score": 100,
             "patterns": [],
-            "violation_breakdown": {}
+            "violation_breakdown": {},
+            "timeline": []
         }
     
     session = active_sessions[user_id]
@@ -1093,7 +1493,8 @@ async def get_proctoring_insights(user_id: str):
         },
         "integrity_score": integrity.get("overall_score", 100),
         "patterns": insights.get("patterns", []),
-        "violation_breakdown": insights.get("violation_breakdown", {})
+        "violation_breakdown": insights.get("violation_breakdown", {}),
+        "timeline": session.proctoring_timeline.to_list()
     }
 
 
@@ -1727,9 +2128,15 @@ async def create_multi_file_project(request: MultiFileProjectRequest, session_id
 
 
 @app.post("/multi-file/execute/{session_id}")
-async def execute_multi_file_project(session_id: str, entry_file: str, language: str):
+async def execute_multi_file_project(session_id: str, entry_file: str, language: str, request: Request):
     """Execute a multi-file project"""
-    result = multi_file_editor.execute_project(session_id, entry_file, language)
+    result = await run_execution(
+        multi_file_editor.execute_project,
+        session_id,
+        entry_file,
+        language,
+        session_id=execution_session_id(session_id, request)
+    )
     return result
 
 
@@ -1822,7 +2229,7 @@ async def cleanup_dataset(dataset_id: str):
 @app.post("/realtime-feedback/check/{session_id}")
 async def check_realtime_feedback(request: RealtimeCodeCheckRequest, session_id: str):
     """Check code for real-time feedback"""
-    result = realtime_feedback.check_code(
+    result = await realtime_feedback.check_code(
         session_id,
         request.code,
         request.question
@@ -1870,6 +2277,7 @@ async def complete_session(session_id: str, user_id: int):
         session = active_sessions.get(session_id)
         if not session:
             raise HTTPException(status_code=404, detail="Session not found")
+        await flush_proctoring_timeline(session)
         
         # Calculate scores
         scores = {
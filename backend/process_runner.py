@@ -0,0 +1,404 @@
+"""
+Process Runner
+Runs a program with stdin and a timeout under CPU, memory, process, file-size
+and output limits, measuring wall time and peak memory
+
+Limits are applied through Popen's preexec_fn, which runs between fork and
+exec. Python documents preexec_fn as not safe in multithreaded programs such
+as this server: a lock held by another thread at fork time stays locked in
+the child. apply() only makes setrlimit calls, which take no Python-level
+locks. resource.prlimit(pid, ...) on the started child avoids preexec_fn, but
+it leaves the program running briefly before its limits apply.
+"""
+import codecs
+import os
+import queue
+import signal
+import subprocess
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+try:
+    import resource
+    RESOURCE_AVAILABLE = True
+except ImportError:
+    # Windows: rlimits are not available, only wall-clock and output caps apply
+    RESOURCE_AVAILABLE = False
+
+
+def _env_int(name: str, default: int) -> Optional[int]:
+    """Read an integer limit from the environment; 0 disables it"""
+    value = int(os.getenv(name, str(default)))
+    return value if value > 0 else None
+
+
+class ResourceLimits:
+    """Per-process limits; None means unlimited"""
+
+    def __init__(self, cpu_seconds: Optional[int] = None, memory_mb: Optional[int] = None,
+                 max_processes: Optional[int] = None, max_file_mb: Optional[int] = None,
+                 max_output_bytes: Optional[int] = None):
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self.max_processes = max_processes
+        self.max_file_mb = max_file_mb
+        self.max_output_bytes = max_output_bytes
+
+    def replace(self, **overrides) -> "ResourceLimits":
+        values = self.to_dict()
+        values.update(overrides)
+        return ResourceLimits(**values)
+
+    def to_dict(self) -> Dict:
+        return {
+            "cpu_seconds": self.cpu_seconds,
+            "memory_mb": self.memory_mb,
+            "max_processes": self.max_processes,
+            "max_file_mb": self.max_file_mb,
+            "max_output_bytes": self.max_output_bytes,
+        }
+
+    def apply(self):
+        """Set rlimits on the current process (runs in the child before exec)"""
+        if self.cpu_seconds:
+            # Soft limit sends SIGXCPU, the hard limit one second later is SIGKILL
+            resource.setrlimit(resource.RLIMIT_CPU, (self.cpu_seconds, self.cpu_seconds + 1))
+        if self.memory_mb:
+            memory = self.memory_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+        if self.max_processes and hasattr(resource, "RLIMIT_NPROC"):
+            # Counted across every process and thread of the uid, this server
+            # included, so it caps fork bombs rather than the child's own count
+            resource.setrlimit(resource.RLIMIT_NPROC, (self.max_processes, self.max_processes))
+        if self.max_file_mb:
+            size = self.max_file_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_FSIZE, (size, size))
+        resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+
+    def preexec_fn(self):
+        if not RESOURCE_AVAILABLE or os.name != "posix":
+            return None
+        return self.apply
+
+
+# Defaults for candidate code. JVM and V8 reserve far more address space than
+# they use, so their memory cap is passed as a runtime flag instead of
+# RLIMIT_AS. They also start many threads each, and RLIMIT_NPROC counts every
+# thread of the service uid, so on a busy host they could fail with "unable
+# to create native thread"; they run without it unless candidates get a
+# dedicated uid.
+_max_output_kb = _env_int("SANDBOX_MAX_OUTPUT_KB", 1024)
+DEFAULT_LIMITS = ResourceLimits(
+    cpu_seconds=_env_int("SANDBOX_CPU_SECONDS", 10),
+    memory_mb=_env_int("SANDBOX_MEMORY_MB", 512),
+    max_processes=_env_int("SANDBOX_MAX_PROCESSES", 256),
+    max_file_mb=_env_int("SANDBOX_MAX_FILE_MB", 16),
+    max_output_bytes=_max_output_kb * 1024 if _max_output_kb else None,
+)
+
+
+def limits_for_language(language: str) -> ResourceLimits:
+    if language in ("java", "javascript"):
+        return DEFAULT_LIMITS.replace(memory_mb=None, max_processes=None)
+    return DEFAULT_LIMITS
+
+
+def truncation_marker(limit_bytes: int) -> str:
+    return f"\n[Output truncated: program exceeded the {limit_bytes // 1024} KB output limit]"
+
+
+class _OutputCollector:
+    """Collects stdout/stderr chunks until a shared byte budget runs out"""
+
+    def __init__(self, limit: Optional[int], on_overflow):
+        self.limit = limit
+        self.on_overflow = on_overflow
+        self.total = 0
+        self.truncated = False
+        self._lock = threading.Lock()
+
+    def read(self, stream, sink: Callable[[bytes], None]):
+        """Pass chunks to sink as soon as they arrive (read1 doesn't wait for a full buffer)"""
+        try:
+            for chunk in iter(lambda: stream.read1(65536), b""):
+                with self._lock:
+                    if self.truncated:
+                        continue  # keep draining so the child never blocks on a full pipe
+                    if self.limit is not None and self.total + len(chunk) > self.limit:
+                        chunk = chunk[:self.limit - self.total]
+                        self.total = self.limit
+                        self.truncated = True
+                        self.on_overflow()
+                    else:
+                        self.total += len(chunk)
+                if chunk:
+                    sink(chunk)
+        finally:
+            stream.close()
+
+
+def _write_stdin(stream, data: bytes):
+    try:
+        if data:
+            stream.write(data)
+    except (BrokenPipeError, OSError):
+        # Program exited without reading all of its input
+        pass
+    finally:
+        try:
+            stream.close()
+        except OSError:
+            pass
+
+
+# Linux exposes each process's peak RSS (VmHWM) in /proc/<pid>/status
+PROC_STATUS_AVAILABLE = os.path.exists("/proc/self/status")
+RSS_SAMPLE_INTERVAL = 0.005  # seconds between VmHWM readings while a program runs
+
+
+def _read_peak_rss_kb(pid: int) -> Optional[int]:
+    """VmHWM of a running process in KB, or None once it has exited"""
+    try:
+        with open(f"/proc/{pid}/status", "rb") as f:
+            for line in f:
+                if line.startswith(b"VmHWM:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def _wait(process: subprocess.Popen):
+    """
+    Reap the process and return (returncode, peak_rss_kb).
+
+    The rusage from wait4 is no use here: ru_maxrss carries over the
+    high-water mark of the forked copy of this server from before exec.
+    Instead VmHWM is sampled while the program runs; Popen only returns
+    after exec, so every reading belongs to the program. The last reading
+    before exit is the peak. A program that exits before the first reading,
+    or a platform without /proc, reports None.
+    """
+    if not PROC_STATUS_AVAILABLE or not hasattr(os, "waitid"):
+        return process.wait(), None
+
+    peak = {"kb": _read_peak_rss_kb(process.pid)}
+    exited = threading.Event()
+
+    def _sample():
+        while not exited.wait(RSS_SAMPLE_INTERVAL):
+            reading = _read_peak_rss_kb(process.pid)
+            if reading is not None:
+                peak["kb"] = max(peak["kb"] or 0, reading)
+
+    sampler = threading.Thread(target=_sample, daemon=True)
+    sampler.start()
+    try:
+        # Wait for exit without reaping, so the pid can't be reused under the sampler
+        os.waitid(os.P_PID, process.pid, os.WEXITED | os.WNOWAIT)
+    except ChildProcessError:
+        pass
+    finally:
+        exited.set()
+        sampler.join()
+    return process.wait(), peak["kb"]
+
+
+def _limit_exceeded(returncode: int, timed_out: bool, truncated: bool) -> Optional[str]:
+    if timed_out:
+        return "wall_time"
+    if truncated:
+        return "output"
+    if RESOURCE_AVAILABLE and os.name == "posix":
+        if returncode == -signal.SIGXCPU:
+            return "cpu"
+        if returncode == -signal.SIGXFSZ:
+            return "file_size"
+    return None
+
+
+def run_process(command: List[str], stdin: str = "", timeout: float = 10, cwd: Optional[str] = None,
+                limits: Optional[ResourceLimits] = None) -> Dict:
+    """
+    Run command to completion under limits.
+    Returns returncode, stdout, stderr, wall_time (seconds), peak_rss_kb
+    (None when it could not be measured), timed_out, truncated and
+    limit_exceeded (None or the limit that was hit).
+    """
+    limits = limits or ResourceLimits()
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        command,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        cwd=cwd,
+        preexec_fn=limits.preexec_fn(),
+    )
+
+    def _kill():
+        try:
+            process.kill()
+        except OSError:
+            pass
+
+    collector = _OutputCollector(limits.max_output_bytes, _kill)
+    stdout_chunks: List[bytes] = []
+    stderr_chunks: List[bytes] = []
+    threads = [
+        threading.Thread(target=_write_stdin, args=(process.stdin, (stdin or "").encode("utf-8")), daemon=True),
+        threading.Thread(target=collector.read, args=(process.stdout, stdout_chunks.append), daemon=True),
+        threading.Thread(target=collector.read, args=(process.stderr, stderr_chunks.append), daemon=True),
+    ]
+    for thread in threads:
+        thread.start()
+
+    timed_out = threading.Event()
+
+    def _on_timeout():
+        timed_out.set()
+        _kill()
+
+    timer = threading.Timer(timeout, _on_timeout)
+    timer.daemon = True
+    timer.start()
+    try:
+        returncode, peak_rss_kb = _wait(process)
+    finally:
+        timer.cancel()
+    wall_time = time.perf_counter() - start
+
+    for thread in threads:
+        # Grandchildren can keep the pipes open; don't hang on them
+        thread.join(timeout=1)
+
+    stdout = b"".join(stdout_chunks).decode("utf-8", errors="replace")
+    stderr = b"".join(stderr_chunks).decode("utf-8", errors="replace")
+    if collector.truncated:
+        stdout += truncation_marker(limits.max_output_bytes)
+
+    return {
+        "returncode": returncode,
+        "stdout": stdout,
+        "stderr": stderr,
+        "wall_time": wall_time,
+        "peak_rss_kb": peak_rss_kb,
+        "timed_out": timed_out.is_set(),
+        "truncated": collector.truncated,
+        "limit_exceeded": _limit_exceeded(returncode, timed_out.is_set(), collector.truncated),
+    }
+
+
+class StreamingProcess:
+    """
+    A program run under limits whose output is delivered as it is produced.
+    on_output(stream_name, text) is called from reader threads for every chunk;
+    on_exit(result) is called once with the same fields run_process returns
+    (minus stdout/stderr) plus cancelled.
+    """
+
+    def __init__(self, command: List[str], on_output: Callable[[str, str], None], on_exit: Callable[[Dict], None],
+                 timeout: float = 10, cwd: Optional[str] = None, limits: Optional[ResourceLimits] = None):
+        self.command = command
+        self.on_output = on_output
+        self.on_exit = on_exit
+        self.timeout = timeout
+        self.cwd = cwd
+        self.limits = limits or ResourceLimits()
+        self.process: Optional[subprocess.Popen] = None
+        self.timed_out = threading.Event()
+        self.cancelled = threading.Event()
+        self._stdin_queue: "queue.Queue[Optional[bytes]]" = queue.Queue()
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self.process = subprocess.Popen(
+            self.command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            cwd=self.cwd,
+            preexec_fn=self.limits.preexec_fn(),
+        )
+        self.collector = _OutputCollector(self.limits.max_output_bytes, self.kill)
+        self.readers = [
+            threading.Thread(target=self.collector.read, args=(self.process.stdout, self._sink("stdout")), daemon=True),
+            threading.Thread(target=self.collector.read, args=(self.process.stderr, self._sink("stderr")), daemon=True),
+        ]
+        for thread in self.readers:
+            thread.start()
+        threading.Thread(target=self._feed_stdin, daemon=True).start()
+        threading.Thread(target=self._wait_for_exit, daemon=True).start()
+
+    def _sink(self, name: str) -> Callable[[bytes], None]:
+        # Incremental decoding so multi-byte characters split across chunks survive
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+        def sink(chunk: bytes):
+            text = decoder.decode(chunk)
+            if text:
+                self.on_output(name, text)
+        return sink
+
+    def _feed_stdin(self):
+        # Writes happen on this thread so a child that isn't reading never blocks the caller
+        stream = self.process.stdin
+        try:
+            for data in iter(self._stdin_queue.get, None):
+                stream.write(data)
+                stream.flush()
+        except (BrokenPipeError, OSError, ValueError):
+            pass
+        finally:
+            try:
+                stream.close()
+            except OSError:
+                pass
+
+    def write_stdin(self, text: str):
+        if text:
+            self._stdin_queue.put(text.encode("utf-8"))
+
+    def close_stdin(self):
+        self._stdin_queue.put(None)
+
+    def kill(self):
+        try:
+            self.process.kill()
+        except OSError:
+            pass
+
+    def cancel(self):
+        self.cancelled.set()
+        self.kill()
+
+    def _on_timeout(self):
+        self.timed_out.set()
+        self.kill()
+
+    def _wait_for_exit(self):
+        timer = threading.Timer(self.timeout, self._on_timeout)
+        timer.daemon = True
+        timer.start()
+        try:
+            returncode, peak_rss_kb = _wait(self.process)
+        finally:
+            timer.cancel()
+            self._stdin_queue.put(None)
+        wall_time = time.perf_counter() - self.started_at
+
+        for thread in self.readers:
+            thread.join(timeout=1)
+        if self.collector.truncated:
+            self.on_output("stdout", truncation_marker(self.limits.max_output_bytes))
+
+        self.on_exit({
+            "returncode": returncode,
+            "wall_time": wall_time,
+            "peak_rss_kb": peak_rss_kb,
+            "timed_out": self.timed_out.is_set(),
+            "cancelled": self.cancelled.is_set(),
+            "truncated": self.collector.truncated,
+            "limit_exceeded": _limit_exceeded(returncode, self.timed_out.is_set(), self.collector.truncated),
+        })
@@ -1,63 +1,737 @@
 import cv2
 import numpy as np
 import time
+import os
+import asyncio
+import struct
+import threading
+import queue
+import importlib.util
+from concurrent.futures import Future, ThreadPoolExecutor
 
-# Try to import MediaPipe, but handle gracefully if not available
-try:
-    import mediapipe as mp
-    MEDIAPIPE_AVAILABLE = True
-except ImportError:
-    MEDIAPIPE_AVAILABLE = False
+# MediaPipe is only imported when its detector is first used (the import is slow)
+MEDIAPIPE_AVAILABLE = importlib.util.find_spec("mediapipe") is not None
+if not MEDIAPIPE_AVAILABLE:
     print("Warning: MediaPipe not available. Proctoring features will be limited.")
 
 
-class Proctor:
+# Face detector backend: auto, mediapipe, ssd, yunet or haar (see DETECTORS).
+# auto takes the first of AUTO_DETECTOR_ORDER that is configured and loads.
+PROCTOR_DETECTOR = os.getenv("PROCTOR_DETECTOR", "auto")
+
+# The ssd backend batches detection across sessions with the OpenCV DNN (res10
+# SSD) detector. PROCTOR_DNN_MODEL (and PROCTOR_DNN_CONFIG for Caffe models)
+# point at the model files; frames from all sessions that arrive within
+# PROCTOR_BATCH_WINDOW_MS are detected in one forward pass of up to
+# PROCTOR_BATCH_SIZE images. Larger windows/batches trade latency for throughput.
+# The yunet backend runs OpenCV's YuNet ONNX model from PROCTOR_YUNET_MODEL.
+PROCTOR_DNN_MODEL = os.getenv("PROCTOR_DNN_MODEL", "")
+PROCTOR_DNN_CONFIG = os.getenv("PROCTOR_DNN_CONFIG", "")
+PROCTOR_DNN_CONFIDENCE = float(os.getenv("PROCTOR_DNN_CONFIDENCE", "0.5"))
+PROCTOR_BATCH_SIZE = int(os.getenv("PROCTOR_BATCH_SIZE", "8"))
+PROCTOR_BATCH_WINDOW_MS = float(os.getenv("PROCTOR_BATCH_WINDOW_MS", "15"))
+PROCTOR_YUNET_MODEL = os.getenv("PROCTOR_YUNET_MODEL", "")
+
+# Frame decoding and FaceMesh.process run on this pool instead of the event loop.
+# Every connection has its own Proctor, so frames of one session stay in order
+# while different sessions spread across cores. A frame waiting for its batch
+# holds a pool thread, so with batching the pool is at least one batch wide.
+PROCTOR_MAX_WORKERS = int(os.getenv("PROCTOR_MAX_WORKERS", str(os.cpu_count() or 2)))
+_pool_size = max(PROCTOR_MAX_WORKERS, PROCTOR_BATCH_SIZE) if PROCTOR_DNN_MODEL else PROCTOR_MAX_WORKERS
+_inference_executor = ThreadPoolExecutor(max_workers=_pool_size, thread_name_prefix="proctor")
+_metrics_lock = threading.Lock()
+_proctor_metrics = {
+    "active_sessions": 0,
+    "frames_analyzed": 0,
+    "frames_dropped": 0,
+    "gate_hits": 0,
+    "gate_misses": 0,
+    "in_flight": 0,
+    "total_inference": 0.0,
+    "batches": 0,
+    "batched_frames": 0,
+}
+
+# Binary /ws/video frames: a 16-byte little-endian header followed by the
+# encoded image. version (u8), format (u8), flags (u16, reserved),
+# sequence number (u32), capture timestamp in ms since the epoch (u64).
+FRAME_HEADER = struct.Struct("<BBHIQ")
+FRAME_PROTOCOL_VERSION = 1
+FRAME_FORMATS = {0: "auto", 1: "jpeg", 2: "webp"}
+
+# Bounds for the capture settings recommended to clients
+PROCTOR_MIN_INTERVAL_MS = int(os.getenv("PROCTOR_MIN_INTERVAL_MS", "250"))
+PROCTOR_MAX_INTERVAL_MS = int(os.getenv("PROCTOR_MAX_INTERVAL_MS", "2000"))
+PROCTOR_TARGET_LATENCY_MS = float(os.getenv("PROCTOR_TARGET_LATENCY_MS", "100"))
+CAPTURE_WIDTHS = (640, 480, 320)
+
+# Preprocessing before inference: frames are downscaled to at most
+# PROCTOR_INFERENCE_WIDTH pixels wide and, for the OpenCV cascade, cropped to a
+# padded box around the last face once one is known. A full-frame search runs
+# every PROCTOR_FULL_SEARCH_EVERY frames (to notice other people entering) and
+# whenever the face is lost. FaceMesh already tracks a face crop internally and
+# loses its track when the outer crop moves, so it only gets the downscale.
+PROCTOR_INFERENCE_WIDTH = int(os.getenv("PROCTOR_INFERENCE_WIDTH", "640"))
+PROCTOR_ROI_PADDING = float(os.getenv("PROCTOR_ROI_PADDING", "0.6"))
+PROCTOR_FULL_SEARCH_EVERY = int(os.getenv("PROCTOR_FULL_SEARCH_EVERY", "30"))
+
+FULL_FRAME = (0.0, 0.0, 1.0, 1.0)
+
+# Motion gate: frames whose tiny grayscale thumbnail differs from the last
+# analyzed one by less than PROCTOR_GATE_THRESHOLD grey levels (mean absolute
+# difference, 0 disables the gate) reuse that result, but inference is forced
+# at least every PROCTOR_GATE_REFRESH_SECONDS.
+PROCTOR_GATE_THRESHOLD = float(os.getenv("PROCTOR_GATE_THRESHOLD", "3.0"))
+PROCTOR_GATE_REFRESH_SECONDS = float(os.getenv("PROCTOR_GATE_REFRESH_SECONDS", "2.0"))
+
+
+class FramePreprocessor:
+    """
+    Picks the region of each frame to run inference on and downscales it.
+    Regions are (x0, y0, x1, y1) normalized to the full frame.
+    """
+
+    def __init__(self, inference_width=PROCTOR_INFERENCE_WIDTH, roi_padding=PROCTOR_ROI_PADDING,
+                 full_search_every=PROCTOR_FULL_SEARCH_EVERY, use_roi=True):
+        self.inference_width = inference_width
+        self.use_roi = use_roi
+        self.roi_padding = roi_padding
+        self.full_search_every = full_search_every
+        self.roi = None
+        self.frames_since_full_search = 0
+
+    def prepare(self, frame, full=False):
+        """Return (image, region): the downscaled crop to analyze and where it sits in frame"""
+        if full or self.roi is None or self.frames_since_full_search >= self.full_search_every:
+            region = FULL_FRAME
+            self.frames_since_full_search = 0
+        else:
+            region = self.roi
+            self.frames_since_full_search += 1
+
+        h, w = frame.shape[:2]
+        x0, y0, x1, y1 = int(region[0] * w), int(region[1] * h), int(region[2] * w), int(region[3] * h)
+        image = frame[y0:y1, x0:x1]
+        # One scale for the whole frame, so a crop costs its share of the downscaled frame
+        if self.inference_width and w > self.inference_width:
+            scale = self.inference_width / w
+            size = (max(1, int((x1 - x0) * scale)), max(1, int((y1 - y0) * scale)))
+            image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+        # Report the region actually cropped after rounding to pixels
+        return image, (x0 / w, y0 / h, x1 / w, y1 / h)
+
+    def update(self, face_box):
+        """
+        Track the face box (normalized to the full frame) or None when no face
+        was found. The ROI only moves when the face drifts out of its middle,
+        which keeps FaceMesh's own tracking stable between frames.
+        """
+        if face_box is None or not self.use_roi:
+            self.roi = None
+            return
+        fx0, fy0, fx1, fy1 = face_box
+        if self.roi is not None:
+            rx0, ry0, rx1, ry1 = self.roi
+            margin_x = (rx1 - rx0) * 0.1
+            margin_y = (ry1 - ry0) * 0.1
+            if fx0 >= rx0 + margin_x and fy0 >= ry0 + margin_y and fx1 <= rx1 - margin_x and fy1 <= ry1 - margin_y:
+                return
+        pad_x = (fx1 - fx0) * self.roi_padding
+        pad_y = (fy1 - fy0) * self.roi_padding
+        self.roi = (max(0.0, fx0 - pad_x), max(0.0, fy0 - pad_y), min(1.0, fx1 + pad_x), min(1.0, fy1 + pad_y))
+
+    @staticmethod
+    def to_frame(x, y, region):
+        """Map a point normalized to the analyzed region back to full-frame coordinates"""
+        return region[0] + x * (region[2] - region[0]), region[1] + y * (region[3] - region[1])
+
+
+class BatchedFaceDetector:
+    """
+    Shares one DNN face detector between all sessions. detect() is called from
+    inference pool threads and blocks until the batch containing its image has
+    run; a single batch thread owns the network, so it needs no locking.
+    """
+
+    def __init__(self, net, batch_size=PROCTOR_BATCH_SIZE, window_ms=PROCTOR_BATCH_WINDOW_MS,
+                 confidence=PROCTOR_DNN_CONFIDENCE, input_size=(300, 300), mean=(104.0, 177.0, 123.0)):
+        self.net = net
+        self.batch_size = max(1, batch_size)
+        self.window = window_ms / 1000
+        self.confidence = confidence
+        self.input_size = input_size
+        self.mean = mean
+        self._requests = queue.Queue()
+        self.busy_seconds = 0.0  # time spent in forward passes
+        self._thread = threading.Thread(target=self._run, name="proctor-batch", daemon=True)
+        self._thread.start()
+
+    def detect(self, image):
+        """Faces in image as an (N, 4) array of (x, y, w, h) pixels, best first"""
+        future = Future()
+        self._requests.put((image, future))
+        return future.result()
+
+    def _collect(self):
+        batch = [self._requests.get()]
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            start = time.perf_counter()
+            try:
+                results = self._detect_batch([image for image, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            finally:
+                self.busy_seconds += time.perf_counter() - start
+            for (_, future), faces in zip(batch, results):
+                future.set_result(faces)
+            with _metrics_lock:
+                _proctor_metrics["batches"] += 1
+                _proctor_metrics["batched_frames"] += len(batch)
+
+    def _detect_batch(self, images):
+        blob = cv2.dnn.blobFromImages(images, 1.0, self.input_size, self.mean, swapRB=False, crop=False)
+        self.net.setInput(blob)
+        # (1, 1, detections, 7): image index, class, confidence, x0, y0, x1, y1 (normalized)
+        detections = self.net.forward().reshape(-1, 7)
+        detections = detections[detections[:, 2] >= self.confidence]
+        results = []
+        for index, image in enumerate(images):
+            ih, iw = image.shape[:2]
+            rows = detections[detections[:, 0] == index]
+            rows = rows[np.argsort(-rows[:, 2])]
+            boxes = np.clip(rows[:, 3:7], 0.0, 1.0) * (iw, ih, iw, ih)
+            boxes[:, 2:] -= boxes[:, :2]
+            results.append(boxes.astype(np.int32))
+        return results
+
+
+def _first_box(faces, image):
+    """The first (x, y, w, h) face as a box normalized to image, or None"""
+    if len(faces) == 0:
+        return None
+    ih, iw = image.shape[:2]
+    (x, y, fw, fh) = faces[0]
+    return (x / iw, y / ih, (x + fw) / iw, (y + fh) / ih)
+
+
+class DetectorBackend:
+    """
+    A face detector that loads its model on first use and measures its own
+    per-frame cost. detect(state, image) returns (faces, box): the faces found
+    and the first face's box normalized to image (None when there is none).
+    Landmark backends return FaceMesh-style (N, 3) landmark arrays as faces,
+    the others (x, y, w, h) pixel boxes. state comes from open_session() and
+    holds whatever a backend tracks per interview.
+    """
+    name = None
+    landmarks = False
+
     def __init__(self):
-        self.mediapipe_available = MEDIAPIPE_AVAILABLE
-        if MEDIAPIPE_AVAILABLE:
-            self.mp_face_mesh = mp.solutions.face_mesh
-            self.face_mesh = self.mp_face_mesh.FaceMesh(
-                min_detection_confidence=0.5, 
-                min_tracking_confidence=0.5,
-                max_num_faces=1
+        self._load_lock = threading.Lock()
+        self.loaded = False
+        self.load_error = None
+        self.load_ms = None
+        self.frames = 0
+        self.total_seconds = 0.0
+
+    def available(self):
+        """Whether the backend is installed/configured here, without loading it"""
+        return True
+
+    def load(self):
+        """Load the model once; False if it could not be loaded"""
+        with self._load_lock:
+            if not self.loaded and self.load_error is None:
+                start = time.perf_counter()
+                try:
+                    self._load()
+                    self.loaded = True
+                except Exception as e:
+                    self.load_error = str(e)
+                    print(f"Warning: Could not load {self.name} face detector: {e}")
+                self.load_ms = round((time.perf_counter() - start) * 1000, 1)
+            return self.loaded
+
+    def _load(self):
+        pass
+
+    def open_session(self):
+        return None
+
+    def close_session(self, state):
+        pass
+
+    def detect(self, state, image):
+        start = time.perf_counter()
+        result = self._detect(state, image)
+        elapsed = time.perf_counter() - start
+        with _metrics_lock:
+            self.frames += 1
+            self.total_seconds += elapsed
+        return result
+
+    def _detect(self, state, image):
+        raise NotImplementedError
+
+    def frame_cost_ms(self):
+        return round(self.total_seconds / self.frames * 1000, 2) if self.frames else None
+
+    def stats(self):
+        return {
+            "loaded": self.loaded,
+            "load_ms": self.load_ms,
+            "error": self.load_error,
+            "frames": self.frames,
+            "avg_ms": self.frame_cost_ms(),
+        }
+
+
+class HaarBackend(DetectorBackend):
+    """OpenCV Haar cascade: no model download, cheapest and least accurate"""
+    name = "haar"
+
+    def _load(self):
+        self.path = cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
+        self._local = threading.local()
+        if self._cascade().empty():
+            raise RuntimeError("Could not load face cascade classifier")
+
+    def _cascade(self):
+        # A CascadeClassifier must not be shared between threads; one per pool thread
+        cascade = getattr(self._local, "cascade", None)
+        if cascade is None:
+            cascade = self._local.cascade = cv2.CascadeClassifier(self.path)
+        return cascade
+
+    def _detect(self, state, image):
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        # More lenient parameters: scaleFactor=1.2 (less sensitive), minNeighbors=3 (fewer neighbors required)
+        # This makes detection more forgiving
+        faces = self._cascade().detectMultiScale(
+            gray, 
+            scaleFactor=1.2,  # Increased from 1.1 - less sensitive to scale changes
+            minNeighbors=3,   # Decreased from 4 - requires fewer neighbors
+            minSize=(30, 30), # Minimum face size
+            flags=cv2.CASCADE_SCALE_IMAGE
+        )
+        return faces, _first_box(faces, gray)
+
+
+class SsdBackend(DetectorBackend):
+    """OpenCV DNN res10 SSD, batched across sessions (see BatchedFaceDetector)"""
+    name = "ssd"
+
+    def available(self):
+        return bool(PROCTOR_DNN_MODEL) and os.path.exists(PROCTOR_DNN_MODEL)
+
+    def _load(self):
+        net = cv2.dnn.readNet(PROCTOR_DNN_MODEL, PROCTOR_DNN_CONFIG)
+        self.batcher = BatchedFaceDetector(net)
+        print(f"Proctoring: batched DNN face detection (batch {PROCTOR_BATCH_SIZE}, window {PROCTOR_BATCH_WINDOW_MS} ms)")
+
+    def _detect(self, state, image):
+        faces = self.batcher.detect(image)
+        return faces, _first_box(faces, image)
+
+    def frame_cost_ms(self):
+        # Forward-pass time per frame; detect() itself also waits for the batch to fill
+        return round(self.batcher.busy_seconds / self.frames * 1000, 2) if self.frames else None
+
+
+class YuNetBackend(DetectorBackend):
+    """OpenCV YuNet (cv2.FaceDetectorYN) from a local ONNX model"""
+    name = "yunet"
+
+    def available(self):
+        return bool(PROCTOR_YUNET_MODEL) and os.path.exists(PROCTOR_YUNET_MODEL) and hasattr(cv2, "FaceDetectorYN")
+
+    def _load(self):
+        self._local = threading.local()
+        self._detector()
+
+    def _detector(self):
+        # The detector keeps its input size as state; one per pool thread
+        detector = getattr(self._local, "detector", None)
+        if detector is None:
+            detector = self._local.detector = cv2.FaceDetectorYN.create(
+                PROCTOR_YUNET_MODEL, "", (320, 320), PROCTOR_DNN_CONFIDENCE
             )
-            self.mp_drawing = mp.solutions.drawing_utils
-        else:
-            # Fallback to basic OpenCV face detection
-            cascade_path = cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
-            self.face_cascade = cv2.CascadeClassifier(cascade_path)
-            if self.face_cascade.empty():
-                print("Warning: Could not load face cascade classifier")
+        return detector
+
+    def _detect(self, state, image):
+        detector = self._detector()
+        ih, iw = image.shape[:2]
+        detector.setInputSize((iw, ih))
+        _, detections = detector.detect(image)
+        if detections is None:
+            return np.empty((0, 4), np.int32), None
+        # Rows are x, y, w, h, five landmark points, score
+        detections = detections[np.argsort(-detections[:, -1])]
+        faces = np.clip(detections[:, :4], 0, None).astype(np.int32)
+        return faces, _first_box(faces, image)
+
+
+class MediaPipeBackend(DetectorBackend):
+    """MediaPipe FaceMesh: 468 landmarks, so eye and head pose checks work"""
+    name = "mediapipe"
+    landmarks = True
+
+    def available(self):
+        return MEDIAPIPE_AVAILABLE
+
+    def _load(self):
+        import mediapipe as mp
+        self.face_mesh_solution = mp.solutions.face_mesh
+
+    def open_session(self):
+        # FaceMesh tracks the face between frames, so every session has its own graph
+        return self.face_mesh_solution.FaceMesh(
+            min_detection_confidence=0.5, 
+            min_tracking_confidence=0.5,
+            max_num_faces=1
+        )
+
+    def close_session(self, face_mesh):
+        face_mesh.close()
+
+    def _detect(self, face_mesh, image):
+        rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        results = face_mesh.process(rgb_image)
+        if not results.multi_face_landmarks:
+            return [], None
+        faces = [landmarks_to_array(face) for face in results.multi_face_landmarks]
+        xy = faces[0][:, :2]
+        return faces, (*xy.min(axis=0), *xy.max(axis=0))
+
+
+DETECTORS = {}
+AUTO_DETECTOR_ORDER = ("ssd", "yunet", "mediapipe", "haar")
+
+
+def register_detector(backend):
+    DETECTORS[backend.name] = backend
+    return backend
+
+
+for _backend in (HaarBackend(), SsdBackend(), YuNetBackend(), MediaPipeBackend()):
+    register_detector(_backend)
+
+
+def get_detector(name=None):
+    """
+    The loaded backend for name (default PROCTOR_DETECTOR). auto, or a choice
+    that is unknown, not configured or fails to load, falls back to the first
+    backend in AUTO_DETECTOR_ORDER that loads.
+    """
+    name = name or PROCTOR_DETECTOR
+    if name != "auto":
+        backend = DETECTORS.get(name)
+        if backend is not None and backend.available() and backend.load():
+            return backend
+        print(f"Warning: Face detector '{name}' is not available; choosing one automatically")
+    for candidate in AUTO_DETECTOR_ORDER:
+        backend = DETECTORS[candidate]
+        if backend.available() and backend.load():
+            return backend
+    raise RuntimeError("No face detector could be loaded")
+
+
+# FaceMesh landmark indices
+NOSE_TIP = 1
+CHIN = 152
+EYE_OUTER = [33, 263]  # left, right outer corners
+EYE_INNER = [133, 362]
+EYE_UPPER = [159, 386]
+EYE_LOWER = [145, 374]
+
+
+class FaceGeometry:
+    """
+    Per-face measurements computed in one vectorized pass over the landmarks.
+    Coordinates are normalized to the full frame; face_size is the mean of the
+    bounding box width and height in pixels over the frame's longer side.
+    """
+
+    def __init__(self, landmarks, frame_w, frame_h):
+        self.landmarks = landmarks
+        xy = landmarks[:, :2]
+        self.bbox = (*xy.min(axis=0), *xy.max(axis=0))
+        box_px = (xy.max(axis=0) - xy.min(axis=0)) * (frame_w, frame_h)
+        self.face_size = float(box_px.mean() / max(frame_w, frame_h))
+
+        outer = xy[EYE_OUTER]
+        eye_mid = outer.mean(axis=0)
+        nose = xy[NOSE_TIP]
+        # Nose offset from the midpoint between the outer eye corners
+        self.nose_deviation = float(nose[0] - eye_mid[0])
+
+        # Eye openness (vertical lid gap) and aspect ratio, both eyes at once
+        openness = np.abs(xy[EYE_LOWER, 1] - xy[EYE_UPPER, 1])
+        self.left_eye_open, self.right_eye_open = (float(v) for v in openness)
+        scale = np.array((frame_w, frame_h))
+        eye_width_px = np.linalg.norm((xy[EYE_OUTER] - xy[EYE_INNER]) * scale, axis=1)
+        ear = openness * frame_h / np.maximum(eye_width_px, 1e-6)
+        self.left_ear, self.right_ear = (float(v) for v in ear)
+
+        # Rough head pose: yaw from the nose offset relative to eye spacing,
+        # pitch from where the nose sits between the eye line and the chin
+        eye_span = max(float(np.linalg.norm((outer[1] - outer[0]) * scale)), 1e-6)
+        self.yaw = float(np.degrees(np.arcsin(np.clip(2 * self.nose_deviation * frame_w / eye_span, -1, 1))))
+        chin_drop = max(float(xy[CHIN, 1] - eye_mid[1]), 1e-6)
+        self.pitch = float(np.degrees(np.arcsin(np.clip(((nose[1] - eye_mid[1]) / chin_drop - 0.5) * 2, -1, 1))))
+
+    @classmethod
+    def from_landmarks(cls, landmarks, region, frame_w, frame_h):
+        """landmarks: (N, 3) array normalized to the analyzed region"""
+        x0, y0, x1, y1 = region
+        mapped = landmarks * (x1 - x0, y1 - y0, x1 - x0) + (x0, y0, 0.0)
+        return cls(mapped, frame_w, frame_h)
+
+    def to_dict(self):
+        return {
+            "bbox": [round(float(v), 4) for v in self.bbox],
+            "face_size": round(self.face_size, 4),
+            "nose_deviation": round(self.nose_deviation, 4),
+            "left_eye_open": round(self.left_eye_open, 4),
+            "right_eye_open": round(self.right_eye_open, 4),
+            "left_ear": round(self.left_ear, 3),
+            "right_ear": round(self.right_ear, 3),
+            "yaw": round(self.yaw, 1),
+            "pitch": round(self.pitch, 1),
+        }
+
+
+def landmarks_to_array(face_landmarks):
+    """The one per-landmark pass: FaceMesh protobuf landmarks to an (N, 3) float32 array"""
+    return np.array([(lm.x, lm.y, lm.z) for lm in face_landmarks.landmark], dtype=np.float32)
+
+
+class MotionGate:
+    """Decides whether a frame is close enough to the last analyzed one to skip inference"""
+
+    def __init__(self, threshold=PROCTOR_GATE_THRESHOLD, refresh_seconds=PROCTOR_GATE_REFRESH_SECONDS,
+                 thumbnail_size=(32, 24)):
+        self.threshold = threshold
+        self.refresh_seconds = refresh_seconds
+        self.thumbnail_size = thumbnail_size
+        self.reference = None
+        self.reference_time = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    def is_static(self, frame, now):
+        """
+        True if frame can reuse the last result. Otherwise frame becomes the
+        new reference, on the assumption that the caller runs inference on it.
+        """
+        if self.threshold <= 0:
+            return False
+        thumbnail = cv2.resize(frame, self.thumbnail_size, interpolation=cv2.INTER_AREA)
+        thumbnail = cv2.cvtColor(thumbnail, cv2.COLOR_BGR2GRAY).astype(np.int16)
+        if (self.reference is not None and now - self.reference_time < self.refresh_seconds
+                and np.mean(np.abs(thumbnail - self.reference)) < self.threshold):
+            self.hits += 1
+            with _metrics_lock:
+                _proctor_metrics["gate_hits"] += 1
+            return True
+        self.reference = thumbnail
+        self.reference_time = now
+        self.misses += 1
+        with _metrics_lock:
+            _proctor_metrics["gate_misses"] += 1
+        return False
+
+    def reset(self):
+        self.reference = None
+
+
+class Proctor:
+    def __init__(self, detector_name=None):
+        # Shared backend from the registry (loaded by the first session that uses
+        # it) plus whatever it tracks for this session
+        self.detector = get_detector(detector_name)
+        self.detector_state = self.detector.open_session()
+        self.closed = False
         self.last_face_detected = time.time()
         self.alert_cooldown = 10.0  # Increased to 10 seconds before showing alert again
         self.last_alert_time = {}  # Track last alert time per type
         self.face_detection_count = 0  # Track successful face detections
         self.startup_time = time.time()  # Track when proctor was initialized
         self.startup_grace_period = 15.0  # Don't alert for first 15 seconds
+        # close() may run on another pool thread while a frame is still in flight
+        self._lock = threading.Lock()
+        self.frame_stats = {"received": 0, "processed": 0, "dropped": 0, "skipped": 0}
+        self.latency_ms = None  # EWMA of decode + inference time
+        # ROI crops would break FaceMesh's own tracking between frames
+        self.preprocessor = FramePreprocessor(use_roi=not self.detector.landmarks)
+        self.motion_gate = MotionGate()
+        self.last_face_present = False
+        self.last_geometry = None  # FaceGeometry of the most recent MediaPipe face
+
+    def close(self):
+        """Release the detector state (e.g. the FaceMesh graph) held by this session"""
+        with self._lock:
+            if not self.closed:
+                self.closed = True
+                self.detector.close_session(self.detector_state)
+                self.detector_state = None
+
+    def record_dropped(self, count=1):
+        self.frame_stats["dropped"] += count
+        with _metrics_lock:
+            _proctor_metrics["frames_dropped"] += count
+
+    def recommend_capture(self):
+        """
+        Capture interval and frame width for the client, from this session's
+        inference latency and how busy the shared pool is.
+        """
+        load = get_pool_load()
+        latency = self.latency_ms if self.latency_ms is not None else PROCTOR_TARGET_LATENCY_MS
+        # Leave the pool idle half the time per session, stretched further when it is oversubscribed
+        interval = latency * 2 * max(1.0, load)
+        interval = int(min(PROCTOR_MAX_INTERVAL_MS, max(PROCTOR_MIN_INTERVAL_MS, round(interval / 50) * 50)))
+        if latency > PROCTOR_TARGET_LATENCY_MS * 2 or load >= 1.5:
+            width = CAPTURE_WIDTHS[2]
+        elif latency > PROCTOR_TARGET_LATENCY_MS or load >= 1.0:
+            width = CAPTURE_WIDTHS[1]
+        else:
+            width = CAPTURE_WIDTHS[0]
+        return {"capture_interval_ms": interval, "max_width": width}
+
+    def analyze_image(self, img_data):
+        """
+        Decode an encoded image (JPEG/WebP/PNG bytes, or a memoryview of
+        them) and analyze it. Returns the alerts, or None if the image could
+        not be decoded.
+        """
+        start = time.perf_counter()
+        np_arr = np.frombuffer(img_data, np.uint8)
+        frame = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
+        if frame is None or frame.size == 0:
+            return None
+        with self._lock:
+            if self.closed:
+                return []
+            alerts = self.analyze_frame(frame)
+        elapsed = time.perf_counter() - start
+        self.frame_stats["processed"] += 1
+        elapsed_ms = elapsed * 1000
+        self.latency_ms = elapsed_ms if self.latency_ms is None else 0.8 * self.latency_ms + 0.2 * elapsed_ms
+        with _metrics_lock:
+            _proctor_metrics["frames_analyzed"] += 1
+            _proctor_metrics["total_inference"] += elapsed
+        return alerts
+
+    async def analyze_image_async(self, img_data):
+        """Run analyze_image on the inference pool"""
+        loop = asyncio.get_running_loop()
+        with _metrics_lock:
+            _proctor_metrics["in_flight"] += 1
+        try:
+            return await loop.run_in_executor(_inference_executor, self.analyze_image, img_data)
+        finally:
+            with _metrics_lock:
+                _proctor_metrics["in_flight"] -= 1
+
+    def _detect(self, frame):
+        """
+        Run the detector on the ROI (or the full frame when due), retrying on the
+        full frame if the face was lost. Returns (result, region, face_box): region
+        maps the detector's coordinates back to the frame and face_box is the
+        first face normalized to the full frame (None if there is no face).
+        """
+        image, region = self.preprocessor.prepare(frame)
+        result, box = self.detector.detect(self.detector_state, image)
+        if box is None and region != FULL_FRAME:
+            image, region = self.preprocessor.prepare(frame, full=True)
+            result, box = self.detector.detect(self.detector_state, image)
+        face_box = None
+        if box is not None:
+            face_box = (*FramePreprocessor.to_frame(box[0], box[1], region), *FramePreprocessor.to_frame(box[2], box[3], region))
+        self.preprocessor.update(face_box)
+        return result, region, face_box
 
     def analyze_frame(self, frame):
-        alerts = []
-        h, w, _ = frame.shape
-        w_frame = w  # Store frame width for calculations
         current_time = time.time()
         
         # Don't alert during startup grace period
         if current_time - self.startup_time < self.startup_grace_period:
-            return alerts
+            return []
+        
+        if self.motion_gate.is_static(frame, current_time):
+            # Nothing moved since the last inference, so its face/no-face result
+            # still holds; any alerts for that state were already sent
+            self.frame_stats["skipped"] += 1
+            if self.last_face_present:
+                self.last_face_detected = current_time
+            return []
+        
+        alerts = self._infer(frame, current_time)
+        self.last_face_present = self.last_face_detected >= current_time
+        return alerts
+
+    def _face_alerts(self, face, current_time):
+        """Alert rules for one FaceGeometry"""
+        alerts = []
+        self.last_geometry = face
+
+        # 1. Gaze/Head Pose Estimation (Simplified)
+        # Increased threshold from 0.05 to 0.15 to reduce false positives
+        # Only alert if head is significantly turned
+        if abs(face.nose_deviation) > 0.15:
+            alert_key = "head_turned"
+            if alert_key not in self.last_alert_time or (current_time - self.last_alert_time[alert_key]) > self.alert_cooldown:
+                alerts.append("WARNING: Head turned away")
+                self.last_alert_time[alert_key] = current_time
+
+        # 2. Eye openness (Liveness/Sleeping check)
+        # Increased threshold from 0.002 to 0.005 to reduce false positives
+        if face.left_eye_open < 0.005 or face.right_eye_open < 0.005:
+            alert_key = "eyes_closed"
+            if alert_key not in self.last_alert_time or (current_time - self.last_alert_time[alert_key]) > self.alert_cooldown:
+                alerts.append("WARNING: Eyes closed")
+                self.last_alert_time[alert_key] = current_time
+
+        # 3. Face distance check (too close or too far)
+        # Face bounding box size relative to the frame is the proxy for distance
+        if face.face_size < 0.10:  # More lenient - only alert if very far
+            alert_key = "face_too_far"
+            if alert_key not in self.last_alert_time or (current_time - self.last_alert_time[alert_key]) > self.alert_cooldown:
+                alerts.append("WARNING: Face too far from camera")
+                self.last_alert_time[alert_key] = current_time
+        elif face.face_size > 0.6:  # More lenient - only alert if very close
+            alert_key = "face_too_close"
+            if alert_key not in self.last_alert_time or (current_time - self.last_alert_time[alert_key]) > self.alert_cooldown:
+                alerts.append("WARNING: Face too close to camera")
+                self.last_alert_time[alert_key] = current_time
+
+        return alerts
+
+    def _infer(self, frame, current_time):
+        alerts = []
+        h, w, _ = frame.shape
+        w_frame = w  # Store frame width for calculations
         
-        if not self.mediapipe_available:
-            # Fallback to basic OpenCV face detection with head movement detection
+        if not self.detector.landmarks:
+            # Box-only detectors (Haar, DNN): presence, count and head position
             try:
-                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                # More lenient parameters: scaleFactor=1.2 (less sensitive), minNeighbors=3 (fewer neighbors required)
-                # This makes detection more forgiving
-                faces = self.face_cascade.detectMultiScale(
-                    gray, 
-                    scaleFactor=1.2,  # Increased from 1.1 - less sensitive to scale changes
-                    minNeighbors=3,   # Decreased from 4 - requires fewer neighbors
-                    minSize=(30, 30), # Minimum face size
-                    flags=cv2.CASCADE_SCALE_IMAGE
-                )
+                faces, region, face_box = self._detect(frame)
                 
                 if len(faces) == 0:
                     # Only alert if no face detected for more than cooldown period
@@ -73,7 +747,7 @@ class Proctor:
                 self.last_face_detected = current_time
                 self.face_detection_count += 1
             except Exception as e:
-                print(f"Error in OpenCV face detection: {e}")
+                print(f"Error in {self.detector.name} face detection: {e}")
                 # Don't alert on errors, just return empty
                 return alerts
             
@@ -89,8 +763,8 @@ class Proctor:
             
             # Basic head movement detection using face position
             if len(faces) > 0:
-                (x, y, w, h) = faces[0]
-                face_center_x = x + w / 2
+                # Face centre in full-frame pixels (detection ran on a scaled crop)
+                face_center_x = (face_box[0] + face_box[2]) / 2 * w_frame
                 frame_center_x = w_frame / 2
                 
                 # Calculate deviation from center
@@ -108,10 +782,9 @@ class Proctor:
         
         # MediaPipe-based detection
         try:
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            results = self.face_mesh.process(rgb_frame)
+            multi_face_landmarks, region, _ = self._detect(frame)
 
-            if not results.multi_face_landmarks:
+            if not multi_face_landmarks:
                 # Only alert if no face detected for more than cooldown period
                 # And only if we've had successful detections before (to avoid false alerts on startup)
                 if self.face_detection_count > 5 and current_time - self.last_face_detected > self.alert_cooldown:
@@ -132,71 +805,98 @@ class Proctor:
         self.last_face_detected = time.time()
 
         # Only alert for multiple faces if there are clearly 2+ distinct faces
-        if len(results.multi_face_landmarks) > 2:  # Changed from > 1 to > 2
+        if len(multi_face_landmarks) > 2:  # Changed from > 1 to > 2
             alert_key = "multiple_faces"
             if alert_key not in self.last_alert_time or (current_time - self.last_alert_time[alert_key]) > self.alert_cooldown:
                 alerts.append("ALERT: Multiple Faces Detected!")
                 self.last_alert_time[alert_key] = current_time
 
-        for face_landmarks in results.multi_face_landmarks:
-            # 1. Gaze/Head Pose Estimation (Simplified)
-            # Nose tip is index 1, Left eye outer 33, Right eye outer 263
-            nose_tip = face_landmarks.landmark[1]
-            left_eye = face_landmarks.landmark[33]
-            right_eye = face_landmarks.landmark[263]
+        for landmarks in multi_face_landmarks:
+            face = FaceGeometry.from_landmarks(landmarks, region, w, h)
+            alerts.extend(self._face_alerts(face, current_time))
 
-            # Check if nose is too far left or right relative to eyes
-            face_center_x = (left_eye.x + right_eye.x) / 2
-            deviation = nose_tip.x - face_center_x
-            
-            # Increased threshold from 0.05 to 0.15 to reduce false positives
-            # Only alert if head is significantly turned
-            if abs(deviation) > 0.15:
-                alert_key = "head_turned"
-                if alert_key not in self.last_alert_time or (current_time - self.last_alert_time[alert_key]) > self.alert_cooldown:
-                    alerts.append("WARNING: Head turned away")
-                    self.last_alert_time[alert_key] = current_time
+        return alerts
 
-            # 2. Eye Aspect Ratio (Liveness/Sleeping check)
-            # Left eye landmarks
-            left_upper = face_landmarks.landmark[159].y
-            left_lower = face_landmarks.landmark[145].y
-            left_eye_open = abs(left_lower - left_upper)
-            
-            # Right eye landmarks
-            right_upper = face_landmarks.landmark[386].y
-            right_lower = face_landmarks.landmark[374].y
-            right_eye_open = abs(right_lower - right_upper)
-            
-            # Check if eyes are closed (with cooldown and higher threshold)
-            # Increased threshold from 0.002 to 0.005 to reduce false positives
-            if (left_eye_open < 0.005 or right_eye_open < 0.005):
-                alert_key = "eyes_closed"
-                if alert_key not in self.last_alert_time or (current_time - self.last_alert_time[alert_key]) > self.alert_cooldown:
-                    alerts.append("WARNING: Eyes closed")
-                    self.last_alert_time[alert_key] = current_time
+# Violation type recorded in the interview session for each alert message
+ALERT_TYPES = {
+    "ALERT: No Face Detected!": "no_face",
+    "ALERT: Multiple Faces Detected!": "multiple_faces",
+    "WARNING: Head turned away": "head_movement",
+    "WARNING: Head position suggests looking away": "head_movement",
+    "WARNING: Eyes closed": "eye_closure",
+    "WARNING: Face too far from camera": "face_too_far",
+    "WARNING: Face too close to camera": "face_too_close",
+}
 
-            # 3. Face distance check (too close or too far)
-            # Use face bounding box size as proxy for distance
-            face_landmarks_array = np.array([
-                [lm.x * w, lm.y * h] for lm in face_landmarks.landmark
-            ])
-            face_width = np.max(face_landmarks_array[:, 0]) - np.min(face_landmarks_array[:, 0])
-            face_height = np.max(face_landmarks_array[:, 1]) - np.min(face_landmarks_array[:, 1])
-            face_size = (face_width + face_height) / 2
-            
-            # Normalize by frame size (with cooldown and adjusted thresholds)
-            normalized_size = face_size / max(w, h)
-            if normalized_size < 0.10:  # More lenient - only alert if very far
-                alert_key = "face_too_far"
-                if alert_key not in self.last_alert_time or (current_time - self.last_alert_time[alert_key]) > self.alert_cooldown:
-                    alerts.append("WARNING: Face too far from camera")
-                    self.last_alert_time[alert_key] = current_time
-            elif normalized_size > 0.6:  # More lenient - only alert if very close
-                alert_key = "face_too_close"
-                if alert_key not in self.last_alert_time or (current_time - self.last_alert_time[alert_key]) > self.alert_cooldown:
-                    alerts.append("WARNING: Face too close to camera")
-                    self.last_alert_time[alert_key] = current_time
 
-        return alerts
+def alert_type(alert):
+    return ALERT_TYPES.get(alert, "other")
+
+
+def parse_binary_frame(data):
+    """
+    Split a binary frame into (header, payload). payload is a memoryview into
+    data, so the image goes to cv2.imdecode without being copied.
+    Raises ValueError for frames that don't follow the protocol.
+    """
+    if len(data) <= FRAME_HEADER.size:
+        raise ValueError("Frame too short")
+    version, image_format, flags, sequence, timestamp_ms = FRAME_HEADER.unpack_from(data)
+    if version != FRAME_PROTOCOL_VERSION:
+        raise ValueError(f"Unsupported frame protocol version {version}")
+    if image_format not in FRAME_FORMATS:
+        raise ValueError(f"Unsupported image format {image_format}")
+    header = {
+        "format": FRAME_FORMATS[image_format],
+        "seq": sequence,
+        "timestamp_ms": timestamp_ms,
+    }
+    return header, memoryview(data)[FRAME_HEADER.size:]
+
+
+async def create_proctor():
+    """
+    Build a Proctor for one connection on the inference pool (loading the
+    FaceMesh graph takes long enough to stall the event loop).
+    """
+    loop = asyncio.get_running_loop()
+    proctor = await loop.run_in_executor(_inference_executor, Proctor)
+    with _metrics_lock:
+        _proctor_metrics["active_sessions"] += 1
+    return proctor
+
+
+async def close_proctor(proctor):
+    loop = asyncio.get_running_loop()
+    try:
+        await loop.run_in_executor(_inference_executor, proctor.close)
+    finally:
+        with _metrics_lock:
+            _proctor_metrics["active_sessions"] -= 1
+
+
+def get_pool_load():
+    """Frames being analyzed per inference worker; above 1.0 frames are queueing"""
+    with _metrics_lock:
+        in_flight = _proctor_metrics["in_flight"]
+    return in_flight / PROCTOR_MAX_WORKERS
+
 
+def get_proctoring_metrics():
+    """
+    Active proctoring sessions, frames analyzed and dropped, motion gate
+    hits/misses, detection batches, pool load, average inference time and the
+    load time and per-frame cost of every detector that has been used.
+    """
+    with _metrics_lock:
+        metrics = dict(_proctor_metrics)
+    frames = metrics["frames_analyzed"]
+    total_inference = metrics.pop("total_inference")
+    metrics["avg_inference_ms"] = round(total_inference / frames * 1000, 2) if frames else 0
+    metrics["detectors"] = {
+        name: backend.stats() for name, backend in DETECTORS.items() if backend.loaded or backend.load_error
+    }
+    metrics["avg_batch_size"] = round(metrics["batched_frames"] / metrics["batches"], 2) if metrics["batches"] else 0
+    metrics["max_workers"] = PROCTOR_MAX_WORKERS
+    metrics["pool_load"] = round(metrics["in_flight"] / PROCTOR_MAX_WORKERS, 2)
+    return metrics
@@ -7,6 +7,7 @@ import os
 from dotenv import load_dotenv
 from typing import Dict, Optional, Callable
 import time
+from llm_client import llm_client
 
 load_dotenv()
 
@@ -26,7 +27,7 @@ class RealtimeFeedback:
         self.last_code_check = {}
         self.feedback_callbacks = {}
     
-    def check_code(self, session_id: str, code: str, question: str, on_feedback: Optional[Callable] = None) -> Optional[Dict]:
+    async def check_code(self, session_id: str, code: str, question: str, on_feedback: Optional[Callable] = None) -> Optional[Dict]:
         """Check code for issues and provide feedback"""
         if not self.model:
             return None
@@ -64,7 +65,7 @@ STATUS: [ISSUE/OK]
 FEEDBACK: [brief helpful comment or empty if OK]
 """
             
-            response = self.model.generate_content(prompt)
+            response = await llm_client.generate_content(self.model, prompt)
             result_text = response.text
             
             # Parse response
@@ -7,6 +7,7 @@ from typing import Dict, List, Optional
 from pypdf import PdfReader
 import re
 import json
+from llm_client import llm_client
 
 try:
     from pdfminer.high_level import extract_text
@@ -158,7 +159,7 @@ class ResumeParser:
         
         return education[:3]  # Limit to 3
     
-    def _analyze_with_ai(self, text: str) -> Dict:
+    async def _analyze_with_ai(self, text: str) -> Dict:
         """Use AI to comprehensively analyze the resume"""
         if not GEMINI_AVAILABLE or not api_key:
             return {}
@@ -223,7 +224,7 @@ Resume Text:
 
 Return ONLY valid JSON, no markdown formatting or code blocks."""
 
-            response = model.generate_content(prompt)
+            response = await llm_client.generate_content(model, prompt)
             response_text = response.text.strip()
             
             # Remove markdown code blocks if present
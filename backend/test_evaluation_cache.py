@@ -0,0 +1,133 @@
+import asyncio
+from unittest import mock
+
+import pytest
+
+import evaluation_cache
+from evaluation_cache import EvaluationCache, normalize_code
+
+
+def test_python_triple_quoted_string_keeps_its_contents():
+    code = 'x = """say "hi"  #   not a comment"""   # a comment\nprint(  x )\n'
+    assert normalize_code(code, "python") == 'x = """say "hi"  #   not a comment"""\nprint( x )'
+
+
+def test_python_strings_that_differ_do_not_collide():
+    a = "s = '''it's   here'''\nprint(s)"
+    b = "s = '''it's here'''\nprint(s)"
+    assert normalize_code(a, "python") != normalize_code(b, "python")
+
+
+def test_cpp_digit_separators_are_not_char_literals():
+    code = "int n = 1'000;   // one thousand\nchar c = ' ';\nint  m = 2;"
+    assert normalize_code(code, "cpp") == "int n = 1'000;\nchar c = ' ';\nint m = 2;"
+
+
+def test_rust_lifetimes_are_not_char_literals():
+    code = "fn f<'a>(x: &'a str)   -> &'a str {  x  }  // done\nlet c = '\\'';\nlet s = \"a   b\";"
+    assert normalize_code(code, "rust") == "fn f<'a>(x: &'a str) -> &'a str { x }\nlet c = '\\'';\nlet s = \"a   b\";"
+
+
+def test_unknown_language_only_trims_lines():
+    code = "  say 'a   b'   \n\n  done  "
+    assert normalize_code(code, "cobol") == "say 'a   b'\ndone"
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(evaluation_cache.time, "time", clock)
+    return clock
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = EvaluationCache(max_entries=8, ttl=60, db_path="")
+    cache.put("k", {"score": 90})
+    clock.now += 59
+    assert cache.get("k") == {"score": 90}
+    clock.now += 2
+    assert cache.get("k") is None
+    assert cache.get_stats()["expired"] == 1
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = EvaluationCache(max_entries=2, ttl=60, db_path="")
+    cache.put("a", {"score": 1})
+    cache.put("b", {"score": 2})
+    cache.get("a")
+    cache.put("c", {"score": 3})
+    assert cache.get("b") is None
+    assert cache.get("a") == {"score": 1}
+    assert cache.get("c") == {"score": 3}
+    assert cache.get_stats()["evictions"] == 1
+
+
+def test_disk_tier_survives_a_new_cache(clock, tmp_path):
+    db_path = str(tmp_path / "evaluations.db")
+    EvaluationCache(max_entries=8, ttl=60, db_path=db_path).put("k", {"score": 70})
+
+    cache = EvaluationCache(max_entries=8, ttl=60, db_path=db_path)
+    assert cache.get("k") == {"score": 70}
+    assert cache.get("k") == {"score": 70}
+    stats = cache.get_stats()
+    assert (stats["disk_hits"], stats["memory_hits"], stats["disk_tier"]) == (1, 1, True)
+
+    clock.now += 61
+    assert EvaluationCache(max_entries=8, ttl=60, db_path=db_path).get("k") is None
+
+
+def test_hit_rate_counts_hits_over_lookups(clock):
+    cache = EvaluationCache(max_entries=8, ttl=60, db_path="")
+    cache.put("k", {"score": 1})
+    cache.get("k")
+    cache.get("k")
+    cache.get("missing")
+    stats = cache.get_stats()
+    assert (stats["memory_hits"], stats["misses"], stats["hit_rate"]) == (2, 1, 0.667)
+
+
+class Reply:
+    def __init__(self, text):
+        self.text = text
+
+
+def evaluate_twice(reply_text, cache):
+    ai_interviewer = pytest.importorskip("ai_interviewer")
+    ai = ai_interviewer.InterviewerAI()
+    ai.model = object()
+    generate = mock.AsyncMock(return_value=Reply(reply_text))
+
+    async def go():
+        first = await ai.evaluate_code("print(1)", "python", "Print 1")
+        second = await ai.evaluate_code("print(1)", "python", "Print 1")
+        return first, second
+
+    with mock.patch.object(ai_interviewer.llm_client, "generate_content", generate), \
+            mock.patch.object(ai_interviewer, "get_evaluation_cache", lambda: cache):
+        first, second = asyncio.run(go())
+    return first, second, generate.await_count
+
+
+def test_unparsed_evaluations_are_not_cached(clock):
+    cache = EvaluationCache(max_entries=8, ttl=60, db_path="")
+    first, second, calls = evaluate_twice("Looks right to me.", cache)
+    assert first["parsed"] is False
+    assert second["cached"] is False
+    assert calls == 2
+    assert cache.get_stats()["stores"] == 0
+
+
+def test_parsed_evaluations_are_cached(clock):
+    cache = EvaluationCache(max_entries=8, ttl=60, db_path="")
+    first, second, calls = evaluate_twice('{"is_correct": true, "score": 90}', cache)
+    assert first["parsed"] is True
+    assert (second["cached"], second["score"]) == (True, 90)
+    assert calls == 1
@@ -0,0 +1,61 @@
+"""
+Tests for the sandbox process runner
+Run with: python -m pytest test_process_runner.py
+"""
+import sys
+import threading
+
+import pytest
+
+from process_runner import PROC_STATUS_AVAILABLE, StreamingProcess, run_process
+
+
+requires_proc = pytest.mark.skipif(not PROC_STATUS_AVAILABLE, reason="peak RSS is only measured on Linux")
+
+
+@requires_proc
+def test_trivial_program_reports_its_own_rss():
+    # Make this process large; a fork copy of it must not show up in the child's peak
+    ballast = bytearray(256 * 1024 * 1024)
+    for i in range(0, len(ballast), 4096):
+        ballast[i] = 1
+
+    result = run_process([sys.executable, "-c", "import time; time.sleep(0.05); print(42)"])
+
+    assert result["stdout"].strip() == "42"
+    assert result["peak_rss_kb"] is not None
+    assert result["peak_rss_kb"] < 64 * 1024
+    del ballast
+
+
+@requires_proc
+def test_peak_rss_tracks_allocations():
+    code = "x = bytearray(96 * 1024 * 1024); x[::4096] = b'1' * len(x[::4096]); import time; time.sleep(0.05)"
+    result = run_process([sys.executable, "-c", code])
+
+    assert result["returncode"] == 0
+    assert result["peak_rss_kb"] >= 96 * 1024
+
+
+@requires_proc
+def test_streaming_exit_reports_program_rss():
+    ballast = bytearray(256 * 1024 * 1024)
+    for i in range(0, len(ballast), 4096):
+        ballast[i] = 1
+    output = []
+    exited = threading.Event()
+    results = []
+
+    def on_exit(result):
+        results.append(result)
+        exited.set()
+
+    process = StreamingProcess([sys.executable, "-c", "import time; time.sleep(0.05); print(42)"],
+                               lambda stream, text: output.append(text), on_exit)
+    process.start()
+    assert exited.wait(10)
+
+    assert "".join(output).strip() == "42"
+    assert results[0]["peak_rss_kb"] is not None
+    assert results[0]["peak_rss_kb"] < 64 * 1024
+    del ballast
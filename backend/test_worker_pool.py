@@ -0,0 +1,55 @@
+"""
+Tests for the warm Python worker pool
+Run with: python -m pytest test_worker_pool.py
+"""
+import os
+import tempfile
+import time
+
+import pytest
+
+from process_runner import limits_for_language
+from worker_pool import PythonWorkerPool, WorkerTimeout
+
+
+@pytest.fixture
+def pool():
+    pool = PythonWorkerPool(size=1, limits=limits_for_language("python"))
+    # Workers start in the background and runs never wait for one
+    deadline = time.monotonic() + 10
+    while pool.idle.qsize() < pool.size and time.monotonic() < deadline:
+        time.sleep(0.01)
+    yield pool
+    pool.shutdown()
+
+
+def test_runs_do_not_see_each_others_module_state(pool):
+    first = pool.run("import math, sys; math.pi = 3; sys.modules['json'].dumps = None; print(math.pi)", timeout=5)
+    assert first["stdout"] == "3\n"
+
+    second = pool.run("import json, math; print(math.pi); print(json.dumps([1]))", timeout=5)
+    assert second["returncode"] == 0
+    assert second["stdout"] == "3.141592653589793\n[1]\n"
+
+
+def test_timeout_leaves_worker_usable(pool):
+    with pytest.raises(WorkerTimeout):
+        pool.run("while True: pass", timeout=0.5)
+
+    assert pool.run("print('still warm')", timeout=5)["stdout"] == "still warm\n"
+
+
+def test_runs_start_outside_the_server_directory(pool):
+    server_dir = os.path.dirname(os.path.abspath(__file__))
+    reply = pool.run("import os, sys; print(os.getcwd()); print(__file__); print(os.pathsep.join(sys.path))", timeout=5)
+    cwd, filename, path = reply["stdout"].splitlines()
+    assert cwd == tempfile.gettempdir()
+    assert os.path.dirname(filename) == tempfile.gettempdir()
+    assert server_dir not in path.split(os.pathsep)
+
+
+def test_fork_failure_falls_back_to_a_cold_start(pool, monkeypatch):
+    worker = pool.idle.queue[0]
+    monkeypatch.setattr(worker, "run", lambda *args: {"fork_failed": True, "stderr": "Resource temporarily unavailable"})
+    assert pool.run("print(1)", timeout=5) is None
+    assert pool.get_stats()["fallbacks"] == 1
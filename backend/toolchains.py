@@ -0,0 +1,85 @@
+"""
+Toolchain Registry
+Detects available language runtimes once instead of probing on every execution
+"""
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, Optional
+
+
+# name -> command used to print the version
+TOOLCHAIN_PROBES = {
+    "python": [sys.executable, "--version"],
+    "node": ["node", "--version"],
+    "javac": ["javac", "-version"],
+    "java": ["java", "-version"],
+    "g++": ["g++", "--version"],
+}
+
+
+class ToolchainRegistry:
+    """Caches which toolchains exist on this host and their versions"""
+
+    def __init__(self, probes: Optional[Dict[str, list]] = None):
+        self.probes = probes or TOOLCHAIN_PROBES
+        self.toolchains: Dict[str, Dict] = {}
+        self.detected_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def _probe(self, command: list) -> Dict:
+        path = shutil.which(command[0])
+        if not path:
+            return {"available": False, "version": None, "path": None}
+        try:
+            result = subprocess.run(command, capture_output=True, text=True, timeout=10)
+        except (OSError, subprocess.TimeoutExpired):
+            return {"available": False, "version": None, "path": path}
+        # javac/java print their version to stderr
+        output = (result.stdout or result.stderr).strip()
+        return {
+            "available": result.returncode == 0,
+            "version": output.splitlines()[0] if output else None,
+            "path": path,
+        }
+
+    def refresh(self) -> Dict[str, Dict]:
+        """Re-run every probe and replace the cached results"""
+        detected = {name: self._probe(command) for name, command in self.probes.items()}
+        with self._lock:
+            self.toolchains = detected
+            self.detected_at = time.time()
+        return detected
+
+    def _ensure_detected(self):
+        if self.detected_at is None:
+            self.refresh()
+
+    def get(self, name: str) -> Dict:
+        self._ensure_detected()
+        return self.toolchains.get(name, {"available": False, "version": None, "path": None})
+
+    def is_available(self, name: str) -> bool:
+        return self.get(name)["available"]
+
+    def version(self, name: str) -> str:
+        return self.get(name)["version"] or ""
+
+    def mark_missing(self, name: str):
+        """Record a toolchain that disappeared after detection (e.g. FileNotFoundError on run)"""
+        with self._lock:
+            if name in self.toolchains:
+                self.toolchains[name] = {**self.toolchains[name], "available": False}
+
+    def to_dict(self) -> Dict:
+        self._ensure_detected()
+        return {
+            "detected_at": self.detected_at,
+            "toolchains": dict(self.toolchains),
+        }
+
+
+# Global registry
+toolchains = ToolchainRegistry()
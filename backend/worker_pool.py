@@ -0,0 +1,440 @@
+"""
+Warm Python Worker Pool
+Pre-forked interpreters that run candidate code without a cold start per run
+"""
+import json
+import os
+import queue
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, Optional
+from process_runner import ResourceLimits, RESOURCE_AVAILABLE, limits_for_language
+
+
+# Source of the long-lived worker process. Each request is one JSON line on
+# stdin, each reply one JSON line on stdout. The real stdio file descriptors are
+# moved out of the way first so user code writing to fd 0/1 cannot corrupt the
+# protocol stream. Where fork is available every run happens in a forked
+# child, so anything the program changes (module attributes, sys.path, cwd,
+# open files) is thrown away with it and the next run starts from the same
+# pre-imported state. The worker enforces the run's timeout itself and stays
+# warm afterwards.
+WORKER_BOOTSTRAP = r'''
+import io, json, linecache, os, select, signal, sys, time, traceback
+import math, collections, itertools, functools, heapq, bisect, re, random, string, typing
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+class OutputLimitExceeded(BaseException):
+    pass
+
+
+class CappedOutput(io.StringIO):
+    """StringIO that stops the program once the run's output budget is spent"""
+    def __init__(self, budget):
+        super().__init__()
+        self.budget = budget
+        self.truncated = False
+
+    def write(self, text):
+        if self.budget["remaining"] is not None:
+            if len(text) > self.budget["remaining"]:
+                super().write(text[:self.budget["remaining"]])
+                self.budget["remaining"] = 0
+                self.truncated = True
+                raise OutputLimitExceeded()
+            self.budget["remaining"] -= len(text)
+        return super().write(text)
+
+proto_in = os.fdopen(os.dup(0), "r", encoding="utf-8")
+proto_out = os.fdopen(os.dup(1), "w", encoding="utf-8")
+devnull = os.open(os.devnull, os.O_RDWR)
+os.dup2(devnull, 0)
+os.dup2(devnull, 1)
+
+base_cwd = os.getcwd()
+# Drop the "" entry; each run puts its own directory first instead
+base_path = [p for p in sys.path if p]
+
+
+def lower_limit(kind, soft, lower_hard):
+    hard = resource.getrlimit(kind)[1]
+    if hard == resource.RLIM_INFINITY or soft < hard:
+        resource.setrlimit(kind, (soft, soft if lower_hard else hard))
+
+
+def run_request(request):
+    cwd = request.get("cwd") or base_cwd
+    budget = {"remaining": request.get("max_output")}
+    stdout, stderr = CappedOutput(budget), CappedOutput(budget)
+    exit_code = 0
+    filename = os.path.join(cwd, "main.py")
+    namespace = {"__name__": "__main__", "__file__": filename, "__builtins__": __builtins__}
+    linecache.cache[filename] = (len(request["code"]), None, request["code"].splitlines(True), filename)
+    os.chdir(cwd)
+    sys.path[:] = [cwd] + base_path
+    sys.stdin, sys.stdout, sys.stderr = io.StringIO(request.get("stdin") or ""), stdout, stderr
+    try:
+        exec(compile(request["code"], filename, "exec"), namespace)
+    except OutputLimitExceeded:
+        exit_code = 1
+    except SystemExit as e:
+        if e.code is None or e.code == 0:
+            exit_code = 0
+        elif isinstance(e.code, int):
+            exit_code = e.code
+        else:
+            stderr.write(str(e.code) + "\n")
+            exit_code = 1
+    except BaseException as e:
+        tb = e.__traceback__.tb_next if e.__traceback__ is not None else None
+        try:
+            stderr.write("".join(traceback.format_exception(type(e), e, tb)))
+        except OutputLimitExceeded:
+            pass
+        exit_code = 1
+    finally:
+        try:
+            sys.stdout.flush()
+        except Exception:
+            pass
+        sys.stdin, sys.stdout, sys.stderr = sys.__stdin__, sys.__stdout__, sys.__stderr__
+    return {
+        "returncode": exit_code,
+        "stdout": stdout.getvalue(),
+        "stderr": stderr.getvalue(),
+        "truncated": stdout.truncated or stderr.truncated,
+    }
+
+
+def run_forked(request):
+    read_fd, write_fd = os.pipe()
+    try:
+        pid = os.fork()
+    except OSError as e:
+        # e.g. EAGAIN when the user is at its process limit; the host cold-starts instead
+        os.close(read_fd)
+        os.close(write_fd)
+        return {"fork_failed": True, "stderr": str(e)}
+    if pid == 0:
+        try:
+            os.close(read_fd)
+            proto_in.close()
+            proto_out.close()
+            if resource is not None:
+                # A forked child starts with no CPU time used
+                if request.get("cpu_seconds"):
+                    lower_limit(resource.RLIMIT_CPU, request["cpu_seconds"], False)
+                # Set here rather than on the worker, which must always be able to fork
+                if request.get("max_processes") and hasattr(resource, "RLIMIT_NPROC"):
+                    lower_limit(resource.RLIMIT_NPROC, request["max_processes"], True)
+            data = json.dumps(run_request(request)).encode("utf-8")
+            with os.fdopen(write_fd, "wb") as result:
+                result.write(data)
+        finally:
+            os._exit(0)
+
+    os.close(write_fd)
+    deadline = time.monotonic() + request["timeout"]
+    chunks = []
+    timed_out = False
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or not select.select([read_fd], [], [], remaining)[0]:
+            timed_out = True
+            os.kill(pid, signal.SIGKILL)
+            break
+        chunk = os.read(read_fd, 65536)
+        if not chunk:
+            break
+        chunks.append(chunk)
+    os.close(read_fd)
+    _, status = os.waitpid(pid, 0)
+
+    if timed_out:
+        return {"returncode": None, "stdout": "", "stderr": "", "timed_out": True}
+    try:
+        return json.loads(b"".join(chunks))
+    except ValueError:
+        # The child died before it could report, e.g. killed by its CPU limit
+        signum = -os.waitstatus_to_exitcode(status)
+        xcpu = getattr(signal, "SIGXCPU", None)
+        message = "CPU time limit exceeded" if xcpu and signum == xcpu else "Python process exited unexpectedly"
+        return {"returncode": 1, "stdout": "", "stderr": message}
+
+
+for line in proto_in:
+    request = json.loads(line)
+    if hasattr(os, "fork"):
+        reply = run_forked(request)
+    else:
+        # Without fork the run happens here; the pool recycles this worker afterwards
+        reply = run_request(request)
+    proto_out.write(json.dumps(reply) + "\n")
+    proto_out.flush()
+'''
+
+# Without fork a worker can't isolate runs from each other, so it is used once
+FORK_AVAILABLE = hasattr(os, "fork")
+# Extra time a forking worker gets to report its own timeout before it is killed
+WORKER_TIMEOUT_GRACE = 2.0
+
+
+class WorkerTimeout(Exception):
+    """Raised when a run exceeds its timeout and the worker had to be killed"""
+
+
+class WorkerCrashed(Exception):
+    """Raised when a worker process dies without sending a reply"""
+
+
+class PythonWorker:
+    """A single pre-started interpreter process"""
+
+    def __init__(self, limits: Optional[ResourceLimits] = None):
+        self.limits = limits or ResourceLimits()
+        # CPU and processes are limited per run inside the worker's forked child
+        # (RLIMIT_NPROC on the worker itself would make its own forks fail on a
+        # busy host); the spawn-time limits cover memory and file size
+        spawn_limits = self.limits.replace(cpu_seconds=None, max_processes=None)
+        self.process = subprocess.Popen(
+            [sys.executable, "-u", "-c", WORKER_BOOTSTRAP],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            encoding="utf-8",
+            # Never the server's directory: relative paths and imports must not reach it
+            cwd=tempfile.gettempdir(),
+            preexec_fn=spawn_limits.preexec_fn(),
+            # Own process group, so killing the worker also kills a run it forked
+            start_new_session=os.name == "posix",
+        )
+        self.runs = 0
+        self.created_at = time.time()
+
+    def is_alive(self) -> bool:
+        return self.process.poll() is None
+
+    def run(self, code: str, timeout: float, working_dir: Optional[str] = None, stdin: str = "") -> Dict:
+        """Send one program to the worker and wait for its reply"""
+        self.runs += 1
+        timed_out = threading.Event()
+
+        def _kill():
+            timed_out.set()
+            self.kill()
+
+        # A forking worker times the run out itself; this timer is the backstop
+        timer = threading.Timer(timeout + WORKER_TIMEOUT_GRACE if FORK_AVAILABLE else timeout, _kill)
+        timer.daemon = True
+        timer.start()
+        try:
+            self.process.stdin.write(json.dumps({
+                "code": code,
+                "cwd": working_dir or tempfile.gettempdir(),
+                "stdin": stdin,
+                "timeout": timeout,
+                "cpu_seconds": self.limits.cpu_seconds,
+                "max_processes": self.limits.max_processes if FORK_AVAILABLE else None,
+                "max_output": self.limits.max_output_bytes,
+            }) + "\n")
+            self.process.stdin.flush()
+            reply = self.process.stdout.readline()
+        except (BrokenPipeError, OSError, ValueError):
+            reply = ""
+        finally:
+            timer.cancel()
+
+        if timed_out.is_set():
+            raise WorkerTimeout()
+        if not reply:
+            self.kill()
+            try:
+                returncode = self.process.wait(timeout=1)
+            except subprocess.TimeoutExpired:
+                returncode = None
+            raise WorkerCrashed(returncode)
+        return json.loads(reply)
+
+    def kill(self):
+        try:
+            if os.name == "posix":
+                os.killpg(self.process.pid, signal.SIGKILL)
+            else:
+                self.process.kill()
+        except Exception:
+            pass
+
+    def close(self):
+        try:
+            self.process.stdin.close()
+        except Exception:
+            pass
+        self.kill()
+        try:
+            self.process.wait(timeout=1)
+        except Exception:
+            pass
+
+
+class PythonWorkerPool:
+    """
+    Fixed-size pool of warm Python workers, recycled after max_runs or any
+    failure. Runs are isolated by forking inside the worker; where fork is
+    unavailable each worker is used for a single run instead.
+    """
+
+    def __init__(self, size: int = 2, max_runs: int = 50, default_timeout: float = 10,
+                 limits: Optional[ResourceLimits] = None):
+        self.size = size
+        self.limits = limits or ResourceLimits()
+        self.max_runs = max_runs if FORK_AVAILABLE else 1
+        self.default_timeout = default_timeout
+        self.idle = queue.Queue()
+        self.closed = False
+        self.stats = {"runs": 0, "recycled": 0, "timeouts": 0, "crashes": 0, "fallbacks": 0}
+        self._lock = threading.Lock()
+        for _ in range(size):
+            self._spawn_async()
+
+    def _spawn(self):
+        if self.closed:
+            return
+        try:
+            self.idle.put(PythonWorker(self.limits))
+        except Exception as e:
+            print(f"[WorkerPool] Failed to start Python worker: {e}")
+
+    def _spawn_async(self):
+        threading.Thread(target=self._spawn, daemon=True).start()
+
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _acquire(self) -> Optional[PythonWorker]:
+        # Never wait for a busy worker: a cold start now beats an unknown wait
+        while True:
+            try:
+                worker = self.idle.get_nowait()
+            except queue.Empty:
+                return None
+            if worker.is_alive():
+                return worker
+            # Died while idle; replace it and try the next one
+            self._spawn_async()
+
+    def _release(self, worker: PythonWorker, healthy: bool):
+        if healthy and worker.is_alive() and worker.runs < self.max_runs and not self.closed:
+            self.idle.put(worker)
+            return
+        self._count("recycled")
+        worker.close()
+        self._spawn_async()
+
+    def run(self, code: str, timeout: Optional[float] = None, working_dir: Optional[str] = None, stdin: str = "") -> Optional[Dict]:
+        """
+        Run code on a warm worker.
+        Returns the raw {returncode, stdout, stderr} reply, or None if no worker
+        was free or the worker could not fork, so the caller should fall back
+        to a cold start.
+        Raises WorkerTimeout if the run exceeded its timeout.
+        """
+        worker = self._acquire()
+        if worker is None:
+            self._count("fallbacks")
+            return None
+
+        healthy = False
+        try:
+            reply = worker.run(code, timeout or self.default_timeout, working_dir, stdin)
+            # The worker killed its forked run and is still clean
+            healthy = True
+            if reply.get("timed_out"):
+                raise WorkerTimeout()
+            if reply.get("fork_failed"):
+                print(f"[WorkerPool] Worker could not fork, cold-starting: {reply.get('stderr')}")
+                self._count("fallbacks")
+                return None
+            self._count("runs")
+            return reply
+        except WorkerTimeout:
+            self._count("timeouts")
+            raise
+        except WorkerCrashed as e:
+            self._count("crashes")
+            if RESOURCE_AVAILABLE and e.args and e.args[0] == -signal.SIGXCPU:
+                message = "CPU time limit exceeded"
+            else:
+                message = "Python process exited unexpectedly"
+            return {"returncode": 1, "stdout": "", "stderr": message}
+        finally:
+            self._release(worker, healthy)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self.stats)
+        stats.update({
+            "size": self.size,
+            "idle": self.idle.qsize(),
+            "max_runs": self.max_runs,
+            "default_timeout": self.default_timeout,
+        })
+        return stats
+
+    def shutdown(self):
+        self.closed = True
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+# Pool configuration (size 0 disables the pool and every run cold-starts)
+PYTHON_POOL_SIZE = int(os.getenv("PYTHON_POOL_SIZE", "2"))
+PYTHON_POOL_MAX_RUNS = int(os.getenv("PYTHON_POOL_MAX_RUNS", "50"))
+PYTHON_POOL_TIMEOUT = float(os.getenv("PYTHON_POOL_TIMEOUT", "10"))
+
+_python_pool: Optional[PythonWorkerPool] = None
+_python_pool_lock = threading.Lock()
+
+
+def get_python_pool() -> Optional[PythonWorkerPool]:
+    """Return the shared pool, creating it on first use"""
+    global _python_pool
+    if PYTHON_POOL_SIZE <= 0:
+        return None
+    if _python_pool is None:
+        with _python_pool_lock:
+            if _python_pool is None:
+                _python_pool = PythonWorkerPool(
+                    size=PYTHON_POOL_SIZE,
+                    max_runs=PYTHON_POOL_MAX_RUNS,
+                    default_timeout=PYTHON_POOL_TIMEOUT,
+                    limits=limits_for_language("python"),
+                )
+    return _python_pool
+
+
+def configure_python_pool(size: Optional[int] = None, max_runs: Optional[int] = None, timeout: Optional[float] = None):
+    """Change pool settings; the current pool is shut down and rebuilt lazily"""
+    global _python_pool, PYTHON_POOL_SIZE, PYTHON_POOL_MAX_RUNS, PYTHON_POOL_TIMEOUT
+    with _python_pool_lock:
+        if size is not None:
+            PYTHON_POOL_SIZE = size
+        if max_runs is not None:
+            PYTHON_POOL_MAX_RUNS = max_runs
+        if timeout is not None:
+            PYTHON_POOL_TIMEOUT = timeout
+        if _python_pool is not None:
+            _python_pool.shutdown()
+            _python_pool = None
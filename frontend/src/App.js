@@ -83,8 +83,11 @@ function App() {
   const wsRef = useRef(null);
   const webcamRef = useRef(null);
   const frameIntervalRef = useRef(null);
+  const captureSettingsRef = useRef({ intervalMs: 500, maxWidth: 640 });
   const lastFocusTimeRef = useRef(Date.now());
   const alertsEnabledRef = useRef(true);
+  // Proctoring alerts and violations are recorded against this user's session
+  const userIdRef = useRef(null);
 
   // Always require login - no auto-authentication
   // Removed localStorage check - users must login every time
@@ -137,43 +140,85 @@ function App() {
     }
   }, [isAuthenticated, user, captchaVerified, sessionId, selectedPersonality, API_URL]);
 
+  // Reconnect the video socket when the user changes so the server records
+  // alerts for the right session
+  useEffect(() => {
+    const userId = user ? (user.email || user.id || 'user') : null;
+    if (userId === userIdRef.current) return;
+    userIdRef.current = userId;
+    if (wsRef.current && wsRef.current.readyState === WebSocket.OPEN) {
+      wsRef.current.close();
+    }
+  }, [user]);
+
   // WebSocket connection for video proctoring
   useEffect(() => {
     const connectWebSocket = () => {
       try {
-        const ws = new WebSocket(`${WS_URL}/ws/video`);
+        const query = userIdRef.current ? `?user_id=${encodeURIComponent(userIdRef.current)}` : '';
+        const ws = new WebSocket(`${WS_URL}/ws/video${query}`);
         wsRef.current = ws;
 
         ws.onopen = () => {
           console.log('WebSocket connected');
           setWsConnected(true);
           
-          // Start sending frames
-          frameIntervalRef.current = setInterval(() => {
-            if (webcamRef.current && ws.readyState === WebSocket.OPEN) {
+          // Start sending frames as binary: 16-byte header + raw JPEG
+          // (see FRAME_HEADER in backend/proctoring.py). The server adjusts
+          // the capture interval and width via "control" messages.
+          let frameSeq = 0;
+          const sendFrame = () => {
+            if (ws.readyState !== WebSocket.OPEN) return;
+            if (webcamRef.current) {
               try {
-                const imageSrc = webcamRef.current.getScreenshot();
-                // Check if we have valid base64 image data (should start with "data:image/")
-                if (imageSrc && imageSrc.startsWith('data:image/') && imageSrc.length > 1000) {
-                  ws.send(imageSrc);
-                } else if (imageSrc === null) {
+                const canvas = webcamRef.current.getCanvas && webcamRef.current.getCanvas();
+                if (canvas) {
+                  const { maxWidth } = captureSettingsRef.current;
+                  let source = canvas;
+                  if (canvas.width > maxWidth) {
+                    source = document.createElement('canvas');
+                    source.width = maxWidth;
+                    source.height = Math.round(canvas.height * maxWidth / canvas.width);
+                    source.getContext('2d').drawImage(canvas, 0, 0, source.width, source.height);
+                  }
+                  source.toBlob((blob) => {
+                    if (!blob || ws.readyState !== WebSocket.OPEN) return;
+                    const header = new DataView(new ArrayBuffer(16));
+                    header.setUint8(0, 1); // protocol version
+                    header.setUint8(1, 1); // format: JPEG
+                    header.setUint16(2, 0, true); // flags (reserved)
+                    header.setUint32(4, frameSeq++ >>> 0, true);
+                    header.setBigUint64(8, BigInt(Date.now()), true);
+                    ws.send(new Blob([header.buffer, blob]));
+                  }, 'image/jpeg', 0.8);
+                } else if (canvas === null) {
                   // Camera not ready yet, silently skip
                 } else {
-                  // Only log warning occasionally to avoid spam
-                  if (Math.random() < 0.05) { // Log ~5% of failures
-                    console.warn('Screenshot not ready or invalid format');
+                  // Older feed without getCanvas: fall back to base64 data URLs
+                  const imageSrc = webcamRef.current.getScreenshot();
+                  if (imageSrc && imageSrc.startsWith('data:image/') && imageSrc.length > 1000) {
+                    ws.send(imageSrc);
                   }
                 }
               } catch (error) {
                 console.error('Error capturing frame:', error);
               }
             }
-          }, 500);
+            frameIntervalRef.current = setTimeout(sendFrame, captureSettingsRef.current.intervalMs);
+          };
+          frameIntervalRef.current = setTimeout(sendFrame, captureSettingsRef.current.intervalMs);
         };
 
         ws.onmessage = (event) => {
           try {
             const data = JSON.parse(event.data);
+            if (data.type === 'control') {
+              captureSettingsRef.current = {
+                intervalMs: data.capture_interval_ms || captureSettingsRef.current.intervalMs,
+                maxWidth: data.max_width || captureSettingsRef.current.maxWidth
+              };
+              return;
+            }
             if (data.alerts && data.alerts.length > 0) {
               // Filter out duplicate alerts
               const uniqueAlerts = [...new Set(data.alerts)];
@@ -226,7 +271,7 @@ function App() {
 
     return () => {
       if (frameIntervalRef.current) {
-        clearInterval(frameIntervalRef.current);
+        clearTimeout(frameIntervalRef.current);
       }
       if (wsRef.current) {
         wsRef.current.close();
@@ -285,7 +330,8 @@ function App() {
         axios.post(`${API_URL}/report_violation`, {
           type: 'tab_switch',
           details: alertMsg,
-          timestamp: new Date().toISOString()
+          timestamp: new Date().toISOString(),
+          user_id: userIdRef.current
         }).catch(err => console.error('Failed to report violation:', err));
       }
     };
@@ -320,7 +366,8 @@ function App() {
         axios.post(`${API_URL}/report_violation`, {
           type: 'window_blur',
           details: alertMsg,
-          timestamp: new Date().toISOString()
+          timestamp: new Date().toISOString(),
+          user_id: userIdRef.current
         }).catch(err => console.error('Failed to report violation:', err));
       }
     };
@@ -537,10 +584,14 @@ function App() {
 
   const handleRunCode = async (code, language) => {
     try {
-      const response = await axios.post(`${API_URL}/run_code`, { code, language });
+      // The session id keys this candidate's execution quota on the backend
+      const response = await axios.post(`${API_URL}/run_code`, { code, language, session_id: sessionId });
       return { output: response.data.output, error: response.data.error };
     } catch (error) {
       console.error('Error running code:', error);
+      if (error.response?.status === 429) {
+        return { error: `Too many runs right now. Please try again in ${error.response.data?.retry_after || 1}s.` };
+      }
       return { error: error.message };
     }
   };
@@ -1,9 +1,44 @@
 import React, { useState, useRef, useEffect } from 'react';
-import axios from 'axios';
 import speechService from '../services/speechService';
 import { t } from '../i18n/languages';
 import './ChatInterface.css';
 
+// POST to /chat/stream and read its server-sent events; resolves with the "done" payload
+const streamChat = async (url, body, onDelta) => {
+  const response = await fetch(url, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify(body)
+  });
+  if (!response.ok || !response.body) {
+    throw new Error(`Chat stream failed with status ${response.status}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let boundary;
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      const block = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      const event = (block.match(/^event: (.*)$/m) || [])[1];
+      const data = (block.match(/^data: (.*)$/m) || [])[1];
+      if (!data) continue;
+      const payload = JSON.parse(data);
+      if (event === 'delta') {
+        onDelta(payload.text);
+      } else if (event === 'done') {
+        return payload;
+      }
+    }
+  }
+  throw new Error('Chat stream ended without a reply');
+};
+
 const ChatInterface = ({ apiUrl, onInterviewerMessage, onSpeakingStateChange, onSpeechTextChange, onCodingQuestion, isMuted = false, userId = null, avatarReady = null }) => {
   const [messages, setMessages] = useState([
     {
@@ -289,23 +324,28 @@ const ChatInterface = ({ apiUrl, onInterviewerMessage, onSpeakingStateChange, on
     setIsLoading(true);
 
     try {
-      const res = await axios.post(`${apiUrl}/chat`, { 
+      // Show the reply as it streams in; the "done" event has the final text
+      let streamedText = '';
+      const data = await streamChat(`${apiUrl}/chat/stream`, {
         message: userMessage,
         user_id: userId  // Pass user ID to track test accounts
+      }, (text) => {
+        streamedText += text;
+        setMessages([...newMsgs, { sender: 'ai', text: streamedText }]);
       });
-      const aiMessage = { sender: 'ai', text: res.data.reply };
+      const aiMessage = { sender: 'ai', text: data.reply };
       setMessages([...newMsgs, aiMessage]);
       
       // Check if it's a coding question
-      const isCodingQuestion = res.data.is_coding_question || false;
-      const suggestedLanguage = res.data.suggested_language || 'python';
+      const isCodingQuestion = data.is_coding_question || false;
+      const suggestedLanguage = data.suggested_language || 'python';
       
       if (onInterviewerMessage) {
-        onInterviewerMessage(res.data.reply, isCodingQuestion, suggestedLanguage);
+        onInterviewerMessage(data.reply, isCodingQuestion, suggestedLanguage);
       }
       
       if (onCodingQuestion && isCodingQuestion) {
-        onCodingQuestion(res.data.reply, suggestedLanguage);
+        onCodingQuestion(data.reply, suggestedLanguage);
       }
       
       // Mark initial message as spoken if it wasn't already (user has responded)
@@ -321,7 +361,7 @@ const ChatInterface = ({ apiUrl, onInterviewerMessage, onSpeakingStateChange, on
       }
       
       // Speak the AI response
-      speakMessage(res.data.reply);
+      speakMessage(data.reply);
     } catch (error) {
       console.error('Chat error:', error);
       setMessages([
@@ -4,7 +4,7 @@ import axios from 'axios';
 import { t } from '../i18n/languages';
 import './CodeEditor.css';
 
-const CodeEditor = ({ apiUrl, onViolation, reportToBackend = true, question = null, suggestedLanguage = 'python', onCodeChange, userId = null }) => {
+const CodeEditor = ({ apiUrl, onViolation, reportToBackend = true, question = null, suggestedLanguage = 'python', onCodeChange, userId = null, sessionId = null }) => {
   const [code, setCode] = useState('');
   const [output, setOutput] = useState('');
   const [evaluation, setEvaluation] = useState(null);
@@ -44,12 +44,17 @@ const CodeEditor = ({ apiUrl, onViolation, reportToBackend = true, question = nu
     try {
       const res = await axios.post(`${apiUrl}/run_code`, {
         code: code,
-        language: language
+        language: language,
+        session_id: sessionId  // Keys this candidate's execution quota
       });
       setOutput(res.data.output || 'No output');
     } catch (error) {
       console.error('Code execution error:', error);
-      setOutput(`Error: ${error.response?.data?.detail || error.message}`);
+      if (error.response?.status === 429) {
+        setOutput(`Too many runs right now. Please try again in ${error.response.data?.retry_after || 1}s.`);
+      } else {
+        setOutput(`Error: ${error.response?.data?.detail || error.message}`);
+      }
     } finally {
       setIsRunning(false);
     }
@@ -95,7 +100,8 @@ const CodeEditor = ({ apiUrl, onViolation, reportToBackend = true, question = nu
         await axios.post(`${apiUrl}/report_violation`, {
           type: type,
           details: details,
-          timestamp: new Date().toISOString()
+          timestamp: new Date().toISOString(),
+          user_id: userId
         });
       } catch (error) {
         console.error('Failed to report violation:', error);
@@ -19,6 +19,17 @@ const VideoFeed = forwardRef(({ onAlerts, wsConnected }, ref) => {
         console.warn('Failed to capture screenshot:', error);
         return null;
       }
+    },
+    getCanvas: () => {
+      if (!webcamRef.current || !isStreaming) {
+        return null;
+      }
+      try {
+        return webcamRef.current.getCanvas();
+      } catch (error) {
+        console.warn('Failed to capture canvas:', error);
+        return null;
+      }
     }
   }));
 